@@ -0,0 +1,113 @@
+import json
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+from loguru import logger
+
+
+def measure(
+    func: Callable,
+    *args,
+    min_time: float = 1.0,
+    max_repeat: int = 5,
+    trace_memory: bool = True,
+) -> dict:
+    """
+    Measures the run time and the peak memory of `func(*args)`.
+
+    The function is run until `min_time` has passed (at most `max_repeat` times) and
+    the fastest run is kept. The memory is measured in a separate run, as tracing the
+    allocations slows down the pure Python code.
+
+    Args:
+        func (Callable): The function to measure.
+        *args: The arguments of `func`.
+        min_time (float, optional): The time after which no more runs are started,
+            in seconds. Defaults to 1.0.
+        max_repeat (int, optional): The maximum number of timed runs. Defaults to 5.
+        trace_memory (bool, optional): Whether to measure the peak memory.
+            Defaults to True.
+
+    Returns:
+        dict: The fastest run time (`seconds`) and the peak memory allocated by
+            `func` (`peak_memory_mb`, None if not measured).
+    """
+    times = []
+    while len(times) < max_repeat and sum(times) < min_time:
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+
+    if not trace_memory:
+        return {"seconds": min(times), "peak_memory_mb": None}
+    tracemalloc.start()
+    try:
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": min(times), "peak_memory_mb": peak / 1024**2}
+
+
+def save_results(path: str | Path, results: dict[str, dict]) -> None:
+    Path(path).write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+    logger.info(f"Saved results to {path}")
+
+
+def compare_to_baseline(
+    results: dict[str, dict],
+    baseline: dict[str, dict],
+    metrics: tuple[str, ...] = ("seconds", "peak_memory_mb"),
+    tolerance: float = 0.25,
+) -> list[str]:
+    """
+    Finds the metrics that got worse than in a baseline.
+
+    Lower is better for all the `metrics`. The benchmarks missing in either
+    `results` or `baseline` are skipped.
+
+    Args:
+        results (dict[str, dict]): The metrics of each benchmark.
+        baseline (dict[str, dict]): The metrics of each benchmark in the baseline.
+        metrics (tuple[str, ...], optional): The metrics to compare.
+            Defaults to `("seconds", "peak_memory_mb")`.
+        tolerance (float, optional): The relative increase allowed before a metric
+            is considered a regression. Defaults to 0.25.
+
+    Returns:
+        list[str]: A description of each regression.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for metric in metrics:
+            before, after = baseline[name].get(metric), result.get(metric)
+            if before is None or after is None:
+                continue
+            if after > before * (1 + tolerance) and after - before > 1e-3:
+                regressions.append(
+                    f"{name}: {metric} went from {before:.4g} to {after:.4g}"
+                    f" (+{after / max(before, 1e-12) - 1:.0%})"
+                )
+    return regressions
+
+
+def print_table(results: dict[str, dict], columns: list[str]) -> None:
+    rows = [["benchmark", *columns]] + [
+        [name, *(_format(result.get(column)) for column in columns)]
+        for name, result in results.items()
+    ]
+    widths = [max(len(row[n]) for row in rows) for n in range(len(rows[0]))]
+    for row in rows:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
+
+
+def _format(value) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return str(value)
@@ -0,0 +1,405 @@
+import json
+import os
+import random
+import sys
+import tempfile
+from functools import partial
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+from fire import Fire
+from loguru import logger
+
+from benchmarks.common import compare_to_baseline, measure, print_table, save_results
+from document_to_podcast.cli import load_document
+from document_to_podcast.preprocessing import (
+    DATA_LOADERS,
+    clean_html,
+    clean_markdown,
+    clean_with_regex,
+    load_pdf,
+)
+from document_to_podcast.preprocessing.data_cleaners import (
+    iter_clean_html,
+    iter_clean_markdown,
+    iter_clean_with_regex,
+)
+from document_to_podcast.utils import stack_audio_segments
+
+EXAMPLE_DATA = Path(__file__).parent.parent / "example_data"
+
+KB = 1024
+MB = 1024**2
+
+TEXT_SIZES = [10 * KB, 1 * MB, 50 * MB]
+PDF_PAGES = [1, 50, 500]
+DOCX_PAGES = [1, 50, 500]
+# The budget of the documents loaded with `max_characters`, about 32K tokens.
+MAX_CHARACTERS = 128 * KB
+AUDIO_SEGMENTS = [10, 500, 5000]
+
+WORDS = (
+    "the of and to in is that for it as was with be by on not he this are or his"
+    " from at which but have an they you were her she there been one all we their"
+    " mozilla trustworthy artificial intelligence openness accountability agency"
+    " data privacy governance innovation research podcast document speaker"
+).split()
+
+
+def make_text(size: int, seed: int = 0) -> str:
+    """
+    Generates prose with the noise that `clean_with_regex` removes: URLs, emails,
+    non-ASCII characters and runs of whitespace.
+    """
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        sentence = " ".join(rng.choices(WORDS, k=rng.randint(8, 24))).capitalize()
+        noise = rng.random()
+        if noise < 0.05:
+            sentence += f" https://example.com/{rng.randint(0, 10**6)}?q=a&b=c"
+        elif noise < 0.08:
+            sentence += f" contact{rng.randint(0, 999)}@example.org"
+        elif noise < 0.15:
+            sentence += " — “quoted” café\xa0\xa0 "
+        sentence += rng.choice([". ", "! ", "? ", ".\n\n", ",   "])
+        parts.append(sentence)
+        length += len(sentence)
+    return "".join(parts)[:size]
+
+
+def make_html(size: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    head = (
+        "<html><head><meta charset='utf-8'><title>Benchmark</title>"
+        "<link rel='stylesheet' href='style.css'>"
+        "<style>body { font-family: sans-serif; }</style></head><body>\n"
+    )
+    parts = [head]
+    length = len(head)
+    n = 0
+    while length < size:
+        paragraph = make_text(rng.randint(200, 800), seed=seed + n)
+        block = rng.choice(
+            [
+                f"<p>{paragraph}</p>\n",
+                f"<div class='section'><h2>Section {n}</h2><p>{paragraph}</p></div>\n",
+                f"<ul><li>{paragraph}</li></ul>\n",
+                f"<script>var x{n} = {n}; console.log('{n}');</script><p>{paragraph}</p>\n",
+            ]
+        )
+        parts.append(block)
+        length += len(block)
+        n += 1
+    parts.append("</body></html>\n")
+    return "".join(parts)
+
+
+def make_markdown(size: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    n = 0
+    while length < size:
+        paragraph = make_text(rng.randint(200, 800), seed=seed + n)
+        block = rng.choice(
+            [
+                f"## Section {n}\n\n{paragraph}\n\n",
+                f"{paragraph}\n\n",
+                f'![figure {n}](images/figure_{n}.png "Figure {n}")\n\n{paragraph}\n\n',
+                f"- **{paragraph[:40]}**: {paragraph[40:]}\n\n",
+            ]
+        )
+        parts.append(block)
+        length += len(block)
+        n += 1
+    return "".join(parts)
+
+
+def _escape_pdf_text(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(path: Path, n_pages: int, lines_per_page: int = 45) -> Path:
+    """
+    Writes a text-only PDF, with a page of prose on each page.
+    """
+    text = make_text(n_pages * lines_per_page * 90).encode("ascii", "ignore").decode()
+    lines = [
+        _escape_pdf_text(" ".join(text[n : n + 90].split()))
+        for n in range(0, len(text), 90)
+    ]
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # The page tree, once the ids of the pages are known.
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for page in range(n_pages):
+        page_lines = lines[page * lines_per_page : (page + 1) * lines_per_page]
+        stream = "BT /F1 10 Tf 14 TL 50 780 Td " + " ".join(
+            f"({line}) '" for line in page_lines
+        )
+        stream = (stream + " ET").encode("ascii")
+        objects.append(
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        )
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792]"
+            b" /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % len(objects)
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {n_pages} >>".encode()
+
+    content = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for n, obj in enumerate(objects):
+        offsets.append(len(content))
+        content += b"%d 0 obj\n%s\nendobj\n" % (n + 1, obj)
+    xref = len(content)
+    content += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    content += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    content += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref,
+    )
+    path.write_bytes(content)
+    return path
+
+
+def make_docx(path: Path, n_pages: int, paragraphs_per_page: int = 8) -> Path:
+    from docx import Document
+
+    document = Document()
+    for n in range(n_pages * paragraphs_per_page):
+        if n % paragraphs_per_page == 0:
+            document.add_heading(f"Section {n // paragraphs_per_page}", level=2)
+        document.add_paragraph(make_text(450, seed=n))
+    document.save(path)
+    return path
+
+
+def make_audio_segments(
+    n_segments: int, sample_rate: int = 24_000, seconds: float = 1.0
+) -> list[np.ndarray]:
+    rng = np.random.default_rng(0)
+    return [
+        rng.uniform(
+            -0.5, 0.5, int(sample_rate * seconds * rng.uniform(0.5, 1.5))
+        ).astype(np.float32)
+        for _ in range(n_segments)
+    ]
+
+
+def clean_in_chunks(iter_clean: Callable, text: str, chunk_size: int = 64 * KB) -> str:
+    chunks = (text[n : n + chunk_size] for n in range(0, len(text), chunk_size))
+    return "".join(iter_clean(chunks))
+
+
+def _size_name(size: int) -> str:
+    return f"{size // MB}MB" if size >= MB else f"{size // KB}KB"
+
+
+def get_benchmarks(
+    folder: Path, quick: bool = False
+) -> dict[str, tuple[Callable, tuple, float, str]]:
+    """
+    Builds the inputs of every benchmark.
+
+    Args:
+        folder (Path): The folder where the input files are written.
+        quick (bool, optional): Whether to skip the largest size of each benchmark.
+            Defaults to False.
+
+    Returns:
+        dict[str, tuple[Callable, tuple, float, str]]: The function, its arguments,
+            the amount of work and the unit of the throughput, by benchmark name.
+    """
+    sizes = slice(0, -1) if quick else slice(None)
+    benchmarks = {}
+
+    for size in TEXT_SIZES[sizes]:
+        name = _size_name(size)
+        text = make_text(size)
+        benchmarks[f"clean_with_regex[{name}]"] = (
+            clean_with_regex,
+            (text,),
+            size,
+            "MB/s",
+        )
+        benchmarks[f"iter_clean_with_regex[{name}]"] = (
+            partial(clean_in_chunks, iter_clean_with_regex),
+            (text,),
+            size,
+            "MB/s",
+        )
+        markdown = make_markdown(size)
+        benchmarks[f"clean_markdown[{name}]"] = (
+            clean_markdown,
+            (markdown,),
+            len(markdown),
+            "MB/s",
+        )
+        benchmarks[f"iter_clean_markdown[{name}]"] = (
+            partial(clean_in_chunks, iter_clean_markdown),
+            (markdown,),
+            len(markdown),
+            "MB/s",
+        )
+        html = make_html(size)
+        benchmarks[f"clean_html[{name}]"] = (clean_html, (html,), len(html), "MB/s")
+        if find_spec("lxml") is not None:
+            benchmarks[f"clean_html[{name},lxml]"] = (
+                partial(clean_html, parser="lxml"),
+                (html,),
+                len(html),
+                "MB/s",
+            )
+        benchmarks[f"iter_clean_html[{name}]"] = (
+            partial(clean_in_chunks, iter_clean_html),
+            (html,),
+            len(html),
+            "MB/s",
+        )
+        txt_file = folder / f"text_{name}.txt"
+        txt_file.write_text(text)
+        benchmarks[f"load_txt[{name}]"] = (
+            DATA_LOADERS[".txt"],
+            (str(txt_file),),
+            txt_file.stat().st_size,
+            "MB/s",
+        )
+        html_file = folder / f"html_{name}.html"
+        html_file.write_text(html)
+        for document in (txt_file, html_file):
+            # Loaded and cleaned, whole or only until the budget.
+            benchmarks[f"load_document[{document.name}]"] = (
+                load_document,
+                (str(document),),
+                document.stat().st_size,
+                "MB/s",
+            )
+            benchmarks[f"load_document[{document.name},max_characters]"] = (
+                partial(load_document, max_characters=MAX_CHARACTERS),
+                (str(document),),
+                document.stat().st_size,
+                "MB/s",
+            )
+
+    for n_pages in PDF_PAGES[sizes]:
+        pdf_file = make_pdf(folder / f"pages_{n_pages}.pdf", n_pages)
+        benchmarks[f"load_pdf[{n_pages}_pages]"] = (
+            DATA_LOADERS[".pdf"],
+            (str(pdf_file),),
+            n_pages,
+            "pages/s",
+        )
+        if n_pages > 1:
+            workers = os.cpu_count() or 1
+            benchmarks[f"load_pdf[{n_pages}_pages,{workers}_workers]"] = (
+                partial(load_pdf, num_workers=workers),
+                (str(pdf_file),),
+                n_pages,
+                "pages/s",
+            )
+    for n_pages in DOCX_PAGES[sizes]:
+        docx_file = make_docx(folder / f"pages_{n_pages}.docx", n_pages)
+        benchmarks[f"load_docx[{n_pages}_pages]"] = (
+            DATA_LOADERS[".docx"],
+            (str(docx_file),),
+            n_pages,
+            "pages/s",
+        )
+
+    # The documents checked in to the repo.
+    for example in sorted(EXAMPLE_DATA.iterdir()):
+        if example.suffix not in DATA_LOADERS:
+            continue
+        benchmarks[f"load{example.suffix}[{example.name}]"] = (
+            DATA_LOADERS[example.suffix],
+            (str(example),),
+            example.stat().st_size,
+            "MB/s",
+        )
+
+    for n_segments in AUDIO_SEGMENTS[sizes]:
+        segments = make_audio_segments(n_segments)
+        benchmarks[f"stack_audio_segments[{n_segments}_segments]"] = (
+            stack_audio_segments,
+            (segments, 24_000),
+            n_segments,
+            "segments/s",
+        )
+    return benchmarks
+
+
+def run_microbenchmarks(
+    quick: bool = False,
+    select: str | None = None,
+    memory: bool = True,
+    baseline: str | None = None,
+    save: str | None = None,
+    tolerance: float = 0.25,
+) -> None:
+    """
+    Benchmark the preprocessing and audio utilities, without any model.
+
+    The inputs are generated at several sizes (10 KB to 50 MB of text, 1 to 500-page
+    PDF and DOCX files, 10 to 5000 audio segments), plus the documents in `example_data`.
+
+    Examples:
+        >>> python -m benchmarks.microbenchmarks --save baseline.json
+        >>> python -m benchmarks.microbenchmarks --baseline baseline.json
+
+    Args:
+        quick (bool, optional): Whether to skip the largest size of each benchmark.
+            Defaults to False.
+        select (str | None, optional): Only run the benchmarks whose name contains it
+            (e.g. `clean_html`). Defaults to None.
+        memory (bool, optional): Whether to measure the peak memory, with
+            `tracemalloc`. It's done in an extra run of each benchmark, which can be
+            much slower than the timed ones. Defaults to True.
+        baseline (str | None, optional): The path of the results of a previous run.
+            The regressions are listed, and the process exits with an error if any.
+            Defaults to None.
+        save (str | None, optional): The path where the results are saved as JSON,
+            e.g. to be used as a baseline. Defaults to None.
+        tolerance (float, optional): The relative increase of the time or the memory
+            allowed before a regression is reported. Defaults to 0.25.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        logger.info("Generating the inputs")
+        benchmarks = get_benchmarks(Path(folder), quick=quick)
+        for name, (func, args, work, unit) in benchmarks.items():
+            if select and select not in name:
+                continue
+            logger.info(f"Running {name}")
+            result = measure(func, *args, trace_memory=memory)
+            if unit == "MB/s":
+                work = work / MB
+            result["throughput"] = work / max(result["seconds"], 1e-12)
+            result["unit"] = unit
+            results[name] = result
+
+    print_table(results, ["seconds", "throughput", "unit", "peak_memory_mb"])
+    if save:
+        save_results(save, results)
+    if baseline:
+        regressions = compare_to_baseline(
+            results, json.loads(Path(baseline).read_text()), tolerance=tolerance
+        )
+        for regression in regressions:
+            logger.error(regression)
+        if regressions:
+            sys.exit(1)
+        logger.success(f"No regressions compared to {baseline}")
+
+
+if __name__ == "__main__":
+    Fire(run_microbenchmarks)
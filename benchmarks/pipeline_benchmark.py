@@ -0,0 +1,217 @@
+import json
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from fire import Fire
+from loguru import logger
+
+from benchmarks.common import compare_to_baseline, print_table, save_results
+from benchmarks.stubs import StageTimer, StubKPipeline, StubLlama
+from document_to_podcast import cli
+from document_to_podcast.config import validate_option_names
+from document_to_podcast.inference.model_loaders import TTSModel
+
+EXAMPLE_DATA = Path(__file__).parent.parent / "example_data"
+
+
+def run_pipeline(
+    input_file: str,
+    prefill_tokens_per_second: float = 200.0,
+    tokens_per_second: float = 20.0,
+    tts_realtime_factor: float = 5.0,
+    num_turns: int = 20,
+    words_per_turn: int = 30,
+    seconds_per_word: float = 0.35,
+    **options,
+) -> dict:
+    """
+    Runs `document_to_podcast` end to end with the stub models and measures it.
+
+    Args:
+        input_file (str): The document.
+        prefill_tokens_per_second (float, optional): Defaults to 200.
+        tokens_per_second (float, optional): Defaults to 20.
+        tts_realtime_factor (float, optional): Defaults to 5.
+        num_turns (int, optional): Defaults to 20.
+        words_per_turn (int, optional): Defaults to 30.
+        seconds_per_word (float, optional): Defaults to 0.35.
+        **options: Any other argument of `document_to_podcast`.
+
+    Returns:
+        dict: The metrics of the run.
+    """
+    validate_option_names(options)
+    timers = {
+        "load_document": StageTimer(),
+        "text_to_text": StageTimer(),
+        "text_to_speech": StageTimer(),
+        "audio_write": StageTimer(),
+    }
+    first_turn_time = None
+
+    def load_llama_cpp_model(model_id, **kwargs):
+        return StubLlama(
+            prefill_tokens_per_second,
+            tokens_per_second,
+            num_turns,
+            words_per_turn,
+            timers["text_to_text"],
+            **kwargs,
+        )
+
+    def load_tts_model(model_id, **kwargs):
+        pipeline = StubKPipeline(
+            tts_realtime_factor, seconds_per_word, timers["text_to_speech"]
+        )
+        return TTSModel(
+            model=pipeline, model_id=model_id, sample_rate=24000, custom_args={}
+        )
+
+    def load_document(input_file, metrics=None, pdf_workers=0, max_characters=None):
+        with timers["load_document"].busy():
+            return original_load_document(
+                input_file, metrics, pdf_workers, max_characters
+            )
+
+    def parse_speaker_turns(chunks):
+        nonlocal first_turn_time
+        for turn in original_parse_speaker_turns(chunks):
+            if first_turn_time is None:
+                first_turn_time = time.perf_counter()
+            yield turn
+
+    class TimedAudioSink(cli.AudioSink):
+        def write(self, segment):
+            with timers["audio_write"].busy():
+                super().write(segment)
+
+    original_load_document = cli.load_document
+    original_parse_speaker_turns = cli.parse_speaker_turns
+    with (
+        tempfile.TemporaryDirectory() as output_folder,
+        patch.object(cli, "load_llama_cpp_model", load_llama_cpp_model),
+        patch.object(cli, "load_tts_model", load_tts_model),
+        patch.object(cli, "load_document", load_document),
+        patch.object(cli, "parse_speaker_turns", parse_speaker_turns),
+        patch.object(cli, "AudioSink", TimedAudioSink),
+    ):
+        start = time.perf_counter()
+        cli.document_to_podcast(
+            input_file=input_file, output_folder=output_folder, **options
+        )
+        end = time.perf_counter()
+
+    tts_workers = max(options.get("tts_workers", 1), 1)
+    stages = {
+        name: timer.report(
+            start, workers=tts_workers if name == "text_to_speech" else 1
+        )
+        for name, timer in timers.items()
+    }
+    # ru_maxrss is in KB on Linux, but in bytes on macOS.
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    max_rss = max_rss / 1024**2 if sys.platform == "darwin" else max_rss / 1024
+    return {
+        "time_to_first_turn": first_turn_time - start if first_turn_time else None,
+        "time_to_first_audio": stages["audio_write"]["start"],
+        "wall_seconds": end - start,
+        "peak_rss_mb": max_rss,
+        "stages": stages,
+    }
+
+
+def run_pipeline_benchmark(
+    input_file: str = str(
+        EXAMPLE_DATA / "introducing-mozilla-ai-investing-in-trustworthy-ai.html"
+    ),
+    prefill_tokens_per_second: float = 200.0,
+    tokens_per_second: float = 20.0,
+    tts_realtime_factor: float = 5.0,
+    num_turns: int = 20,
+    words_per_turn: int = 30,
+    seconds_per_word: float = 0.35,
+    baseline: str | None = None,
+    save: str | None = None,
+    tolerance: float = 0.1,
+    **options,
+) -> None:
+    """
+    Benchmark the whole podcast generation with stub models, without downloading them.
+
+    The stub text-to-text model streams a script built from the document at the
+    given speeds, and the stub TTS model produces silence at the given real-time
+    factor, so what is measured is the orchestration of the real pipeline: loading,
+    cleaning, parsing, pipelining, caching and writing the audio.
+
+    Examples:
+        >>> python -m benchmarks.pipeline_benchmark --tts_workers 0 --save baseline.json
+        >>> python -m benchmarks.pipeline_benchmark --tts_workers 0 --baseline baseline.json
+
+    Args:
+        input_file (str, optional): The document.
+            Defaults to the HTML document in `example_data`.
+        prefill_tokens_per_second (float, optional): The prompt evaluation speed of
+            the stub text-to-text model. Defaults to 200.
+        tokens_per_second (float, optional): The generation speed of the stub
+            text-to-text model. Each word is a token. Defaults to 20.
+        tts_realtime_factor (float, optional): The seconds of audio the stub TTS
+            model produces per second. Defaults to 5.
+        num_turns (int, optional): The number of turns of the script. Defaults to 20.
+        words_per_turn (int, optional): The number of words of each turn. Defaults to 30.
+        seconds_per_word (float, optional): The duration of the audio of each word.
+            Defaults to 0.35.
+        baseline (str | None, optional): The path of the results of a previous run.
+            The regressions are listed, and the process exits with an error if any.
+            Defaults to None.
+        save (str | None, optional): The path where the results are saved as JSON.
+            Defaults to None.
+        tolerance (float, optional): The relative increase of a metric allowed
+            before a regression is reported. Defaults to 0.1.
+        **options: Any other argument of `document_to_podcast`
+            (e.g. `tts_workers` or `tts_queue_size`).
+    """
+    result = run_pipeline(
+        input_file,
+        prefill_tokens_per_second=prefill_tokens_per_second,
+        tokens_per_second=tokens_per_second,
+        tts_realtime_factor=tts_realtime_factor,
+        num_turns=num_turns,
+        words_per_turn=words_per_turn,
+        seconds_per_word=seconds_per_word,
+        **options,
+    )
+
+    print_table(
+        {"pipeline": result},
+        ["time_to_first_turn", "time_to_first_audio", "wall_seconds", "peak_rss_mb"],
+    )
+    print()
+    print_table(result["stages"], ["start", "end", "busy", "idle"])
+
+    results = {"pipeline": {k: v for k, v in result.items() if k != "stages"}}
+    if save:
+        save_results(save, {**results, "stages": result["stages"]})
+    if baseline:
+        regressions = compare_to_baseline(
+            results,
+            json.loads(Path(baseline).read_text()),
+            metrics=("time_to_first_turn", "time_to_first_audio", "wall_seconds"),
+            tolerance=tolerance,
+        )
+        for regression in regressions:
+            logger.error(regression)
+        if regressions:
+            sys.exit(1)
+        logger.success(f"No regressions compared to {baseline}")
+
+
+if __name__ == "__main__":
+    # Fire passes `--help` to the `**options` instead of showing the usage.
+    command = sys.argv[1:]
+    if "--help" in command or "-h" in command:
+        command = ["--", "--help"]
+    Fire(run_pipeline_benchmark, command=command)
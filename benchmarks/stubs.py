@@ -0,0 +1,167 @@
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+import numpy as np
+
+
+class StageTimer:
+    """
+    Records when a stage of the pipeline starts and ends, and how long it is busy.
+
+    The busy time can be recorded from several threads at once (e.g. the TTS workers).
+    """
+
+    def __init__(self):
+        self.start = None
+        self.end = None
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def busy(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self.start = start if self.start is None else min(self.start, start)
+                self.end = end if self.end is None else max(self.end, end)
+                self.busy_seconds += end - start
+
+    def report(self, origin: float, workers: int = 1) -> dict:
+        """
+        Args:
+            origin (float): The `time.perf_counter` of the start of the run.
+            workers (int, optional): The number of threads running the stage.
+                Defaults to 1.
+
+        Returns:
+            dict: The start and end of the stage since `origin`, its busy time and its
+                idle time (the time between its start and end not spent working).
+        """
+        if self.start is None:
+            return {"start": None, "end": None, "busy": 0.0, "idle": 0.0}
+        return {
+            "start": self.start - origin,
+            "end": self.end - origin,
+            "busy": self.busy_seconds,
+            "idle": max((self.end - self.start) * workers - self.busy_seconds, 0.0),
+        }
+
+
+def make_script(text: str, num_turns: int, words_per_turn: int) -> str:
+    """
+    Builds a podcast script in the format generated by the text-to-text model, with
+    the words of `text` split in turns alternating between Speaker 1 and Speaker 2.
+    """
+    words = re.findall(r"[A-Za-z0-9',.!?]+", text) or ["podcast"]
+    turns = []
+    for n in range(num_turns):
+        turn_words = [
+            words[(n * words_per_turn + i) % len(words)] for i in range(words_per_turn)
+        ]
+        turn = " ".join(turn_words).rstrip(",") + "."
+        turns.append(f"  {json.dumps(f'Speaker {n % 2 + 1}')}: {json.dumps(turn)}")
+    return "{\n" + ",\n".join(turns) + "\n}"
+
+
+class StubLlama:
+    """
+    Stands in for `llama_cpp.Llama`, streaming a deterministic script built from the
+    input text at a fixed prefill and decode speed.
+
+    Each word (with its leading whitespace) is streamed as one token, and the tokenizer
+    counts one token every 4 characters.
+
+    Args:
+        prefill_tokens_per_second (float): The speed at which the prompt is evaluated.
+        tokens_per_second (float): The speed at which the script is generated.
+        num_turns (int): The number of turns of the script.
+        words_per_turn (int): The number of words of each turn.
+        timer (StageTimer): Records the time spent generating.
+        n_ctx (int, optional): The context size. 0 uses the one of the model, 32768.
+            Defaults to 0.
+    """
+
+    def __init__(
+        self,
+        prefill_tokens_per_second: float,
+        tokens_per_second: float,
+        num_turns: int,
+        words_per_turn: int,
+        timer: StageTimer,
+        n_ctx: int = 0,
+        **kwargs,
+    ):
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.tokens_per_second = tokens_per_second
+        self.num_turns = num_turns
+        self.words_per_turn = words_per_turn
+        self.timer = timer
+        self._n_ctx = n_ctx or 32768
+        self.metadata = {"general.architecture": "stub", "stub.context_length": "32768"}
+        self.draft_model = None
+
+    def n_ctx(self) -> int:
+        return self._n_ctx
+
+    def tokenize(self, text: bytes, add_bos: bool = True, special: bool = False):
+        return list(range(-(-len(text) // 4) + int(add_bos)))
+
+    def create_chat_completion(self, messages, stream=False, **kwargs):
+        prompt = "".join(message["content"] for message in messages)
+        script = make_script(
+            messages[-1]["content"], self.num_turns, self.words_per_turn
+        )
+        chunks = self._generate(len(self.tokenize(prompt.encode("utf-8"))), script)
+        if stream:
+            return ({"choices": [{"delta": {"content": chunk}}]} for chunk in chunks)
+        return {"choices": [{"message": {"content": "".join(chunks)}}]}
+
+    def _generate(self, n_prompt_tokens: int, script: str) -> Iterator[str]:
+        with self.timer.busy():
+            time.sleep(n_prompt_tokens / self.prefill_tokens_per_second)
+        for token in re.findall(r"\s*\S+", script):
+            with self.timer.busy():
+                time.sleep(1 / self.tokens_per_second)
+            yield token
+
+
+class StubKPipeline:
+    """
+    Stands in for `kokoro.KPipeline`, producing silence for each sentence at a fixed
+    real-time factor.
+
+    Args:
+        realtime_factor (float): The seconds of audio produced per second of work.
+        seconds_per_word (float): The duration of the audio of each word.
+        timer (StageTimer): Records the time spent synthesizing.
+        sample_rate (int, optional): Defaults to 24000.
+    """
+
+    def __init__(
+        self,
+        realtime_factor: float,
+        seconds_per_word: float,
+        timer: StageTimer,
+        sample_rate: int = 24000,
+    ):
+        self.realtime_factor = realtime_factor
+        self.seconds_per_word = seconds_per_word
+        self.timer = timer
+        self.sample_rate = sample_rate
+
+    def __call__(self, text: str, voice: str, **kwargs):
+        for sentence in re.findall(r"[^.!?]+[.!?]*", text):
+            if not sentence.strip():
+                continue
+            with self.timer.busy():
+                seconds = len(sentence.split()) * self.seconds_per_word
+                time.sleep(seconds / self.realtime_factor)
+                audio = np.zeros(int(seconds * self.sample_rate), dtype=np.float32)
+            yield sentence, "", audio
@@ -1,21 +1,32 @@
 """Streamlit app for converting documents to podcasts."""
 
 import io
-import re
+import json
 from pathlib import Path
 
 import numpy as np
 import soundfile as sf
 import streamlit as st
 
-from document_to_podcast.inference.text_to_speech import text_to_speech
+from document_to_podcast.inference.script_parser import parse_speaker_turns
+from document_to_podcast.inference.text_to_speech import text_to_speech_stream
 from document_to_podcast.preprocessing import DATA_LOADERS, DATA_CLEANERS
 from document_to_podcast.inference.model_loaders import (
     load_llama_cpp_model,
     load_tts_model,
 )
-from document_to_podcast.config import DEFAULT_PROMPT, DEFAULT_SPEAKERS, Speaker
+from document_to_podcast.config import (
+    DEFAULT_CONDENSE_PROMPT,
+    DEFAULT_PROMPT,
+    DEFAULT_SPEAKERS,
+    Speaker,
+)
+from document_to_podcast.inference.long_document import condense_document
 from document_to_podcast.inference.text_to_text import text_to_text_stream
+from document_to_podcast.inference.token_budget import (
+    get_input_token_budget,
+    truncate_to_token_budget,
+)
 from document_to_podcast.utils import stack_audio_segments
 
 
@@ -31,6 +42,16 @@ def load_text_to_speech_model(lang_code: str):
     return load_tts_model("hexgrad/Kokoro-82M", **{"lang_code": lang_code})
 
 
+@st.cache_data
+def condense_text(text: str, max_characters: int, _text_model) -> str:
+    return condense_document(
+        text,
+        [_text_model],
+        system_prompt=DEFAULT_CONDENSE_PROMPT.strip(),
+        max_characters=max_characters,
+    )
+
+
 def numpy_to_wav(audio_array: np.ndarray, sample_rate: int) -> io.BytesIO:
     """
     Convert a numpy array to audio bytes in .wav format, ready to save into a file.
@@ -130,14 +151,28 @@ if "clean_text" in st.session_state:
         " for more information on how to use different models."
     )
 
-    # ~4 characters per token is considered a reasonable default.
-    max_characters = text_model.n_ctx() * 4
-    if len(clean_text) > max_characters:
-        st.warning(
-            f"Input text is too big ({len(clean_text)})."
-            f" Using only a subset of it ({max_characters})."
-        )
-        clean_text = clean_text[:max_characters]
+    # The speakers can still be edited below, use the default ones to reserve room
+    # for the system prompt.
+    budget_prompt = DEFAULT_PROMPT.strip().replace(
+        "{SPEAKERS}",
+        "\n".join(
+            str(Speaker.model_validate({**speaker, "id": n + 1}))
+            for n, speaker in enumerate(SPEAKERS)
+        ),
+    )
+    max_tokens = get_input_token_budget(text_model, budget_prompt)
+    fitted_text = truncate_to_token_budget(clean_text, text_model, max_tokens)
+    if len(fitted_text) < len(clean_text):
+        if st.checkbox("Condense the whole document instead of using only a subset"):
+            with st.spinner("Condensing document..."):
+                clean_text = condense_text(clean_text, len(fitted_text), text_model)
+            fitted_text = truncate_to_token_budget(clean_text, text_model, max_tokens)
+        else:
+            st.warning(
+                f"Input text is too big ({len(clean_text)})."
+                f" Using only a subset of it ({len(fitted_text)})."
+            )
+    clean_text = fitted_text
 
     st.divider()
     st.header("Podcast generation")
@@ -173,32 +208,39 @@ if "clean_text" in st.session_state:
 
         system_prompt = DEFAULT_PROMPT.replace("{SPEAKERS}", speakers_str)
         with st.spinner("Generating Podcast..."):
-            text = ""
-            for chunk in text_to_text_stream(
-                clean_text, text_model, system_prompt=system_prompt.strip()
+            turns = []
+            for speaker_id, text in parse_speaker_turns(
+                text_to_text_stream(
+                    clean_text, text_model, system_prompt=system_prompt.strip()
+                )
             ):
-                text += chunk
-                if text.endswith("\n") and "Speaker" in text:
-                    st.session_state.script += text
-                    st.write(text)
-
-                    speaker_id = re.search(r"Speaker (\d+)", text).group(1)
-                    voice_profile = next(
-                        speaker["voice_profile"]
-                        for speaker in speakers
-                        if speaker["id"] == int(speaker_id)
-                    )
-                    with st.spinner("Generating Audio..."):
-                        speech = text_to_speech(
-                            text.split(f'"Speaker {speaker_id}":')[-1],
-                            speech_model,
-                            voice_profile,
-                        )
-                    st.audio(speech, sample_rate=sample_rate)
-
-                    st.session_state.audio.append(speech)
-                    text = ""
-        st.session_state.script += "}"
+                turn = (
+                    f'  "Speaker {speaker_id}": {json.dumps(text, ensure_ascii=False)}'
+                )
+                turns.append(turn)
+                st.write(turn)
+
+                voice_profile = next(
+                    speaker["voice_profile"]
+                    for speaker in speakers
+                    if speaker["id"] == speaker_id
+                )
+                with st.spinner("Generating Audio..."):
+                    # Each chunk is played as it arrives, and the chunks are joined
+                    # once into one segment per turn, so no silence is added inside
+                    # a turn.
+                    chunks = []
+                    for speech in text_to_speech_stream(
+                        text,
+                        speech_model,
+                        voice_profile,
+                    ):
+                        chunks.append(speech)
+                        st.audio(speech, sample_rate=sample_rate)
+                    if chunks:
+                        st.session_state.audio.append(np.concatenate(chunks))
+        # Without a comma after the last turn, so the script is valid JSON.
+        st.session_state.script = "{\n" + ",\n".join(turns) + "\n}"
 
     if st.session_state[gen_button]:
         audio_np = stack_audio_segments(
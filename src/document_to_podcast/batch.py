@@ -0,0 +1,476 @@
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable
+
+import yaml
+from fire import Fire
+from loguru import logger
+from pydantic import BaseModel
+
+from document_to_podcast.cli import (
+    generate_podcast,
+    load_speech_model,
+)
+from document_to_podcast.config import (
+    Config,
+    LlamaParams,
+    Speaker,
+    DEFAULT_LLAMA_PROFILE,
+    DEFAULT_PROMPT,
+    DEFAULT_SPEAKERS,
+    validate_option_names,
+)
+from document_to_podcast.inference.model_loaders import (
+    TTSModel,
+    load_llama_cpp_model,
+)
+from document_to_podcast.inference.prompt_cache import PromptStateCache
+from document_to_podcast.preprocessing import DATA_LOADERS
+from document_to_podcast.tune import get_llama_kwargs
+
+
+class BatchItem(BaseModel):
+    input_file: str
+    output_folder: str | None = None
+    speakers: list[Speaker] | None = None
+    text_to_text_prompt: str | None = None
+
+
+def find_batch_items(inputs: str) -> list[BatchItem]:
+    """
+    Lists the documents of a batch.
+
+    Args:
+        inputs (str): One of:
+
+            - A directory: all the files with a supported extension in it.
+            - A `.jsonl` manifest: one item per line, with an `input_file` and,
+                optionally, its own `output_folder`, `speakers` and `text_to_text_prompt`.
+                Relative paths are resolved from the folder of the manifest.
+            - A glob pattern (e.g. `"docs/**/*.pdf"`).
+
+    Returns:
+        list[BatchItem]: The documents of the batch.
+    """
+    path = Path(inputs)
+    if path.is_dir():
+        return [
+            BatchItem(input_file=str(file))
+            for file in sorted(path.iterdir())
+            if file.suffix in DATA_LOADERS
+        ]
+    if path.suffix == ".jsonl":
+        items = []
+        for line in path.read_text().splitlines():
+            if not line.strip():
+                continue
+            item = BatchItem.model_validate(json.loads(line))
+            item.input_file = str(path.parent / item.input_file)
+            if item.output_folder is not None:
+                item.output_folder = str(path.parent / item.output_folder)
+            items.append(item)
+        return items
+    return [
+        BatchItem(input_file=file)
+        for file in sorted(glob.glob(inputs, recursive=True))
+        if Path(file).suffix in DATA_LOADERS
+    ]
+
+
+class BatchWorker:
+    """
+    Generates the podcasts of a batch, keeping the models loaded between documents.
+
+    The text-to-text model is loaded on first use and one TTS model is kept for each
+    language code of the speakers. The state of the text-to-text model after
+    evaluating each system prompt is also kept, so it's not evaluated for every document.
+
+    Args:
+        settings (dict): The settings shared by all the documents, as accepted by `Config`.
+        n_threads (int | None, optional): The number of threads used by the models.
+            If None, the defaults of each backend are used. Defaults to None.
+    """
+
+    def __init__(self, settings: dict, n_threads: int | None = None):
+        self.settings = settings
+        self.n_threads = n_threads
+        self.text_model = None
+        self.speech_models: dict[str, TTSModel] = {}
+        # Kept in memory between documents, and on disk if configured.
+        self.prompt_cache = PromptStateCache(
+            settings.get("prompt_cache_dir"),
+            max_size=settings.get("prompt_cache_max_size", 4096) * 1024**2,
+        )
+        if n_threads is not None:
+            import torch
+
+            torch.set_num_threads(n_threads)
+
+    def load_text_model(self):
+        if self.text_model is None:
+            logger.info(f"Loading {self.settings['text_to_text_model']}")
+            # The context is not sized to the input, as the model is shared by all
+            # the documents.
+            kwargs = get_llama_kwargs(
+                self.settings["text_to_text_model"],
+                LlamaParams.model_validate(self.settings.get("llama_params") or {}),
+                self.settings.get("llama_profile", DEFAULT_LLAMA_PROFILE),
+            )
+            if self.n_threads is not None:
+                kwargs["n_threads"] = kwargs["n_threads_batch"] = self.n_threads
+            if self.settings.get("draft_model"):
+                kwargs["draft_model"] = self.settings["draft_model"]
+                kwargs["num_draft_tokens"] = self.settings.get("num_draft_tokens", 10)
+            self.text_model = load_llama_cpp_model(
+                model_id=self.settings["text_to_text_model"], **kwargs
+            )
+        return self.text_model
+
+    def load_speech_model(self, speakers: list[Speaker]) -> TTSModel:
+        lang_code = speakers[0].voice_profile[0]
+        if lang_code not in self.speech_models:
+            self.speech_models[lang_code] = load_speech_model(
+                self.settings["text_to_speech_model"], speakers
+            )
+        return self.speech_models[lang_code]
+
+    def generate(self, config: Config) -> None:
+        """
+        Generates a podcast with the loaded models.
+
+        Args:
+            config (Config): The configuration of the podcast. Its models must be
+                the ones of the `settings`.
+        """
+        generate_podcast(
+            config,
+            text_model_loader=self.load_text_model,
+            speech_model=self.load_speech_model(config.speakers),
+            prompt_cache=self.prompt_cache,
+        )
+
+    def process(self, item: BatchItem, output_folder: str) -> str | None:
+        """
+        Generates the podcast of one document.
+
+        Args:
+            item (BatchItem): The document.
+            output_folder (str): The folder where its outputs are written.
+
+        Returns:
+            str | None: The error, if the document failed.
+        """
+        try:
+            config = Config.model_validate(
+                {
+                    **self.settings,
+                    **item.model_dump(exclude_none=True),
+                    "output_folder": output_folder,
+                }
+            )
+            self.generate(config)
+        except Exception as e:
+            logger.opt(exception=e).error(f"Failed to process {item.input_file}")
+            return str(e)
+        return None
+
+
+_worker: BatchWorker | None = None
+_started = None
+
+
+def _init_worker(settings, n_threads, worker_ids, log_queue, started):
+    global _worker, _started
+    worker_id = worker_ids.get()
+    # Send the logs to the parent process, which prints them.
+    logger.remove()
+    logger.add(
+        lambda message: log_queue.put(str(message)),
+        format=f"[worker {worker_id}] {{time:HH:mm:ss}} | {{level: <8}} | {{message}}",
+        level="INFO",
+    )
+    if n_threads is not None and hasattr(os, "sched_setaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+        pinned = cores[worker_id * n_threads : (worker_id + 1) * n_threads]
+        if pinned:
+            os.sched_setaffinity(0, pinned)
+    _worker = BatchWorker(settings, n_threads=n_threads)
+    _started = started
+
+
+def _process_in_worker(item: BatchItem, output_folder: str) -> str | None:
+    # Tells the parent which documents were running if this process crashes.
+    _started.put(output_folder)
+    return _worker.process(item, output_folder)
+
+
+def _forward_logs(log_queue) -> None:
+    for message in iter(log_queue.get, None):
+        sys.stderr.write(message)
+
+
+def _estimate_cost(item: BatchItem) -> int:
+    try:
+        # The size of the file, as a proxy of the length of its text which doesn't
+        # require loading every document up front.
+        return os.path.getsize(item.input_file)
+    except OSError:
+        # It will fail again, and be reported, when it's processed.
+        return 0
+
+
+def _run_in_pool(
+    jobs: list[tuple[BatchItem, str]],
+    num_processes: int,
+    settings: dict,
+    threads_per_process: int | None,
+    log_queue,
+    on_finished: Callable[[BatchItem, str | None], None],
+) -> tuple[list[tuple[BatchItem, str]], set[str]]:
+    """
+    Processes the jobs in a pool of worker processes.
+
+    If a worker process crashes (e.g. out of memory), the pool can't be used anymore
+    and all its pending jobs are interrupted.
+
+    Args:
+        jobs (list[tuple[BatchItem, str]]): The documents and their output folders.
+        num_processes (int): The number of worker processes.
+        settings (dict): The settings shared by all the documents.
+        threads_per_process (int | None): The number of threads of each worker.
+        log_queue: The queue where the workers send their logs.
+        on_finished (Callable[[BatchItem, str | None], None]): Called with the error
+            (None on success) of each document as soon as it's processed.
+
+    Returns:
+        tuple[list[tuple[BatchItem, str]], set[str]]: The jobs interrupted by a crash,
+            and the output folders of the documents that had started, one of which
+            crashed its worker.
+    """
+    context = multiprocessing.get_context("spawn")
+    worker_ids = context.Queue()
+    for worker_id in range(num_processes):
+        worker_ids.put(worker_id)
+    # Written without a feeder thread, so nothing is lost if the worker crashes.
+    started_queue = context.SimpleQueue()
+    interrupted = set()
+    with ProcessPoolExecutor(
+        max_workers=num_processes,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(settings, threads_per_process, worker_ids, log_queue, started_queue),
+    ) as executor:
+        futures = {
+            executor.submit(_process_in_worker, item, item_folder): n
+            for n, (item, item_folder) in enumerate(jobs)
+        }
+        for future in as_completed(futures):
+            item = jobs[futures[future]][0]
+            try:
+                error = future.result()
+            except BrokenProcessPool:
+                interrupted.add(futures[future])
+                continue
+            except Exception as e:
+                error = str(e) or type(e).__name__
+            on_finished(item, error)
+    started = set()
+    while not started_queue.empty():
+        started.add(started_queue.get())
+    return [job for n, job in enumerate(jobs) if n in interrupted], started
+
+
+def _get_output_folders(items: list[BatchItem], output_folder: str) -> list[str]:
+    output_folders = []
+    for item in items:
+        item_folder = item.output_folder
+        if item_folder is None:
+            stem = Path(item.input_file).stem
+            item_folder = str(Path(output_folder) / stem)
+            suffix = 1
+            while item_folder in output_folders:
+                suffix += 1
+                item_folder = str(Path(output_folder) / f"{stem}_{suffix}")
+        output_folders.append(item_folder)
+    return output_folders
+
+
+@logger.catch(reraise=True)
+def document_to_podcast_batch(
+    inputs: str | None = None,
+    output_folder: str | None = None,
+    text_to_text_model: str = "bartowski/Qwen2.5-7B-Instruct-GGUF/Qwen2.5-7B-Instruct-Q8_0.gguf",
+    text_to_text_prompt: str = DEFAULT_PROMPT,
+    text_to_speech_model: str = "hexgrad/Kokoro-82M",
+    speakers: list[Speaker] | None = None,
+    num_processes: int = 1,
+    threads_per_process: int | None = None,
+    from_config: str | None = None,
+    **options,
+) -> dict[str, str]:
+    """
+    Generate a podcast for each document of a batch, loading the models only once.
+
+    The outputs of each document are written to their own folder, and a document
+    that fails doesn't stop the rest of the batch.
+
+    Args:
+        inputs (str): The documents to process. See
+            [find_batch_items][document_to_podcast.batch.find_batch_items].
+
+        output_folder (str): The folder where the output folders of the documents
+            are created, named after each `input_file` (unless a manifest sets their
+            own `output_folder`).
+
+        text_to_text_model (str, optional): Same as in
+            [document_to_podcast][document_to_podcast.cli.document_to_podcast].
+
+        text_to_text_prompt (str, optional): The default prompt, used for the documents
+            that don't set their own.
+
+        text_to_speech_model (str, optional): Same as in
+            [document_to_podcast][document_to_podcast.cli.document_to_podcast].
+
+        speakers (list[Speaker] | None, optional): The default speakers, used for the
+            documents that don't set their own.
+
+        num_processes (int, optional): The number of worker processes, each one with
+            its own copy of the models.
+            When greater than 1, the documents are dispatched by decreasing file
+            size, so the longest ones don't end up running last. If a worker process
+            crashes (e.g. out of memory), the unfinished documents are processed again
+            in new workers: the ones that were running, one at a time, to report as
+            failed only the one crashing its worker.
+            Defaults to 1 (all documents are processed in this process, in order).
+
+        threads_per_process (int, optional): The number of threads used by the models
+            of each worker process, overriding the ones of `llama_params` and the
+            `llama_profile`. On Linux, each worker is also pinned to its own
+            cores. If None, the defaults of each backend are used.
+            Defaults to None.
+
+        from_config (str, optional): The path to a config file with the shared
+            settings. Its `input_file` and `output_folder` are ignored.
+            If provided, all other arguments except `inputs`, `output_folder`,
+            `num_processes` and `threads_per_process` will be ignored.
+
+        **options: Any other argument of
+            [document_to_podcast][document_to_podcast.cli.document_to_podcast]
+            (e.g. `tts_workers` or `reuse_script`), shared by all the documents.
+
+    Returns:
+        dict[str, str]: The error of each document that failed, by `input_file`.
+    """
+    validate_option_names(options)
+    if from_config:
+        settings = yaml.safe_load(Path(from_config).read_text())
+        settings.pop("input_file", None)
+        settings.pop("output_folder", None)
+    else:
+        settings = {
+            "text_to_text_model": text_to_text_model,
+            "text_to_text_prompt": text_to_text_prompt,
+            "text_to_speech_model": text_to_speech_model,
+            "speakers": speakers or DEFAULT_SPEAKERS,
+            **options,
+        }
+
+    items = find_batch_items(inputs)
+    logger.info(f"Found {len(items)} documents in {inputs}")
+    output_folders = _get_output_folders(items, output_folder)
+
+    failures = {}
+    if num_processes <= 1:
+        worker = BatchWorker(settings, n_threads=threads_per_process)
+        for n, (item, item_folder) in enumerate(zip(items, output_folders)):
+            logger.info(f"Processing {item.input_file} ({n + 1}/{len(items)})")
+            error = worker.process(item, item_folder)
+            if error is not None:
+                failures[item.input_file] = error
+    else:
+        costs = [_estimate_cost(item) for item in items]
+        jobs = [
+            (item, item_folder)
+            for item, item_folder, _ in sorted(
+                zip(items, output_folders, costs),
+                key=lambda job: job[2],
+                reverse=True,
+            )
+        ]
+        n_finished = 0
+
+        def on_finished(item: BatchItem, error: str | None) -> None:
+            nonlocal n_finished
+            n_finished += 1
+            if error is None:
+                logger.info(f"Finished {item.input_file} ({n_finished}/{len(items)})")
+            else:
+                logger.error(f"Failed {item.input_file}: {error}")
+                failures[item.input_file] = error
+
+        # The documents that were running when a worker crashed. One of them crashed
+        # it, so they are processed again one at a time to find which.
+        suspects: list[tuple[BatchItem, str]] = []
+        log_queue = multiprocessing.get_context("spawn").Queue()
+        log_forwarder = threading.Thread(
+            target=_forward_logs, args=(log_queue,), daemon=True
+        )
+        log_forwarder.start()
+        try:
+            while jobs or suspects:
+                alone = bool(suspects)
+                interrupted, started = _run_in_pool(
+                    suspects or jobs,
+                    1 if suspects else num_processes,
+                    settings,
+                    threads_per_process,
+                    log_queue,
+                    on_finished,
+                )
+                crashed = [job for job in interrupted if job[1] in started]
+                if interrupted and not crashed:
+                    # The workers crashed outside of a document, e.g. loading. Only the
+                    # documents that never ran are reported, not the finished ones.
+                    for item, _ in [*interrupted, *(jobs if suspects else [])]:
+                        on_finished(item, "The worker processes crashed")
+                    break
+                pending = [job for job in interrupted if job[1] not in started]
+                if alone:
+                    # Only one document was running, so it crashed the worker.
+                    for item, _ in crashed:
+                        on_finished(item, "The worker process crashed processing it")
+                if suspects:
+                    suspects = pending
+                else:
+                    jobs = pending
+                    if not alone:
+                        suspects = crashed
+                if interrupted:
+                    logger.warning(
+                        "A worker process crashed,"
+                        f" {len(jobs) + len(suspects)} documents left to process"
+                    )
+        finally:
+            log_queue.put(None)
+            log_forwarder.join()
+
+    logger.info(
+        f"Processed {len(items)} documents: "
+        f"{len(items) - len(failures)} succeeded, {len(failures)} failed"
+    )
+    return failures
+
+
+def main():
+    # Fire passes `--help` to the `**options` instead of showing the usage.
+    command = sys.argv[1:]
+    if "--help" in command or "-h" in command:
+        command = ["--", "--help"]
+    Fire(document_to_podcast_batch, command=command)
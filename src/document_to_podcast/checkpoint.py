@@ -0,0 +1,157 @@
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+
+class Checkpoint:
+    """
+    Progress journal of a podcast generation, so that it can be resumed.
+
+    Every completed turn is appended to `journal.jsonl` (speaker id and text) and its
+    waveform is saved next to it as a `.npy` file, so a crash or an interruption loses
+    at most the turns that were being synthesized.
+    The first line of the journal stores a key identifying the inputs, so a checkpoint
+    is never resumed with a different document, prompt, speakers or models.
+
+    Examples:
+        >>> checkpoint = Checkpoint("example_data/checkpoint")
+        >>> turns = checkpoint.start(key, resume=True)
+        >>> checkpoint.add_turn(1, "Welcome to our podcast.", speech)
+
+    Args:
+        folder (str | Path): The folder where the journal and the waveforms are stored.
+    """
+
+    def __init__(self, folder: str | Path):
+        self.folder = Path(folder)
+        self.journal_path = self.folder / "journal.jsonl"
+        self.turns: list[tuple[int, str]] = []
+
+    def start(self, key: str, resume: bool = False) -> list[tuple[int, str]]:
+        """
+        Opens the journal, loading the completed turns if `resume` is used.
+
+        Args:
+            key (str): Identifies the inputs of the generation.
+            resume (bool, optional): Whether to keep the turns of an existing journal
+                with the same `key`. Otherwise, the journal is started from scratch.
+                Defaults to False.
+
+        Returns:
+            list[tuple[int, str]]: The speaker id and the text of the completed turns.
+        """
+        self.turns = []
+        if resume:
+            self.turns = self._load(key)
+            if self.turns:
+                logger.info(f"Resuming after {len(self.turns)} completed turns")
+        if not self.turns:
+            self.clear()
+            self.folder.mkdir(parents=True, exist_ok=True)
+            self._append({"key": key})
+        return list(self.turns)
+
+    def _load(self, key: str) -> list[tuple[int, str]]:
+        if not self.journal_path.exists():
+            logger.warning(f"No checkpoint found in {self.folder}, starting over.")
+            return []
+        turns = []
+        with open(self.journal_path) as journal:
+            lines = journal.read().splitlines()
+        try:
+            header = json.loads(lines[0])
+        except (IndexError, json.JSONDecodeError):
+            header = {}
+        if header.get("key") != key:
+            logger.warning(
+                "The checkpoint was created with other inputs, starting over."
+            )
+            return []
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # The last line might have been cut by a crash.
+                break
+            if not self._speech_path(len(turns)).exists():
+                break
+            turns.append((entry["speaker_id"], entry["text"]))
+        if len(turns) < len(lines) - 1:
+            # Drop the incomplete entries, so new turns are appended after a clean line.
+            self._rewrite(key, turns)
+        return turns
+
+    def _rewrite(self, key: str, turns: list[tuple[int, str]]) -> None:
+        tmp_path = self.journal_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as journal:
+            journal.write(json.dumps({"key": key}) + "\n")
+            for speaker_id, text in turns:
+                journal.write(
+                    json.dumps({"speaker_id": speaker_id, "text": text}) + "\n"
+                )
+        os.replace(tmp_path, self.journal_path)
+
+    def _append(self, entry: dict) -> None:
+        with open(self.journal_path, "a") as journal:
+            journal.write(json.dumps(entry) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+
+    def _speech_path(self, n: int) -> Path:
+        return self.folder / f"turn_{n:05d}.npy"
+
+    def add_turn(self, speaker_id: int, text: str, speech: np.ndarray) -> None:
+        """
+        Records a completed turn.
+
+        The waveform is written before the journal entry, so every turn in the journal
+        has its waveform on disk.
+
+        Args:
+            speaker_id (int): The id of the speaker.
+            text (str): The text of the turn.
+            speech (np.ndarray): The waveform of the turn.
+        """
+        path = self._speech_path(len(self.turns))
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as file:
+            np.save(file, np.asarray(speech, dtype=np.float32))
+        os.replace(tmp_path, path)
+        self._append({"speaker_id": speaker_id, "text": text})
+        self.turns.append((speaker_id, text))
+
+    def get_speech(self, n: int) -> np.ndarray:
+        """
+        Loads the waveform of a completed turn.
+
+        Args:
+            n (int): The index of the turn.
+
+        Returns:
+            np.ndarray: The memory-mapped waveform.
+        """
+        return np.load(self._speech_path(n), mmap_mode="r")
+
+    def get_script_prefix(self) -> str:
+        """
+        Renders the completed turns as the beginning of a podcast script.
+
+        The prefix is left open, so the text-to-text model can continue it.
+
+        Returns:
+            str: The partial podcast script, in the JSON format generated by the model.
+        """
+        return "{\n" + "".join(
+            f'  "Speaker {speaker_id}": {json.dumps(text, ensure_ascii=False)},\n'
+            for speaker_id, text in self.turns
+        )
+
+    def clear(self) -> None:
+        """
+        Removes the journal and the waveforms.
+        """
+        shutil.rmtree(self.folder, ignore_errors=True)
@@ -1,25 +1,61 @@
-import re
+import time
+from collections import deque
+from contextlib import closing, nullcontext
+from functools import cache, partial
+from itertools import chain, islice
 from pathlib import Path
+from typing import TYPE_CHECKING, Callable
 
-import soundfile as sf
 import yaml
 from fire import Fire
 from loguru import logger
 
+from document_to_podcast.checkpoint import Checkpoint
 from document_to_podcast.config import (
     Config,
     Speaker,
+    DEFAULT_CONDENSE_PROMPT,
+    DEFAULT_LLAMA_PROFILE,
     DEFAULT_PROMPT,
+    DEFAULT_SCRIPT_CACHE_DIR,
     DEFAULT_SPEAKERS,
 )
 from document_to_podcast.inference.model_loaders import (
+    TTSModel,
     load_llama_cpp_model,
     load_tts_model,
 )
-from document_to_podcast.inference.text_to_speech import text_to_speech
-from document_to_podcast.inference.text_to_text import text_to_text_stream
-from document_to_podcast.preprocessing import DATA_CLEANERS, DATA_LOADERS
-from document_to_podcast.utils import stack_audio_segments
+from document_to_podcast.inference.long_document import (
+    MAX_CONDENSE_CONTEXT,
+    condense_document,
+    limit_llama_threads,
+    split_llama_threads,
+)
+from document_to_podcast.inference.prompt_cache import PromptStateCache
+from document_to_podcast.inference.script_cache import ScriptCache
+from document_to_podcast.inference.script_parser import parse_speaker_turns
+from document_to_podcast.inference.speech_cache import SpeechCache
+from document_to_podcast.inference.text_to_text import (
+    log_generation_speed,
+    text_to_text_stream,
+)
+from document_to_podcast.inference.token_budget import (
+    MAX_CHARACTERS_PER_TOKEN,
+    get_context_size,
+    get_input_token_budget,
+    get_train_context_size,
+    truncate_to_token_budget,
+)
+from document_to_podcast.metrics import PodcastMetrics
+from document_to_podcast.pipeline import pipelined_text_to_speech
+from document_to_podcast.profiling import PROFILERS
+from document_to_podcast.preprocessing import DATA_CHUNK_CLEANERS, DATA_CHUNK_LOADERS
+from document_to_podcast.preprocessing.data_loaders import join_chunks
+from document_to_podcast.tune import get_llama_kwargs
+from document_to_podcast.utils import AudioSink
+
+if TYPE_CHECKING:
+    from llama_cpp import Llama
 
 
 @logger.catch(reraise=True)
@@ -30,6 +66,29 @@ def document_to_podcast(
     text_to_text_prompt: str = DEFAULT_PROMPT,
     text_to_speech_model: str = "hexgrad/Kokoro-82M",
     speakers: list[Speaker] | None = None,
+    tts_workers: int = 1,
+    tts_queue_size: int = 2,
+    long_document: bool = False,
+    text_to_text_workers: int = 1,
+    tts_cache_dir: str | None = None,
+    tts_cache_max_size: int = 1024,
+    prompt_cache_dir: str | None = None,
+    prompt_cache_max_size: int = 4096,
+    reuse_script: bool = False,
+    script_cache_dir: str = DEFAULT_SCRIPT_CACHE_DIR,
+    from_script: str | None = None,
+    checkpoint: bool = False,
+    resume: bool = False,
+    llama_params: dict | None = None,
+    llama_profile: str | None = DEFAULT_LLAMA_PROFILE,
+    draft_model: str | None = None,
+    num_draft_tokens: int = 10,
+    metrics_events_file: str | None = None,
+    profile: bool | str = False,
+    profile_memory: bool = False,
+    pdf_workers: int = 0,
+    max_characters: int | None = None,
+    server_url: str | None = None,
     from_config: str | None = None,
 ):
     """
@@ -46,10 +105,11 @@ def document_to_podcast(
                 - .md
 
         output_folder (str): The path to the output folder.
-            Two files will be created:
+            Three files will be created:
 
                 - {output_folder}/podcast.txt
                 - {output_folder}/podcast.wav
+                - {output_folder}/metrics.json
 
         text_to_text_model (str, optional): The text-to-text model_id.
 
@@ -68,6 +128,142 @@ def document_to_podcast(
         speakers (list[Speaker] | None, optional): The speakers for the podcast.
             Defaults to DEFAULT_SPEAKERS.
 
+        tts_workers (int, optional): Whether to synthesize speech in a thread while
+            the podcast script is still being generated (1) or not (0).
+            The TTS model synthesizes one speaker turn at a time, so only 0 and 1
+            are allowed. If 0, each speaker turn is synthesized before generating
+            the next one.
+            Defaults to 1.
+
+        tts_queue_size (int, optional): The maximum number of speaker turns waiting
+            to be synthesized before the script generation is paused.
+            Defaults to 2.
+
+        long_document (bool, optional): Whether to condense the whole document when it
+            doesn't fit in the context of the text-to-text model, instead of using only
+            the beginning of it.
+            The document is split in sections, each section is condensed into notes and
+            the podcast is generated from the merged notes.
+            Defaults to False.
+
+        text_to_text_workers (int, optional): The number of text-to-text model instances
+            condensing sections in parallel when `long_document` is used.
+            The threads of the model are divided between the instances.
+            Defaults to 1.
+
+        tts_cache_dir (str, optional): The folder where the synthesized speaker turns
+            are cached, so identical turns are not synthesized again on later runs.
+            Defaults to None (no cache).
+
+        tts_cache_max_size (int, optional): The maximum size of the `tts_cache_dir`,
+            in MB. The least recently used turns are removed when it's exceeded.
+            Defaults to 1024.
+
+        prompt_cache_dir (str, optional): The folder where the state of the
+            text-to-text model after evaluating the system prompt is cached, so later
+            runs with the same prompt and speakers skip its evaluation.
+            Defaults to None (no cache).
+
+        prompt_cache_max_size (int, optional): The maximum size of the
+            `prompt_cache_dir`, in MB. The least recently used states are removed
+            when it's exceeded.
+            Defaults to 4096.
+
+        reuse_script (bool, optional): Whether to reuse the script generated on a
+            previous run for the same input text (the cleaned text fitting in the
+            context of the model), prompt, speakers and text-to-text model. On a hit, the text-to-text model is not loaded and only the audio is generated.
+            Generated scripts are stored in `script_cache_dir`.
+            Defaults to False.
+
+        script_cache_dir (str, optional): The folder where the scripts are cached when
+            `reuse_script` is used.
+            Defaults to `~/.cache/document-to-podcast/scripts`.
+
+        from_script (str, optional): The path to an existing podcast script
+            (e.g. a `podcast.txt` from a previous run).
+            If provided, the `input_file` is not needed and only the audio is generated.
+            Defaults to None.
+
+        checkpoint (bool, optional): Whether to keep a progress journal in
+            `output_folder/checkpoint`, with the completed turns of the script and their audio.
+            It is removed once the podcast is complete.
+            Defaults to False.
+
+        resume (bool, optional): Whether to resume a previous generation from its
+            checkpoint, after the last completed turn. Implies `checkpoint`.
+            The text-to-text model continues the partial script instead of starting over.
+            Defaults to False.
+
+        llama_params (dict, optional): Runtime parameters of llama.cpp for the
+            text-to-text model, e.g. `{n_threads: 8, n_batch: 512, type_k: q8_0}`.
+            Supported keys: `n_ctx`, `n_threads`, `n_threads_batch`, `n_batch`,
+            `n_ubatch`, `use_mmap`, `use_mlock`, `flash_attn`, `type_k` and `type_v`.
+            Unless `n_ctx` is set, the context is sized to fit the input document
+            (or uses the model limit with `long_document`).
+            Defaults to None.
+
+        llama_profile (str, optional): The profile written by `document-to-podcast-tune`.
+            Its parameters for the `text_to_text_model` are used, unless overridden by
+            `llama_params`. Ignored if it doesn't exist.
+            Defaults to `~/.cache/document-to-podcast/llama_profile.json`.
+
+        draft_model (str, optional): Enables speculative decoding of the script, which
+            drafts several tokens at once and has the text-to-text model verify them
+            in a single batch. Either:
+
+                - `prompt_lookup`: drafts the tokens that followed the last ones in
+                    the document, which works well as the script quotes and
+                    paraphrases it.
+                - The model_id of a small gguf sharing the vocabulary of the
+                    `text_to_text_model`, formatted as `owner/repo/file`.
+
+            The decode speed and the rate of accepted draft tokens are logged.
+            Defaults to None.
+
+        num_draft_tokens (int, optional): The number of tokens drafted at each step
+            when `draft_model` is used. Defaults to 10.
+
+        metrics_events_file (str, optional): The path of a JSON lines file where the
+            metrics are appended as they are recorded (the start and end of each
+            stage, the speed of the text-to-text model, each synthesized turn), for
+            live monitoring. The whole metrics are always written to
+            `{output_folder}/metrics.json` at the end.
+            Defaults to None.
+
+        profile (bool | str, optional): Whether to profile each stage (loading and
+            cleaning the document, loading the models, generating the script,
+            synthesizing the speech, writing the audio...). A profile file for each of
+            them, one merging all of them and a `summary.txt` of the hottest functions
+            are written to `{output_folder}/profile`.
+            Use `--profile` for `cProfile`, or the name of another profiler:
+            `pyinstrument` (a sampling profiler, requires
+            `pip install document-to-podcast[profiling]`).
+            Defaults to False.
+
+        profile_memory (bool, optional): Whether to also trace the memory allocations
+            with `tracemalloc`, writing a snapshot at the end of each stage and listing
+            the allocations that grew the most in `summary.txt`. Implies `profile`.
+            Defaults to False.
+
+        pdf_workers (int, optional): The number of processes extracting the text of
+            the pages of a PDF `input_file` in parallel.
+            If 0, the pages are extracted one after the other in this process.
+            Defaults to 0.
+
+        max_characters (int, optional): The maximum number of characters of the
+            cleaned text of the `input_file`. The document is loaded and cleaned
+            lazily, so only its beginning is read, and the rest is not used.
+            If None, it is derived from the context size of the `text_to_text_model`
+            (at most 10 characters per token), since only the text fitting in it is
+            used. With `long_document`, the whole document is loaded.
+            Defaults to None.
+
+        server_url (str, optional): The URL of a running `document-to-podcast-server`
+            (e.g. `http://127.0.0.1:8765`).
+            If provided, the podcast is generated by the server, with its already loaded
+            models, instead of loading them in this process.
+            Defaults to None.
+
         from_config (str, optional): The path to the config file. Defaults to None.
 
             If provided, all other arguments will be ignored.
@@ -83,90 +279,489 @@ def document_to_podcast(
             text_to_text_prompt=text_to_text_prompt,
             text_to_speech_model=text_to_speech_model,
             speakers=[Speaker.model_validate(speaker) for speaker in speakers],
+            tts_workers=tts_workers,
+            tts_queue_size=tts_queue_size,
+            long_document=long_document,
+            text_to_text_workers=text_to_text_workers,
+            tts_cache_dir=tts_cache_dir,
+            tts_cache_max_size=tts_cache_max_size,
+            prompt_cache_dir=prompt_cache_dir,
+            prompt_cache_max_size=prompt_cache_max_size,
+            reuse_script=reuse_script,
+            script_cache_dir=script_cache_dir,
+            from_script=from_script,
+            checkpoint=checkpoint,
+            resume=resume,
+            llama_params=llama_params or {},
+            llama_profile=llama_profile,
+            draft_model=draft_model,
+            num_draft_tokens=num_draft_tokens,
+            metrics_events_file=metrics_events_file,
+            profile="cprofile" if profile is True else profile or None,
+            profile_memory=profile_memory,
+            pdf_workers=pdf_workers,
+            max_characters=max_characters,
         )
 
-    output_folder = Path(config.output_folder)
-    output_folder.mkdir(parents=True, exist_ok=True)
+    if server_url:
+        # Imported here, as the server itself builds on this module.
+        from document_to_podcast.server import send_podcast_request
+
+        logger.info(f"Sending job to {server_url}")
+        outputs = send_podcast_request(config, server_url)
+        logger.success(f"Done! Podcast saved to {outputs['podcast_audio']}")
+        return
+
+    generate_podcast(config)
 
-    data_loader = DATA_LOADERS[Path(config.input_file).suffix]
-    logger.info(f"Loading {config.input_file}")
-    raw_text = data_loader(config.input_file)
-    logger.debug(f"Loaded {len(raw_text)} characters")
 
-    data_cleaner = DATA_CLEANERS[Path(config.input_file).suffix]
-    logger.info(f"Cleaning {config.input_file}")
-    clean_text = data_cleaner(raw_text)
-    logger.debug(f"Cleaned {len(raw_text) - len(clean_text)} characters")
+def load_document(
+    input_file: str | Path,
+    metrics: PodcastMetrics | None = None,
+    pdf_workers: int = 0,
+    max_characters: int | None = None,
+) -> str:
+    """
+    Loads and cleans a document, using the functions registered for its extension.
+
+    The document is loaded and cleaned lazily, chunk by chunk, so with
+    `max_characters` only the beginning of it is read.
+
+    Args:
+        input_file (str | Path): The path to the document.
+        metrics (PodcastMetrics | None, optional): If provided, the time spent loading
+            and cleaning is recorded in it. Defaults to None.
+        pdf_workers (int, optional): The number of processes extracting the pages of
+            a PDF. See [iter_pdf_pages][document_to_podcast.preprocessing.data_loaders.iter_pdf_pages].
+            Defaults to 0.
+        max_characters (int | None, optional): If provided, the document is read only
+            until its cleaned text has this number of characters, and the text is cut
+            at the last word fitting in them. Defaults to None.
+
+    Returns:
+        str: The cleaned text of the document.
+    """
+    metrics = metrics or PodcastMetrics()
+    suffix = Path(input_file).suffix
+    chunk_loader = DATA_CHUNK_LOADERS[suffix]
+    if pdf_workers and suffix == ".pdf":
+        chunk_loader = partial(chunk_loader, num_workers=pdf_workers)
+    raw_characters = 0
+    load_seconds = 0.0
+
+    def load_chunks():
+        # The loading is timed apart from the cleaning pulling the chunks.
+        nonlocal raw_characters, load_seconds
+        with closing(chunk_loader(input_file)) as chunks:
+            while True:
+                start = time.perf_counter()
+                with metrics.profile("load_document"):
+                    chunk = next(chunks, None)
+                load_seconds += time.perf_counter() - start
+                if chunk is None:
+                    return
+                raw_characters += len(chunk)
+                yield chunk
+
+    logger.info(f"Loading and cleaning {input_file}")
+    start = time.perf_counter()
+    with metrics.profile("clean_document"):
+        clean_text = join_chunks(
+            DATA_CHUNK_CLEANERS[suffix](load_chunks()), max_characters
+        )
+    if max_characters is not None and len(clean_text) > max_characters:
+        cut = clean_text.rfind(" ", 0, max_characters + 1)
+        clean_text = clean_text[: cut if cut != -1 else max_characters]
+    metrics.add_stage("load_document", load_seconds)
+    metrics.add_stage("clean_document", time.perf_counter() - start - load_seconds)
+    metrics.record(
+        "document", raw_characters=raw_characters, clean_characters=len(clean_text)
+    )
+    logger.debug(f"Loaded {raw_characters} characters")
+    logger.debug(f"Cleaned {raw_characters - len(clean_text)} characters")
     logger.debug(f"Length of cleaned text: {len(clean_text)}")
+    return clean_text
+
+
+def load_speech_model(model_id: str, speakers: list[Speaker]) -> TTSModel:
+    """
+    Loads the text-to-speech model for the language of the speakers.
+
+    Args:
+        model_id (str): The text-to-speech model_id.
+        speakers (list[Speaker]): The speakers of the podcast.
 
-    logger.info(f"Loading {config.text_to_text_model}")
-    text_model = load_llama_cpp_model(model_id=config.text_to_text_model)
+    Raises:
+        ValueError: If the speakers don't share the same language code.
 
-    logger.info(f"Loading {config.text_to_speech_model}")
+    Returns:
+        TTSModel: The loaded model.
+    """
+    logger.info(f"Loading {model_id}")
 
-    if config.speakers[0].voice_profile[0] != config.speakers[1].voice_profile[0]:
+    if speakers[0].voice_profile[0] != speakers[1].voice_profile[0]:
         raise ValueError(
             "Both Kokoro speakers need to have the same language code. "
             "More info here https://huggingface.co/hexgrad/Kokoro-82M/blob/main/VOICES.md"
         )
-    speech_model = load_tts_model(
-        model_id=config.text_to_speech_model,
-        **{"lang_code": config.speakers[0].voice_profile[0]},
+    return load_tts_model(
+        model_id=model_id,
+        **{"lang_code": speakers[0].voice_profile[0]},
     )
 
-    # ~4 characters per token is considered a reasonable default.
-    max_characters = text_model.n_ctx() * 4
-    if len(clean_text) > max_characters:
-        logger.warning(
-            f"Input text is too big ({len(clean_text)})."
-            f" Using only a subset of it ({max_characters})."
-        )
-    clean_text = clean_text[:max_characters]
-
-    logger.info("Generating Podcast...")
-    podcast_script = ""
-    text = ""
-    podcast_audio = []
-    system_prompt = config.text_to_text_prompt.strip()
-    system_prompt = system_prompt.replace(
-        "{SPEAKERS}", "\n".join(str(speaker) for speaker in config.speakers)
+
+def fit_context_size(vocab: "Llama", system_prompt: str, clean_text: str) -> int:
+    """
+    Computes the context size of the text-to-text model for a document.
+
+    Args:
+        vocab (Llama): The text-to-text model, loaded with `vocab_only=True`.
+        system_prompt (str): The system prompt, with the `{SPEAKERS}` already expanded.
+        clean_text (str): The cleaned text of the document.
+
+    Returns:
+        int: The context size. See
+            [get_context_size][document_to_podcast.inference.token_budget.get_context_size].
+    """
+    n_ctx = get_context_size(vocab, system_prompt, clean_text)
+    logger.debug(f"Using a context of {n_ctx} tokens")
+    return n_ctx
+
+
+def get_max_characters(n_ctx: int) -> int | None:
+    """
+    Computes an upper bound of the characters of a document that can fit in the
+    context of the text-to-text model, so the rest of it doesn't need to be read.
+
+    Args:
+        n_ctx (int): The context size the model will be loaded with, or the one it
+            was trained with. 0 if it's unknown.
+
+    Returns:
+        int | None: The number of characters, or None if the context size is unknown.
+    """
+    if not n_ctx:
+        return None
+    return n_ctx * MAX_CHARACTERS_PER_TOKEN
+
+
+def get_script_key(
+    config: Config, vocab: "Llama", system_prompt: str, clean_text: str, n_ctx: int = 0
+) -> str:
+    """
+    Computes the script cache key of a document from the text that will be sent to
+    the text-to-text model.
+
+    Only the text fitting in the context of the model is used for the script, so
+    the key doesn't depend on the rest of the document. With `long_document`, the
+    whole document is condensed to fit the context, so its size is used instead.
+
+    Args:
+        config (Config): The configuration of the podcast.
+        vocab (Llama): The `text_to_text_model`, loaded with `vocab_only=True`.
+        system_prompt (str): The system prompt, with the `{SPEAKERS}` already expanded.
+        clean_text (str): The cleaned text of the document.
+        n_ctx (int, optional): The context size the model is loaded with.
+            If 0, the context size the model was trained with. Defaults to 0.
+
+    Returns:
+        str: The key of the script. See
+            [ScriptCache.get_key][document_to_podcast.inference.script_cache.ScriptCache.get_key].
+    """
+    n_ctx = n_ctx or get_train_context_size(vocab)
+    generation_params = {"long_document": config.long_document}
+    if config.long_document:
+        generation_params["n_ctx"] = n_ctx
+    elif n_ctx:
+        max_tokens = get_input_token_budget(vocab, system_prompt, n_ctx=n_ctx)
+        clean_text = truncate_to_token_budget(clean_text, vocab, max_tokens)
+    return ScriptCache.get_key(
+        clean_text, system_prompt, config.text_to_text_model, **generation_params
     )
-    try:
-        for chunk in text_to_text_stream(
-            clean_text, text_model, system_prompt=system_prompt
+
+
+def generate_podcast(
+    config: Config,
+    text_model_loader: Callable[[], "Llama"] | None = None,
+    speech_model: TTSModel | None = None,
+    prompt_cache: PromptStateCache | None = None,
+) -> None:
+    """
+    Runs all the stages of the podcast generation for a validated `config`.
+
+    Args:
+        config (Config): The configuration of the podcast.
+        text_model_loader (Callable[[], Llama] | None, optional): Returns the
+            `text_to_text_model`, called only when a script needs to be generated.
+            Use it to reuse an already loaded model.
+            If None, the model is loaded from `config.text_to_text_model`. Defaults to None.
+        speech_model (TTSModel | None, optional): An already loaded `text_to_speech_model`,
+            for the language of the speakers. If None, it is loaded. Defaults to None.
+        prompt_cache (PromptStateCache | None, optional): The cache of the state of the
+            `text_to_text_model` after evaluating the system prompt. If None, one is
+            created when `config.prompt_cache_dir` is set. Defaults to None.
+    """
+    output_folder = Path(config.output_folder)
+    output_folder.mkdir(parents=True, exist_ok=True)
+    profiler = None
+    if config.profile or config.profile_memory:
+        profiler = PROFILERS[config.profile or "cprofile"](memory=config.profile_memory)
+    with PodcastMetrics(config.metrics_events_file, profiler) as metrics:
+        if prompt_cache is None and config.prompt_cache_dir:
+            prompt_cache = PromptStateCache(
+                config.prompt_cache_dir, max_size=config.prompt_cache_max_size * 1024**2
+            )
+
+        system_prompt = config.text_to_text_prompt.strip()
+        system_prompt = system_prompt.replace(
+            "{SPEAKERS}", "\n".join(str(speaker) for speaker in config.speakers)
+        )
+
+        journal = None
+        completed_turns = []
+        if config.checkpoint or config.resume:
+            journal = Checkpoint(output_folder / "checkpoint")
+
+        def start_checkpoint(source_text):
+            if journal is None:
+                return []
+            key = ScriptCache.get_key(
+                source_text,
+                system_prompt,
+                config.text_to_text_model,
+                long_document=config.long_document,
+                text_to_speech_model=config.text_to_speech_model,
+                voice_profiles=[speaker.voice_profile for speaker in config.speakers],
+            )
+            return journal.start(key, resume=config.resume)
+
+        script_cache = script_key = None
+        if config.from_script:
+            logger.info(f"Loading script from {config.from_script}")
+            script = Path(config.from_script).read_text()
+            completed_turns = start_checkpoint(script)
+            script_chunks = [script]
+        else:
+            llama_kwargs = get_llama_kwargs(
+                config.text_to_text_model, config.llama_params, config.llama_profile
+            )
+            # The vocabulary is loaded at most once, by the first step that needs it.
+            load_vocab = cache(
+                partial(
+                    load_llama_cpp_model,
+                    model_id=config.text_to_text_model,
+                    vocab_only=True,
+                )
+            )
+            max_characters = config.max_characters
+            if max_characters is None and not config.long_document:
+                # Only the beginning of the document fits in the context anyway.
+                max_characters = get_max_characters(
+                    llama_kwargs.get("n_ctx") or get_train_context_size(load_vocab())
+                )
+            clean_text = load_document(
+                config.input_file, metrics, config.pdf_workers, max_characters
+            )
+            completed_turns = start_checkpoint(clean_text)
+
+            cached_script = None
+            if config.reuse_script:
+                script_cache = ScriptCache(config.script_cache_dir)
+                script_key = get_script_key(
+                    config,
+                    load_vocab(),
+                    system_prompt,
+                    clean_text,
+                    llama_kwargs.get("n_ctx", 0),
+                )
+                cached_script = script_cache.get(script_key)
+
+            if cached_script is not None:
+                logger.info(f"Reusing cached script {script_key}")
+                script_chunks = [cached_script]
+                script_cache = None
+            else:
+                if config.draft_model:
+                    llama_kwargs["draft_model"] = config.draft_model
+                    llama_kwargs["num_draft_tokens"] = config.num_draft_tokens
+                with metrics.stage("load_text_to_text_model"):
+                    if text_model_loader is None:
+                        if "n_ctx" not in llama_kwargs and not config.long_document:
+                            llama_kwargs["n_ctx"] = fit_context_size(
+                                load_vocab(), system_prompt, clean_text
+                            )
+                        if config.draft_model:
+                            llama_kwargs["vocab"] = load_vocab()
+                        logger.info(f"Loading {config.text_to_text_model}")
+                        text_model = load_llama_cpp_model(
+                            model_id=config.text_to_text_model, **llama_kwargs
+                        )
+                    else:
+                        text_model = text_model_loader()
+
+                max_tokens = get_input_token_budget(text_model, system_prompt)
+                fitted_text = truncate_to_token_budget(
+                    clean_text, text_model, max_tokens
+                )
+                if len(fitted_text) < len(clean_text):
+                    if config.long_document:
+                        text_models = [text_model]
+                        condense_threads = nullcontext()
+                        if config.text_to_text_workers > 1:
+                            # Parallel instances share the CPU, so they get a share of the
+                            # threads. The weights are memory mapped, so they are shared too,
+                            # but each instance has its own KV cache, so their context is capped.
+                            # The main model is one of them, so only the others are loaded.
+                            worker_kwargs = split_llama_threads(
+                                llama_kwargs, config.text_to_text_workers
+                            )
+                            worker_kwargs["n_ctx"] = min(
+                                text_model.n_ctx(), MAX_CONDENSE_CONTEXT
+                            )
+                            with metrics.stage("load_text_to_text_model"):
+                                text_models += [
+                                    load_llama_cpp_model(
+                                        model_id=config.text_to_text_model,
+                                        **worker_kwargs,
+                                    )
+                                    for _ in range(config.text_to_text_workers - 1)
+                                ]
+                            condense_threads = limit_llama_threads(
+                                text_model,
+                                worker_kwargs["n_threads"],
+                                worker_kwargs["n_threads_batch"],
+                            )
+                        with metrics.stage("condense_document"), condense_threads:
+                            clean_text = condense_document(
+                                clean_text,
+                                text_models,
+                                system_prompt=DEFAULT_CONDENSE_PROMPT.strip(),
+                                max_characters=len(fitted_text),
+                            )
+                        del text_models
+                        fitted_text = truncate_to_token_budget(
+                            clean_text, text_model, max_tokens
+                        )
+                    else:
+                        logger.warning(
+                            f"Input text is too big ({len(clean_text)})."
+                            f" Using only a subset of it ({len(fitted_text)})."
+                        )
+                clean_text = fitted_text
+                draft_model = text_model.draft_model if config.draft_model else None
+                if completed_turns:
+                    # Continue the script after the completed turns, instead of starting over.
+                    script_prefix = journal.get_script_prefix()
+                    script_chunks = chain(
+                        [script_prefix],
+                        log_generation_speed(
+                            text_to_text_stream(
+                                clean_text,
+                                text_model,
+                                system_prompt=system_prompt,
+                                assistant_prefix=script_prefix,
+                                prompt_cache=prompt_cache,
+                            ),
+                            text_model,
+                            draft_model,
+                            metrics,
+                        ),
+                    )
+                else:
+                    script_chunks = log_generation_speed(
+                        text_to_text_stream(
+                            clean_text,
+                            text_model,
+                            system_prompt=system_prompt,
+                            prompt_cache=prompt_cache,
+                        ),
+                        text_model,
+                        draft_model,
+                        metrics,
+                    )
+
+        with metrics.stage("load_text_to_speech_model"):
+            if speech_model is None:
+                speech_model = load_speech_model(
+                    config.text_to_speech_model, config.speakers
+                )
+
+        logger.info("Generating Podcast...")
+        podcast_script = []
+        voice_profiles = {
+            speaker.id: speaker.voice_profile for speaker in config.speakers
+        }
+        speech_cache = (
+            SpeechCache(
+                config.tts_cache_dir, max_size=config.tts_cache_max_size * 1024**2
+            )
+            if config.tts_cache_dir
+            else None
+        )
+
+        def record_script(chunks):
+            for chunk in chunks:
+                podcast_script.append(chunk)
+                yield chunk
+
+        pending_turns = deque()
+
+        def record_turns(turns):
+            for turn in turns:
+                pending_turns.append(turn)
+                yield turn
+
+        with (
+            metrics.stage("generate_podcast"),
+            AudioSink(
+                output_folder / "podcast.wav",
+                sample_rate=speech_model.sample_rate,
+                silence_pad=1.0,
+            ) as podcast_audio,
         ):
-            text += chunk
-            podcast_script += chunk
-            if text.endswith("\n") and "Speaker" in text:
-                logger.debug(text)
-                speaker_id = re.search(r"Speaker (\d+)", text).group(1)
-                voice_profile = next(
-                    speaker.voice_profile
-                    for speaker in config.speakers
-                    if speaker.id == int(speaker_id)
+            for n in range(len(completed_turns)):
+                with metrics.stage("write_audio"):
+                    podcast_audio.write(journal.get_speech(n))
+            completed = False
+            try:
+                # The completed turns are parsed again, but only the new ones are synthesized.
+                turns = islice(
+                    parse_speaker_turns(record_script(script_chunks)),
+                    len(completed_turns),
+                    None,
                 )
-                speech = text_to_speech(
-                    text.split(f'"Speaker {speaker_id}":')[-1],
+                for speech in pipelined_text_to_speech(
+                    record_turns(turns),
                     speech_model,
-                    voice_profile,
-                )
-                podcast_audio.append(speech)
-                text = ""
-
-    except KeyboardInterrupt:
-        logger.warning("Podcast generation stopped by user.")
-    logger.info("Saving Podcast...")
-    complete_audio = stack_audio_segments(
-        podcast_audio, sample_rate=speech_model.sample_rate, silence_pad=1.0
-    )
+                    voice_profiles,
+                    queue_size=config.tts_queue_size,
+                    num_workers=config.tts_workers,
+                    speech_cache=speech_cache,
+                    metrics=metrics,
+                ):
+                    with metrics.stage("write_audio"):
+                        podcast_audio.write(speech)
+                    speaker_id, text = pending_turns.popleft()
+                    if journal is not None:
+                        journal.add_turn(speaker_id, text, speech)
+                completed = True
+                if script_cache is not None:
+                    script_cache.put(script_key, "".join(podcast_script))
 
-    sf.write(
-        str(output_folder / "podcast.wav"),
-        complete_audio,
-        samplerate=speech_model.sample_rate,
-    )
-    (output_folder / "podcast.txt").write_text(podcast_script)
-    logger.success("Done!")
+            except KeyboardInterrupt:
+                logger.warning("Podcast generation stopped by user.")
+            logger.info("Saving Podcast...")
+        if speech_cache is not None:
+            logger.info(
+                f"Speech cache: {speech_cache.hits} hits, {speech_cache.misses} misses"
+            )
+        (output_folder / "podcast.txt").write_text("".join(podcast_script))
+        if journal is not None and completed:
+            journal.clear()
+        metrics.write(output_folder / "metrics.json")
+        if profiler is not None:
+            profiler.write(output_folder / "profile")
+        logger.success("Done!")
 
 
 def main():
@@ -1,12 +1,15 @@
+from difflib import get_close_matches
 from pathlib import Path
+from typing import Iterable, Literal
 from typing_extensions import Annotated
 
-from pydantic import BaseModel, FilePath
+from pydantic import BaseModel, FilePath, NonNegativeInt, PositiveInt, model_validator
 from pydantic.functional_validators import AfterValidator
 
 from document_to_podcast.inference.model_loaders import TTS_LOADERS
 from document_to_podcast.inference.text_to_speech import TTS_INFERENCE
 from document_to_podcast.preprocessing import DATA_LOADERS
+from document_to_podcast.profiling import PROFILERS
 
 
 DEFAULT_PROMPT = """
@@ -27,6 +30,19 @@ Example:
 }
 """
 
+DEFAULT_CONDENSE_PROMPT = """
+You are a research assistant taking notes on a section of a longer document.
+The notes will later be used to write a podcast about the whole document.
+Instructions:
+- Keep the key ideas, facts, names, figures and memorable quotes.
+- Leave out repetitions, navigation text and boilerplate.
+- Write plain text, without any introduction or conclusion.
+"""
+
+DEFAULT_SCRIPT_CACHE_DIR = "~/.cache/document-to-podcast/scripts"
+
+DEFAULT_LLAMA_PROFILE = "~/.cache/document-to-podcast/llama_profile.json"
+
 DEFAULT_SPEAKERS = [
     {
         "id": 1,
@@ -60,6 +76,12 @@ def validate_text_to_text_model(value):
     return value
 
 
+def validate_draft_model(value):
+    if value != "prompt_lookup":
+        validate_text_to_text_model(value)
+    return value
+
+
 def validate_text_to_text_prompt(value):
     if "{SPEAKERS}" not in value:
         raise ValueError("text_to_text_prompt must contain `{SPEAKERS}` placeholder")
@@ -78,6 +100,12 @@ def validate_text_to_speech_model(value):
     return value
 
 
+def validate_profile(value):
+    if value not in PROFILERS:
+        raise ValueError(f"profile must be one of {list(PROFILERS.keys())}")
+    return value
+
+
 class Speaker(BaseModel):
     id: int
     name: str
@@ -88,10 +116,84 @@ class Speaker(BaseModel):
         return f"Speaker {self.id}. Named {self.name}. {self.description}"
 
 
+class LlamaParams(BaseModel):
+    """
+    Runtime parameters of llama.cpp. Those left as None use the value of the
+    `llama_profile` written by `document-to-podcast-tune`, or the llama.cpp default.
+
+    `n_ctx=None` sizes the context to the input, while `n_ctx=0` uses the context
+    length the model was trained with.
+    """
+
+    n_ctx: NonNegativeInt | None = None
+    n_threads: PositiveInt | None = None
+    n_threads_batch: PositiveInt | None = None
+    n_batch: PositiveInt | None = None
+    n_ubatch: PositiveInt | None = None
+    use_mmap: bool | None = None
+    use_mlock: bool | None = None
+    flash_attn: bool | None = None
+    type_k: Literal["f16", "q8_0", "q4_0"] | None = None
+    type_v: Literal["f16", "q8_0", "q4_0"] | None = None
+
+
 class Config(BaseModel):
-    input_file: Annotated[FilePath, AfterValidator(validate_input_file)]
+    input_file: Annotated[FilePath, AfterValidator(validate_input_file)] | None = None
     output_folder: str
     text_to_text_model: Annotated[str, AfterValidator(validate_text_to_text_model)]
     text_to_text_prompt: Annotated[str, AfterValidator(validate_text_to_text_prompt)]
     text_to_speech_model: Annotated[str, AfterValidator(validate_text_to_speech_model)]
     speakers: list[Speaker]
+    tts_workers: Literal[0, 1] = 1
+    tts_queue_size: PositiveInt = 2
+    long_document: bool = False
+    text_to_text_workers: PositiveInt = 1
+    tts_cache_dir: str | None = None
+    tts_cache_max_size: PositiveInt = 1024
+    prompt_cache_dir: str | None = None
+    prompt_cache_max_size: PositiveInt = 4096
+    reuse_script: bool = False
+    script_cache_dir: str = DEFAULT_SCRIPT_CACHE_DIR
+    from_script: FilePath | None = None
+    checkpoint: bool = False
+    resume: bool = False
+    llama_params: LlamaParams = LlamaParams()
+    llama_profile: str | None = DEFAULT_LLAMA_PROFILE
+    draft_model: Annotated[str, AfterValidator(validate_draft_model)] | None = None
+    num_draft_tokens: PositiveInt = 10
+    metrics_events_file: str | None = None
+    profile: Annotated[str, AfterValidator(validate_profile)] | None = None
+    profile_memory: bool = False
+    pdf_workers: NonNegativeInt = 0
+    max_characters: PositiveInt | None = None
+
+    @model_validator(mode="after")
+    def validate_input(self):
+        if self.input_file is None and self.from_script is None:
+            raise ValueError("Either input_file or from_script must be provided")
+        return self
+
+
+def validate_option_names(names: Iterable[str]) -> None:
+    """
+    Checks that the options forwarded to a `Config` (e.g. the `**options` of
+    `document_to_podcast_batch`) are fields of it, so a misspelled option fails up
+    front instead of being ignored.
+
+    Args:
+        names (Iterable[str]): The names of the options.
+
+    Raises:
+        ValueError: If any of them is not a field of `Config`.
+    """
+    errors = []
+    for name in names:
+        if name in Config.model_fields:
+            continue
+        error = f"Unknown option {name!r}"
+        suggestions = get_close_matches(name, Config.model_fields, n=1)
+        if suggestions:
+            error += f" (did you mean {suggestions[0]!r}?)"
+        errors.append(error)
+    if errors:
+        raise ValueError(". ".join(errors))
@@ -0,0 +1,222 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from queue import Queue
+from typing import TYPE_CHECKING
+
+from loguru import logger
+
+from document_to_podcast.inference.text_to_text import text_to_text
+from document_to_podcast.inference.token_budget import (
+    get_input_token_budget,
+    truncate_to_token_budget,
+)
+
+if TYPE_CHECKING:
+    from llama_cpp import Llama
+
+# The context size of the instances condensing sections in parallel. Each instance
+# allocates its own KV cache, so they are not loaded with the full context of the
+# model; sections are sized to fit this context instead.
+MAX_CONDENSE_CONTEXT = 8192
+
+
+def split_llama_threads(llama_kwargs: dict, num_workers: int) -> dict:
+    """
+    Divide the threads of a model between `num_workers` instances running in parallel.
+
+    Each instance of llama.cpp uses its own threads, so running several of them with
+    the default thread counts oversubscribes the CPU and slows all of them down.
+
+    Args:
+        llama_kwargs (dict): The keyword arguments used to load a single instance.
+            If `n_threads` or `n_threads_batch` are not set, the llama.cpp defaults
+            (half of the CPUs and all of them, respectively) are divided.
+        num_workers (int): The number of instances that will run in parallel.
+
+    Returns:
+        dict: A copy of `llama_kwargs` with the divided thread counts.
+    """
+    cpu_count = os.cpu_count() or 1
+    n_threads = llama_kwargs.get("n_threads") or max(cpu_count // 2, 1)
+    n_threads_batch = llama_kwargs.get("n_threads_batch") or cpu_count
+    return {
+        **llama_kwargs,
+        "n_threads": max(n_threads // num_workers, 1),
+        "n_threads_batch": max(n_threads_batch // num_workers, 1),
+    }
+
+
+@contextmanager
+def limit_llama_threads(model: "Llama", n_threads: int, n_threads_batch: int):
+    """
+    Temporarily run a loaded model with other thread counts.
+
+    Used to run the main model as one of the instances condensing sections in
+    parallel, with its share of the threads, without loading it again.
+
+    Args:
+        model (Llama): The loaded model.
+        n_threads (int): The number of threads used for the generation.
+        n_threads_batch (int): The number of threads used for the prompt evaluation.
+    """
+    import llama_cpp
+
+    llama_cpp.llama_set_n_threads(model.ctx, n_threads, n_threads_batch)
+    try:
+        yield model
+    finally:
+        llama_cpp.llama_set_n_threads(model.ctx, model.n_threads, model.n_threads_batch)
+
+
+def split_into_sections(text: str, max_characters: int) -> list[str]:
+    """
+    Split text into sections of at most `max_characters`.
+
+    Sections are cut at the end of a sentence when possible, otherwise at the last
+    space, so that words are not broken in half.
+
+    Examples:
+        >>> split_into_sections("First sentence. Second sentence.", max_characters=20)
+        ["First sentence.", "Second sentence."]
+
+    Args:
+        text (str): The text to split.
+        max_characters (int): The maximum number of characters of each section.
+
+    Returns:
+        list[str]: The sections, in order.
+    """
+    sections = []
+    text = text.strip()
+    while len(text) > max_characters:
+        cut = _find_cut(text, max_characters)
+        sections.append(text[:cut].strip())
+        text = text[cut:].lstrip()
+    sections.append(text)
+    return [section for section in sections if section]
+
+
+def split_into_token_sections(text: str, model: "Llama", max_tokens: int) -> list[str]:
+    """
+    Split text into sections of at most `max_tokens`, measured with the tokenizer
+    of the model.
+
+    Sections are cut like in [split_into_sections][document_to_podcast.inference.long_document.split_into_sections],
+    inside the longest prefix that fits in `max_tokens`.
+
+    Args:
+        text (str): The text to split.
+        model (Llama): The model whose tokenizer will be used.
+        max_tokens (int): The maximum number of tokens of each section.
+
+    Returns:
+        list[str]: The sections, in order.
+    """
+    sections = []
+    text = text.strip()
+    while text:
+        prefix = truncate_to_token_budget(text, model, max_tokens)
+        if len(prefix) == len(text):
+            sections.append(text)
+            break
+        cut = _find_cut(text, max(len(prefix), 1))
+        sections.append(text[:cut].strip())
+        text = text[cut:].lstrip()
+    return [section for section in sections if section]
+
+
+def _find_cut(text: str, max_characters: int) -> int:
+    cut = text.rfind(". ", 0, max_characters)
+    if cut != -1:
+        cut += 1
+    else:
+        cut = text.rfind(" ", 0, max_characters)
+    if cut <= 0:
+        cut = max_characters
+    return cut
+
+
+def condense_sections(
+    sections: list[str], models: "list[Llama]", system_prompt: str
+) -> list[str]:
+    """
+    Condense each section into notes, processing the sections concurrently.
+
+    Each model instance handles one section at a time, so the number of sections
+    condensed in parallel is the number of `models`.
+
+    Args:
+        sections (list[str]): The sections to condense.
+        models (list[Llama]): The pool of model instances to use.
+        system_prompt (str): The system prompt to use for condensation.
+
+    Returns:
+        list[str]: The notes of each section, in the same order as `sections`.
+    """
+    pool: "Queue[Llama]" = Queue()
+    for model in models:
+        pool.put(model)
+
+    def condense(n: int, section: str) -> str:
+        model = pool.get()
+        try:
+            logger.debug(f"Condensing section {n + 1}/{len(sections)}")
+            return text_to_text(
+                section, model, system_prompt=system_prompt, return_json=False
+            )
+        finally:
+            pool.put(model)
+
+    with ThreadPoolExecutor(max_workers=len(models)) as executor:
+        return list(executor.map(condense, range(len(sections)), sections))
+
+
+def condense_document(
+    text: str,
+    models: "list[Llama]",
+    system_prompt: str,
+    max_characters: int,
+    section_tokens: int | None = None,
+) -> str:
+    """
+    Condense a document that doesn't fit in the context of the model (map-reduce).
+
+    The document is split into sections of at most `section_tokens`, each section
+    is condensed into notes and the notes are merged. This is repeated until the merged
+    notes fit in `max_characters`.
+
+    Args:
+        text (str): The document to condense.
+        models (list[Llama]): The pool of model instances to use.
+            The sections are sized for the smallest context of them.
+        system_prompt (str): The system prompt to use for condensation.
+        max_characters (int): The maximum number of characters of the returned notes.
+        section_tokens (int | None, optional): The maximum number of tokens of each
+            section. Defaults to the tokens that fit in the context of all the models
+            along with the condensation `system_prompt` and the notes. See
+            [get_input_token_budget][document_to_podcast.inference.token_budget.get_input_token_budget].
+
+    Returns:
+        str: The merged notes of the whole document.
+
+    Raises:
+        ValueError: If no text fits in the context along with the `system_prompt`.
+    """
+    if section_tokens is None:
+        section_tokens = min(
+            get_input_token_budget(model, system_prompt) for model in models
+        )
+    if section_tokens <= 0:
+        raise ValueError(
+            "The condensation prompt doesn't fit in the context of the model."
+        )
+    while len(text) > max_characters:
+        sections = split_into_token_sections(text, models[0], section_tokens)
+        logger.info(f"Condensing {len(text)} characters in {len(sections)} sections")
+        notes = "\n".join(condense_sections(sections, models, system_prompt))
+        if len(notes) >= len(text):
+            logger.warning("Condensed notes are not shorter than the input.")
+            return notes[:max_characters]
+        text = notes
+    return text
@@ -1,10 +1,25 @@
-import torch
-from kokoro import KPipeline
-from llama_cpp import Llama
 from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
 
+from loguru import logger
 
-def load_llama_cpp_model(model_id: str) -> Llama:
+# The backends are imported by the loaders, so they are only loaded when needed.
+if TYPE_CHECKING:
+    from kokoro import KPipeline
+    from llama_cpp import Llama
+
+# The speculative decoding keeps the logits of every position of the context, which
+# take `n_ctx * n_vocab` floats, so the context is capped to keep them under this size.
+MAX_LOGITS_MEMORY = 4 * 1024**3
+
+
+def load_llama_cpp_model(
+    model_id: str,
+    draft_model: str | None = None,
+    num_draft_tokens: int = 10,
+    vocab: "Llama | None" = None,
+    **kwargs,
+) -> "Llama":
     """
     Loads the given model_id using Llama.from_pretrained.
 
@@ -14,21 +29,89 @@ def load_llama_cpp_model(model_id: str) -> Llama:
     Args:
         model_id (str): The model id to load.
             Format is expected to be `{org}/{repo}/{filename}`.
+        draft_model (str | None, optional): Enables speculative decoding, with either
+            `prompt_lookup` or the model_id of a small GGUF sharing the vocabulary of
+            `model_id`. See [load_draft_model][document_to_podcast.inference.speculative.load_draft_model].
+            Its stats are available in `model.draft_model`. Defaults to None.
+        num_draft_tokens (int, optional): The number of tokens drafted at each step
+            of the speculative decoding. Defaults to 10.
+            With a `draft_model`, the context is capped so that the logits of every
+            position fit in `MAX_LOGITS_MEMORY`.
+        vocab (Llama | None, optional): `model_id` already loaded with `vocab_only=True`,
+            reused to cap the context with a `draft_model`. If None, it is loaded.
+            Defaults to None.
+        kwargs: Any other argument of `Llama` (e.g. `n_threads`), overriding the defaults.
 
     Returns:
         Llama: The loaded model.
     """
+    import torch
+    from llama_cpp import Llama
+
+    if draft_model is not None:
+        from document_to_podcast.inference.speculative import load_draft_model
+
+        if vocab is None:
+            vocab = load_llama_cpp_model(model_id, vocab_only=True)
+        kwargs["n_ctx"] = _fit_logits_memory(vocab, kwargs.get("n_ctx", 0))
+        draft_kwargs = {
+            key: kwargs[key]
+            for key in ["n_ctx", "n_threads", "n_threads_batch"]
+            if key in kwargs
+        }
+        kwargs["draft_model"] = load_draft_model(
+            draft_model, num_draft_tokens, **draft_kwargs
+        )
+        # The drafted tokens are verified in a single batch, which needs the logits
+        # of every position.
+        kwargs["logits_all"] = True
+
     org, repo, filename = model_id.split("/")
     model = Llama.from_pretrained(
         repo_id=f"{org}/{repo}",
         filename=filename,
-        n_ctx=0,  # 0 means that the model limit will be used, instead of the default (512) or other hardcoded value
-        verbose=False,
-        n_gpu_layers=-1 if torch.cuda.is_available() else 0,
+        **{
+            "n_ctx": 0,  # 0 means that the model limit will be used, instead of the default (512) or other hardcoded value
+            "verbose": False,
+            "n_gpu_layers": -1 if torch.cuda.is_available() else 0,
+            **kwargs,
+        },
     )
     return model
 
 
+def _fit_logits_memory(vocab: "Llama", n_ctx: int) -> int:
+    """
+    Caps the context size so that the logits of every position fit in
+    `MAX_LOGITS_MEMORY`.
+
+    Args:
+        vocab (Llama): The model, loaded with `vocab_only=True`.
+        n_ctx (int): The requested context size, 0 meaning the model limit.
+
+    Returns:
+        int: The context size to load the model with.
+    """
+    from document_to_podcast.inference.token_budget import get_train_context_size
+
+    n_ctx = n_ctx or get_train_context_size(vocab)
+    if not n_ctx:
+        return 0
+    row_size = vocab.n_vocab() * 4  # float32
+    logger.info(
+        f"Speculative decoding needs {n_ctx * row_size / 1024**3:.1f} GB"
+        f" for the logits of {n_ctx} positions"
+    )
+    if n_ctx * row_size <= MAX_LOGITS_MEMORY:
+        return n_ctx
+    max_n_ctx = MAX_LOGITS_MEMORY // row_size // 256 * 256
+    logger.warning(
+        f"Capping the context from {n_ctx} to {max_n_ctx} tokens, to keep the logits"
+        f" under {MAX_LOGITS_MEMORY / 1024**3:.1f} GB"
+    )
+    return max_n_ctx
+
+
 @dataclass
 class TTSModel:
     """
@@ -45,7 +128,7 @@ class TTSModel:
         custom_args (dict): Any model-specific arguments that a TTS model might require, e.g. tokenizer.
     """
 
-    model: KPipeline
+    model: "KPipeline"
     model_id: str
     sample_rate: int
     custom_args: field(default_factory=dict)
@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from os.path import commonprefix
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+from loguru import logger
+
+from document_to_podcast.inference.text_to_text import format_chat_prompt
+
+if TYPE_CHECKING:
+    from llama_cpp import Llama, LlamaState
+
+# Context settings that change the layout of the saved state, so a state saved with
+# other values can't be loaded.
+STATE_SETTINGS = ("type_k", "type_v", "flash_attn", "logits_all")
+
+
+class PromptStateCache:
+    """
+    Cache for the llama.cpp state after evaluating a system prompt.
+
+    The most recently used states are kept in memory and, if `cache_dir` is given,
+    they are also stored on disk, so the prefill of the same system prompt can be
+    skipped across runs.
+    When the total size of the files goes over `max_size`, the least recently used
+    ones are removed.
+
+    Examples:
+        >>> cache = PromptStateCache("~/.cache/document-to-podcast/prompts")
+        >>> text_to_text_stream(clean_text, model, system_prompt, prompt_cache=cache)
+
+    Args:
+        cache_dir (str | Path | None, optional): The folder where the states are stored.
+            If None, the states are only kept in memory. Defaults to None.
+        max_size (int, optional): The maximum size of the files in `cache_dir`, in bytes.
+            Defaults to 4 GB.
+        max_states_in_memory (int, optional): The number of states kept in memory.
+            Defaults to 2.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | Path | None = None,
+        max_size: int = 4 * 1024**3,
+        max_states_in_memory: int = 2,
+    ):
+        self.cache_dir = None
+        if cache_dir is not None:
+            self.cache_dir = Path(cache_dir).expanduser()
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.max_states_in_memory = max_states_in_memory
+        self.hits = 0
+        self.misses = 0
+        self._states: OrderedDict[str, "LlamaState"] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_key(
+        model_path: str, tokens: list[int], settings: dict | None = None
+    ) -> str:
+        """
+        Computes the cache key of a state.
+
+        Args:
+            model_path (str): The path of the model file.
+            tokens (list[int]): The evaluated tokens.
+            settings (dict | None, optional): The context settings the state depends
+                on, see `get_state_settings`. Defaults to None.
+
+        Returns:
+            str: The hex digest identifying the state.
+        """
+        content = model_path.encode("utf-8") + b"\0"
+        if settings:
+            content += json.dumps(settings, sort_keys=True, default=str).encode()
+            content += b"\0"
+        content += np.asarray(tokens, dtype=np.int32).tobytes()
+        return hashlib.sha256(content).hexdigest()
+
+    def get(self, key: str) -> "LlamaState | None":
+        """
+        Looks up a state, in memory first and then on disk.
+
+        Args:
+            key (str): The cache key of the state.
+
+        Returns:
+            LlamaState | None: The state, or None if it's not cached.
+        """
+        with self._lock:
+            state = self._states.get(key)
+            if state is not None:
+                self._states.move_to_end(key)
+                self.hits += 1
+                return state
+        if self.cache_dir is not None:
+            path = self.cache_dir / f"{key}.state"
+            try:
+                with open(path, "rb") as file:
+                    state = pickle.load(file)
+                # Mark the file as recently used, for the eviction.
+                os.utime(path)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                state = None
+        with self._lock:
+            if state is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, state)
+        return state
+
+    def put(self, key: str, state: "LlamaState") -> None:
+        """
+        Stores a state, evicting the least recently used ones if needed.
+
+        Args:
+            key (str): The cache key of the state.
+            state (LlamaState): The state, as returned by `Llama.save_state`.
+        """
+        # Only the logits of the last token are used, and `Llama.load_state`
+        # broadcasts them to all rows, so the other ones are not stored.
+        state.scores = state.scores[-1:].copy()
+        with self._lock:
+            self._remember(key, state)
+        if self.cache_dir is None:
+            return
+        path = self.cache_dir / f"{key}.state"
+        tmp_path = path.with_name(f"{key}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._evict()
+
+    def discard(self, key: str) -> None:
+        """
+        Removes a state, both from memory and from disk.
+
+        Args:
+            key (str): The cache key of the state.
+        """
+        with self._lock:
+            self._states.pop(key, None)
+        if self.cache_dir is not None:
+            (self.cache_dir / f"{key}.state").unlink(missing_ok=True)
+
+    def _remember(self, key: str, state: "LlamaState") -> None:
+        self._states[key] = state
+        self._states.move_to_end(key)
+        while len(self._states) > self.max_states_in_memory:
+            self._states.popitem(last=False)
+
+    def _evict(self) -> None:
+        files = sorted(
+            (file.stat().st_mtime, file.stat().st_size, file)
+            for file in self.cache_dir.glob("*.state")
+        )
+        size = sum(size for _, size, _ in files)
+        for _, file_size, file in files:
+            if size <= self.max_size:
+                break
+            try:
+                file.unlink()
+            except OSError as e:
+                logger.warning(f"Could not evict {file}: {e}")
+                continue
+            size -= file_size
+
+
+def get_state_settings(model: "Llama") -> dict:
+    """
+    Collects the context settings of the model that its saved states depend on.
+
+    Args:
+        model (Llama): The model.
+
+    Returns:
+        dict: The value of each of `STATE_SETTINGS` (None when not available), and
+            `draft_n_ctx`, the context size of the speculative decoding, which is
+            capped to fit its logits in memory (None without a draft model).
+    """
+    settings = {
+        name: getattr(model.context_params, name, None) for name in STATE_SETTINGS
+    }
+    if settings["logits_all"] is None:
+        # Newer versions of llama-cpp-python keep it out of the context params.
+        settings["logits_all"] = getattr(model, "_logits_all", None)
+    draft_model = getattr(model, "draft_model", None)
+    settings["draft_n_ctx"] = model.n_ctx() if draft_model is not None else None
+    return settings
+
+
+def prefill_system_prompt(
+    model: "Llama", system_prompt: str, input_text: str, cache: PromptStateCache
+) -> None:
+    """
+    Loads the state of the model after evaluating the system prompt from `cache`,
+    evaluating and storing it if missing.
+
+    The next completion with the same messages then only evaluates the rest of the
+    prompt, as llama.cpp reuses the longest prefix already evaluated.
+
+    Args:
+        model (Llama): The model that will be used for the completion.
+        system_prompt (str): The system prompt of the completion.
+        input_text (str): The user message of the completion.
+        cache (PromptStateCache): The cache to use.
+    """
+    system_message = {"role": "system", "content": system_prompt}
+    prompt = format_chat_prompt(
+        model, [system_message, {"role": "user", "content": input_text}]
+    )
+    system_prefix = format_chat_prompt(
+        model, [system_message], add_generation_prompt=False
+    )
+    prefix = commonprefix([prompt, system_prefix])
+    # The last token might be merged with the following text in the full prompt.
+    tokens = model.tokenize(prefix.encode("utf-8"), add_bos=False, special=True)[:-1]
+    if not tokens:
+        return
+    if (
+        model.n_tokens >= len(tokens)
+        and model.input_ids[: len(tokens)].tolist() == tokens
+    ):
+        # Already evaluated by the previous completion.
+        return
+
+    key = cache.get_key(model.model_path, tokens, get_state_settings(model))
+    state = cache.get(key)
+    if state is not None:
+        logger.debug(f"Reusing the state of {len(tokens)} system prompt tokens")
+        try:
+            model.load_state(state)
+            return
+        except RuntimeError as e:
+            logger.warning(f"Could not load the cached state, evaluating again: {e}")
+            cache.discard(key)
+    model.reset()
+    model.eval(tokens)
+    cache.put(key, model.save_state())
@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+
+class ScriptCache:
+    """
+    On-disk cache for generated podcast scripts.
+
+    Each script is stored as a text file named after the hash of everything that
+    determines it (see [get_key][document_to_podcast.inference.script_cache.ScriptCache.get_key]),
+    so the text-to-text model doesn't need to be loaded at all to regenerate only
+    the audio of a podcast.
+
+    Examples:
+        >>> cache = ScriptCache("~/.cache/document-to-podcast/scripts")
+        >>> key = cache.get_key(clean_text, system_prompt, text_to_text_model)
+        >>> podcast_script = cache.get(key)
+
+    Args:
+        cache_dir (str | Path): The folder where the scripts are stored.
+    """
+
+    def __init__(self, cache_dir: str | Path):
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def get_key(
+        clean_text: str, system_prompt: str, model_id: str, **generation_params
+    ) -> str:
+        """
+        Computes the cache key of a script.
+
+        Args:
+            clean_text (str): The text of the document sent to the model, i.e. the
+                cleaned text truncated to the context of the model.
+            system_prompt (str): The system prompt, with the `{SPEAKERS}` already expanded.
+            model_id (str): The text-to-text model_id.
+            **generation_params: Any other parameter that changes the generated script
+                (e.g. sampling parameters).
+
+        Returns:
+            str: The hex digest identifying the script.
+        """
+        content = json.dumps(
+            [clean_text, system_prompt, model_id, generation_params], sort_keys=True
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        """
+        Looks up a script in the cache.
+
+        Args:
+            key (str): The cache key of the script.
+
+        Returns:
+            str | None: The script, or None if it's not cached.
+        """
+        path = self.cache_dir / f"{key}.txt"
+        if not path.exists():
+            return None
+        return path.read_text()
+
+    def put(self, key: str, script: str) -> None:
+        """
+        Stores a script in the cache.
+
+        Args:
+            key (str): The cache key of the script.
+            script (str): The podcast script.
+        """
+        path = self.cache_dir / f"{key}.txt"
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(script)
+        os.replace(tmp_path, path)
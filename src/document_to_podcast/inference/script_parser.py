@@ -0,0 +1,140 @@
+import json
+import re
+from typing import Iterable, Iterator
+
+from loguru import logger
+
+_SPEAKER_KEY = re.compile(r"Speaker (\d+)")
+_STRING_SPECIAL = re.compile(r'["\\]')
+_STRUCTURAL = re.compile(r'["{}\[\]:,]')
+
+
+class SpeakerTurnParser:
+    """
+    Incremental parser for the JSON podcast scripts generated by the text-to-text model.
+
+    The chunks streamed by the model are fed as they arrive, and a `(speaker_id, text)`
+    event is returned as soon as the string value of a `"Speaker {id}"` key is closed,
+    without waiting for a new line or for the end of the script.
+    Each chunk is scanned only once, so parsing the whole script is linear in its length.
+
+    JSON escapes (e.g. `\\"` or `\\n`) are decoded in the returned text, and the parser
+    only relies on the structure of the JSON, so turns can be split across chunks in
+    any way and don't need to be separated by new lines.
+
+    Examples:
+        >>> parser = SpeakerTurnParser()
+        >>> parser.feed('{"Speaker 1": "Welcome to our')
+        []
+        >>> parser.feed(' podcast.", "Speaker 2": "Hi!"}')
+        [(1, "Welcome to our podcast."), (2, "Hi!")]
+    """
+
+    def __init__(self):
+        self._containers: list[str] = []
+        self._expect_key = False
+        self._in_string = False
+        self._escape = False
+        self._string: list[str] = []
+        self._key: str | None = None
+
+    def feed(self, chunk: str) -> list[tuple[int, str]]:
+        """
+        Parse the next chunk of the script.
+
+        Args:
+            chunk (str): The next chunk of the script.
+
+        Returns:
+            list[tuple[int, str]]: The speaker id and the text of the turns completed
+                in this chunk, in order.
+        """
+        turns = []
+        position = 0
+        while position < len(chunk):
+            if self._in_string:
+                if self._escape:
+                    self._string.append(chunk[position])
+                    self._escape = False
+                    position += 1
+                    continue
+                match = _STRING_SPECIAL.search(chunk, position)
+                if match is None:
+                    self._string.append(chunk[position:])
+                    break
+                self._string.append(chunk[position : match.start()])
+                if match.group() == "\\":
+                    self._string.append("\\")
+                    self._escape = True
+                else:
+                    self._in_string = False
+                    turn = self._close_string()
+                    if turn is not None:
+                        turns.append(turn)
+                position = match.end()
+            else:
+                match = _STRUCTURAL.search(chunk, position)
+                if match is None:
+                    break
+                self._handle_structural(match.group())
+                position = match.end()
+        return turns
+
+    def _handle_structural(self, character: str) -> None:
+        if character == '"':
+            self._in_string = True
+            self._string = []
+        elif character == "{":
+            self._containers.append("{")
+            self._expect_key = True
+        elif character == "[":
+            self._containers.append("[")
+            self._expect_key = False
+        elif character in "}]":
+            if self._containers:
+                self._containers.pop()
+            self._expect_key = False
+        elif character == ":":
+            self._expect_key = False
+        elif character == ",":
+            self._expect_key = bool(self._containers) and self._containers[-1] == "{"
+
+    def _close_string(self) -> tuple[int, str] | None:
+        raw = "".join(self._string)
+        self._string = []
+        try:
+            value = json.loads(f'"{raw}"', strict=False)
+        except json.JSONDecodeError:
+            value = raw
+        if self._expect_key:
+            self._key = value
+            return None
+        key, self._key = self._key, None
+        if key is None:
+            return None
+        speaker = _SPEAKER_KEY.search(key)
+        if speaker is None:
+            return None
+        logger.debug(f"{key}: {value}")
+        return int(speaker.group(1)), value
+
+
+def parse_speaker_turns(chunks: Iterable[str]) -> Iterator[tuple[int, str]]:
+    """
+    Yield the speaker turns of a podcast script as the chunks are streamed.
+
+    Examples:
+        >>> chunks = text_to_text_stream(clean_text, text_model, system_prompt)
+        >>> for speaker_id, text in parse_speaker_turns(chunks):
+        ...     print(speaker_id, text)
+
+    Args:
+        chunks (Iterable[str]): The chunks of the podcast script, as yielded by
+            [text_to_text_stream][document_to_podcast.inference.text_to_text.text_to_text_stream].
+
+    Yields:
+        tuple[int, str]: The speaker id and the text of each turn, as soon as it's complete.
+    """
+    parser = SpeakerTurnParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
@@ -0,0 +1,145 @@
+import numpy as np
+import numpy.typing as npt
+from llama_cpp import Llama
+from llama_cpp.llama_speculative import LlamaDraftModel, LlamaPromptLookupDecoding
+
+from document_to_podcast.inference.model_loaders import load_llama_cpp_model
+
+PROMPT_LOOKUP = "prompt_lookup"
+
+
+class GGUFDraftModel(LlamaDraftModel):
+    """
+    Drafts tokens with a smaller model sharing the vocabulary of the main one
+    (e.g. Qwen2.5-0.5B-Instruct for Qwen2.5-7B-Instruct).
+
+    The draft model keeps its own context and only evaluates the tokens that changed
+    since the previous draft.
+
+    Args:
+        model (Llama): The draft model.
+        num_pred_tokens (int, optional): The number of tokens drafted at each step.
+            Defaults to 10.
+    """
+
+    def __init__(self, model: Llama, num_pred_tokens: int = 10):
+        self.model = model
+        self.num_pred_tokens = num_pred_tokens
+
+    def __call__(self, input_ids: npt.NDArray[np.intc], /, **kwargs) -> npt.NDArray:
+        model = self.model
+        # Keep the longest prefix already evaluated, but always evaluate the last
+        # token, so there are logits to sample the draft from.
+        n_prefix = min(model.n_tokens, len(input_ids) - 1)
+        mismatches = np.nonzero(model.input_ids[:n_prefix] != input_ids[:n_prefix])[0]
+        if len(mismatches):
+            n_prefix = int(mismatches[0])
+        model.n_tokens = n_prefix
+        model.eval(input_ids[n_prefix:].tolist())
+
+        draft = []
+        while len(draft) < self.num_pred_tokens and model.n_tokens < model.n_ctx():
+            token = model.sample(temp=0.0)
+            if model.token_eos() == token:
+                break
+            draft.append(token)
+            if len(draft) < self.num_pred_tokens:
+                model.eval([token])
+        return np.array(draft, dtype=np.intc)
+
+
+class CountingDraftModel(LlamaDraftModel):
+    """
+    Wraps a draft model, counting how many of its tokens are accepted by the main model.
+
+    A draft token is accepted when the main model samples the same token at its
+    position, so the first mismatch ends the accepted part of each draft.
+    The outcome of a draft is known from the input of the next one, so `finish` must
+    be called at the end of each generation to count the last draft.
+
+    Args:
+        draft_model (LlamaDraftModel): The draft model.
+    """
+
+    def __init__(self, draft_model: LlamaDraftModel):
+        self.draft_model = draft_model
+        self.n_drafted = 0
+        self.n_accepted = 0
+        self._first_position: int | None = None
+        self._last_draft: tuple[int, npt.NDArray] | None = None
+
+    def __call__(self, input_ids: npt.NDArray[np.intc], /, **kwargs) -> npt.NDArray:
+        if self._last_draft is not None and len(input_ids) <= self._last_draft[0]:
+            # A new generation started without `finish`, the last draft is unknown.
+            self._first_position = self._last_draft = None
+        if self._first_position is None:
+            self._first_position = len(input_ids)
+        if self._last_draft is not None:
+            # The tokens after the previous draft position are the ones kept.
+            position, last_draft = self._last_draft
+            kept = input_ids[position : position + len(last_draft)]
+            matches = kept == last_draft[: len(kept)]
+            self._count(len(matches) if matches.all() else int(np.argmin(matches)))
+        draft = self.draft_model(input_ids, **kwargs)
+        self._last_draft = (len(input_ids), np.array(draft))
+        return draft
+
+    def finish(self, n_generated: int) -> None:
+        """
+        Counts the last draft of a generation, once it ends.
+
+        No draft follows the last one, so the number of generated tokens tells how
+        many of its positions were kept. An end of generation sampled in their place
+        is not a generated token, so it counts as rejected.
+
+        Args:
+            n_generated (int): The number of tokens generated by the main model.
+        """
+        if self._last_draft is not None:
+            # The first draft is made after sampling the first token.
+            n_tokens = self._first_position - 1 + n_generated
+            n_kept = n_tokens - self._last_draft[0]
+            self._count(min(max(n_kept, 0), len(self._last_draft[1])))
+        self._first_position = None
+
+    def _count(self, n_accepted: int) -> None:
+        self.n_drafted += len(self._last_draft[1])
+        self.n_accepted += n_accepted
+        self._last_draft = None
+
+    @property
+    def acceptance_rate(self) -> float:
+        """
+        The fraction of the drafted tokens that were accepted.
+        """
+        return self.n_accepted / self.n_drafted if self.n_drafted else 0.0
+
+
+def load_draft_model(
+    draft_model: str, num_draft_tokens: int = 10, **kwargs
+) -> CountingDraftModel:
+    """
+    Loads a draft model for the speculative decoding of `llama_cpp.Llama`.
+
+    Examples:
+        >>> draft_model = load_draft_model("prompt_lookup")
+        >>> model = Llama(model_path, draft_model=draft_model, logits_all=True)
+
+    Args:
+        draft_model (str): Either `prompt_lookup`, to draft the tokens that followed
+            the last ones when they previously appeared in the prompt (which is
+            frequent, as a podcast script quotes and paraphrases its document), or
+            the model_id of a small GGUF, formatted as `owner/repo/file`.
+        num_draft_tokens (int, optional): The number of tokens drafted at each step.
+            Defaults to 10.
+        kwargs: Any other argument of `Llama` for the draft GGUF (e.g. `n_ctx`).
+
+    Returns:
+        CountingDraftModel: The draft model, counting its accepted tokens.
+    """
+    if draft_model == PROMPT_LOOKUP:
+        return CountingDraftModel(
+            LlamaPromptLookupDecoding(num_pred_tokens=num_draft_tokens)
+        )
+    model = load_llama_cpp_model(draft_model, **kwargs)
+    return CountingDraftModel(GGUFDraftModel(model, num_pred_tokens=num_draft_tokens))
@@ -0,0 +1,166 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+from document_to_podcast.inference.model_loaders import TTSModel
+from document_to_podcast.inference.text_to_speech import text_to_speech
+
+
+class SpeechCache:
+    """
+    Content-addressed, on-disk cache for synthesized speech.
+
+    Each waveform is stored as a float32 `.npy` file named after the hash of everything
+    that determines it (see [get_key][document_to_podcast.inference.speech_cache.SpeechCache.get_key]),
+    and read back through memory mapping.
+    When the total size of the cache goes over `max_size`, the least recently used
+    files are removed. The size and the last use of the files are tracked in memory,
+    so the folder is only listed when the cache is created.
+
+    Examples:
+        >>> cache = SpeechCache("~/.cache/document-to-podcast/speech")
+        >>> speech = cached_text_to_speech("Hello!", model, "af_sarah", cache)
+        >>> cache.hits, cache.misses
+        (0, 1)
+
+    Args:
+        cache_dir (str | Path): The folder where the waveforms are stored.
+        max_size (int): The maximum size of the cache, in bytes.
+            Defaults to 1 GB.
+    """
+
+    def __init__(self, cache_dir: str | Path, max_size: int = 1024**3):
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # The size of each file by key, from the least to the most recently used.
+        self._files: OrderedDict[str, int] = OrderedDict()
+        stats = {file.stem: file.stat() for file in self.cache_dir.glob("*.npy")}
+        for key in sorted(stats, key=lambda key: stats[key].st_mtime):
+            self._files[key] = stats[key].st_size
+        self._size = sum(self._files.values())
+
+    @staticmethod
+    def get_key(
+        model_id: str, voice_profile: str, lang_code: str | None, text: str
+    ) -> str:
+        """
+        Computes the cache key of a waveform.
+
+        The text is normalized, so differences in whitespace don't produce new entries.
+
+        Args:
+            model_id (str): The TTS model_id.
+            voice_profile (str): The voice profile used for the speech.
+            lang_code (str | None): The language code the TTS model was loaded with.
+            text (str): The text converted to speech.
+
+        Returns:
+            str: The hex digest identifying the waveform.
+        """
+        normalized_text = " ".join(text.split())
+        content = "\0".join([model_id, voice_profile, lang_code or "", normalized_text])
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> np.ndarray | None:
+        """
+        Looks up a waveform in the cache.
+
+        Args:
+            key (str): The cache key of the waveform.
+
+        Returns:
+            np.ndarray | None: The memory-mapped waveform, or None if it's not cached.
+        """
+        path = self.cache_dir / f"{key}.npy"
+        try:
+            speech = np.load(path, mmap_mode="r")
+            # Mark the file as recently used, for the eviction in later runs.
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            if key in self._files:
+                self._files.move_to_end(key)
+        return speech
+
+    def put(self, key: str, speech: np.ndarray) -> None:
+        """
+        Stores a waveform in the cache, evicting the least recently used ones if needed.
+
+        Args:
+            key (str): The cache key of the waveform.
+            speech (np.ndarray): The waveform.
+        """
+        path = self.cache_dir / f"{key}.npy"
+        tmp_path = path.with_name(f"{key}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as file:
+            np.save(file, np.asarray(speech, dtype=np.float32))
+        os.replace(tmp_path, path)
+        size = path.stat().st_size
+        with self._lock:
+            # Overwriting a key replaces the size of the previous file.
+            self._size += size - self._files.pop(key, 0)
+            self._files[key] = size
+            if self._size > self.max_size:
+                self._evict()
+
+    def _evict(self) -> None:
+        while self._size > self.max_size and self._files:
+            key, size = self._files.popitem(last=False)
+            file = self.cache_dir / f"{key}.npy"
+            try:
+                file.unlink(missing_ok=True)
+            except OSError as e:
+                # It's no longer tracked, so it isn't retried on every put.
+                logger.warning(f"Could not evict {file}: {e}")
+            self._size -= size
+
+
+def cached_text_to_speech(
+    input_text: str,
+    model: TTSModel,
+    voice_profile: str,
+    cache: SpeechCache,
+    lock: "threading.Lock | None" = None,
+) -> np.ndarray:
+    """
+    Same as [text_to_speech][document_to_podcast.inference.text_to_speech.text_to_speech],
+    but looking up the waveform in `cache` first and storing it there when missing.
+
+    Args:
+        input_text (str): The text to convert to speech.
+        model (TTSModel): The TTS model to use.
+        voice_profile (str): The voice profile to use for the speech.
+        cache (SpeechCache): The cache to use.
+        lock (threading.Lock | None, optional): If provided, it is held while the
+            model synthesizes the speech, but not while the cache is read.
+            Defaults to None.
+
+    Returns:
+        np.ndarray: The waveform of the whole speech, as a float32 numpy array
+    """
+    key = cache.get_key(
+        model.model_id,
+        voice_profile,
+        getattr(model.model, "lang_code", None),
+        input_text,
+    )
+    speech = cache.get(key)
+    if speech is None:
+        with lock or nullcontext():
+            speech = text_to_speech(input_text, model, voice_profile)
+        cache.put(key, speech)
+    return speech
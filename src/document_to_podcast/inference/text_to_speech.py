@@ -1,12 +1,16 @@
+from typing import TYPE_CHECKING, Iterator
+
 import numpy as np
-from kokoro import KPipeline
 
 from document_to_podcast.inference.model_loaders import TTSModel
 
+if TYPE_CHECKING:
+    from kokoro import KPipeline
+
 
 def _text_to_speech_kokoro(
-    input_text: str, model: KPipeline, voice_profile: str
-) -> np.ndarray:
+    input_text: str, model: "KPipeline", voice_profile: str
+) -> Iterator[np.ndarray]:
     """
     TTS generation function for the Kokoro model
     Args:
@@ -15,22 +19,44 @@ def _text_to_speech_kokoro(
         voice_profile (str) : a pre-defined ID for the Kokoro models (e.g. "af_bella")
             more info here https://huggingface.co/hexgrad/Kokoro-82M/blob/main/VOICES.md
 
-    Returns:
-        numpy array: The waveform of the speech as a 2D numpy array
+    Yields:
+        numpy array: The waveform of each of the chunks that the pipeline splits the text into
     """
     generator = model(input_text, voice=voice_profile)
 
-    _, _, audio = next(generator)  # returns graphemes/text, phonemes, audio
-
-    return np.array(audio)
+    for _, _, audio in generator:  # returns graphemes/text, phonemes, audio
+        if audio is not None:
+            yield np.asarray(audio, dtype=np.float32)
 
 
 TTS_INFERENCE = {
     # To add support for your model, add it here in the format {model_id} : _inference_function
+    # The inference function must yield the waveform of the speech chunk by chunk.
     "hexgrad/Kokoro-82M": _text_to_speech_kokoro,
 }
 
 
+def text_to_speech_stream(
+    input_text: str, model: TTSModel, voice_profile: str
+) -> Iterator[np.ndarray]:
+    """
+    Generate speech from text using a TTS model, chunk by chunk.
+
+    Long texts are split by the TTS model into several chunks, and the waveform of
+    each one is yielded as soon as it's generated.
+
+    Args:
+        input_text (str): The text to convert to speech.
+        model (TTSModel): The TTS model to use.
+        voice_profile (str): The voice profile to use for the speech. The format depends on the TTSModel used.
+    Yields:
+        np.ndarray: The waveform of each chunk of the speech, as a float32 numpy array
+    """
+    yield from TTS_INFERENCE[model.model_id](
+        input_text, model.model, voice_profile, **model.custom_args
+    )
+
+
 def text_to_speech(input_text: str, model: TTSModel, voice_profile: str) -> np.ndarray:
     """
     Generate speech from text using a TTS model.
@@ -40,8 +66,9 @@ def text_to_speech(input_text: str, model: TTSModel, voice_profile: str) -> np.n
         model (TTSModel): The TTS model to use.
         voice_profile (str): The voice profile to use for the speech. The format depends on the TTSModel used.
     Returns:
-        np.ndarray: The waveform of the speech as a 2D numpy array
+        np.ndarray: The waveform of the whole speech, as a float32 numpy array
     """
-    return TTS_INFERENCE[model.model_id](
-        input_text, model.model, voice_profile, **model.custom_args
-    )
+    segments = list(text_to_speech_stream(input_text, model, voice_profile))
+    if not segments:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(segments)
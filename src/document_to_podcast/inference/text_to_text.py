@@ -1,16 +1,70 @@
-from typing import Iterator
+import time
+from typing import TYPE_CHECKING, Iterator
 
-from llama_cpp import Llama
+from loguru import logger
+
+if TYPE_CHECKING:
+    from llama_cpp import Llama
+
+    from document_to_podcast.inference.prompt_cache import PromptStateCache
+    from document_to_podcast.inference.speculative import CountingDraftModel
+    from document_to_podcast.metrics import PodcastMetrics
+
+
+def format_chat_prompt(
+    model: "Llama", messages: list[dict[str, str]], add_generation_prompt: bool = True
+) -> str:
+    """
+    Renders the messages into a single prompt, using the chat template of the model.
+
+    Args:
+        model (Llama): The model whose chat template will be used.
+        messages (list[dict[str, str]]): The messages, as passed to `create_chat_completion`.
+        add_generation_prompt (bool, optional): Whether to append the tokens that start
+            the assistant's turn. Defaults to True.
+
+    Raises:
+        ValueError: If the model doesn't include a chat template in its metadata.
+
+    Returns:
+        str: The rendered prompt.
+    """
+    from llama_cpp.llama_chat_format import Jinja2ChatFormatter
+
+    template = model.metadata.get("tokenizer.chat_template")
+    if template is None:
+        raise ValueError("The model doesn't include a chat template in its metadata.")
+    formatter = Jinja2ChatFormatter(
+        template=template,
+        eos_token=model.detokenize([model.token_eos()], special=True).decode(
+            "utf-8", errors="ignore"
+        ),
+        bos_token=model.detokenize([model.token_bos()], special=True).decode(
+            "utf-8", errors="ignore"
+        ),
+        add_generation_prompt=add_generation_prompt,
+    )
+    return formatter(messages=messages).prompt
+
+
+def _prefill_system_prompt(model, system_prompt, input_text, prompt_cache):
+    # Imported here, as the prompt cache renders prompts with this module.
+    from document_to_podcast.inference.prompt_cache import prefill_system_prompt
+
+    prefill_system_prompt(model, system_prompt, input_text, prompt_cache)
 
 
 def chat_completion(
     input_text: str,
-    model: Llama,
+    model: "Llama",
     system_prompt: str,
     return_json: bool,
     stream: bool,
     stop: str | list[str] | None = None,
+    prompt_cache: "PromptStateCache | None" = None,
 ) -> str | Iterator[str]:
+    if prompt_cache is not None:
+        _prefill_system_prompt(model, system_prompt, input_text, prompt_cache)
     # create_chat_completion uses an empty list as default
     stop = stop or []
     return model.create_chat_completion(
@@ -28,12 +82,37 @@ def chat_completion(
     )
 
 
+def continue_chat_completion(
+    input_text: str,
+    model: "Llama",
+    system_prompt: str,
+    assistant_prefix: str,
+    stop: str | list[str] | None = None,
+    prompt_cache: "PromptStateCache | None" = None,
+) -> Iterator[dict]:
+    if prompt_cache is not None:
+        _prefill_system_prompt(model, system_prompt, input_text, prompt_cache)
+    # The JSON grammar can only constrain a response from its start,
+    # so the continuation of a partial response is not constrained.
+    prompt = format_chat_prompt(
+        model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": input_text},
+        ],
+    )
+    return model.create_completion(
+        prompt + assistant_prefix, max_tokens=None, stream=True, stop=stop or []
+    )
+
+
 def text_to_text(
     input_text: str,
-    model: Llama,
+    model: "Llama",
     system_prompt: str,
     return_json: bool = True,
     stop: str | list[str] | None = None,
+    prompt_cache: "PromptStateCache | None" = None,
 ) -> str:
     """
     Transforms input_text using the given model and system prompt.
@@ -45,22 +124,32 @@ def text_to_text(
         return_json (bool, optional): Whether to return the response as JSON.
             Defaults to True.
         stop (str | list[str] | None, optional): The stop token(s).
+        prompt_cache (PromptStateCache | None, optional): The cache of the state of
+            the model after evaluating the system prompt. Defaults to None.
 
     Returns:
         str: The full transformed text.
     """
     response = chat_completion(
-        input_text, model, system_prompt, return_json, stop=stop, stream=False
+        input_text,
+        model,
+        system_prompt,
+        return_json,
+        stop=stop,
+        stream=False,
+        prompt_cache=prompt_cache,
     )
     return response["choices"][0]["message"]["content"]
 
 
 def text_to_text_stream(
     input_text: str,
-    model: Llama,
+    model: "Llama",
     system_prompt: str,
     return_json: bool = True,
     stop: str | list[str] | None = None,
+    assistant_prefix: str | None = None,
+    prompt_cache: "PromptStateCache | None" = None,
 ) -> Iterator[str]:
     """
     Transforms input_text using the given model and system prompt.
@@ -72,13 +161,129 @@ def text_to_text_stream(
         return_json (bool, optional): Whether to return the response as JSON.
             Defaults to True.
         stop (str | list[str] | None, optional): The stop token(s).
+        assistant_prefix (str | None, optional): The beginning of the response
+            (e.g. a partial podcast script).
+            If provided, the model continues it instead of starting a new response,
+            and only the continuation is yielded.
+            Defaults to None.
+        prompt_cache (PromptStateCache | None, optional): The cache of the state of
+            the model after evaluating the system prompt. Defaults to None.
 
     Yields:
         str: Chunks of the transformed text as they are available.
     """
+    if assistant_prefix:
+        response = continue_chat_completion(
+            input_text,
+            model,
+            system_prompt,
+            assistant_prefix,
+            stop=stop,
+            prompt_cache=prompt_cache,
+        )
+        for item in response:
+            if item["choices"][0].get("text"):
+                yield item["choices"][0]["text"]
+        return
+
     response = chat_completion(
-        input_text, model, system_prompt, return_json, stop=stop, stream=True
+        input_text,
+        model,
+        system_prompt,
+        return_json,
+        stop=stop,
+        stream=True,
+        prompt_cache=prompt_cache,
     )
     for item in response:
         if item["choices"][0].get("delta", {}).get("content", None):
             yield item["choices"][0].get("delta", {}).get("content", None)
+
+
+def _count_tokens(model: "Llama", text: str) -> int:
+    return len(model.tokenize(text.encode("utf-8"), add_bos=False, special=True))
+
+
+def log_generation_speed(
+    chunks: Iterator[str],
+    model: "Llama",
+    draft_model: "CountingDraftModel | None" = None,
+    metrics: "PodcastMetrics | None" = None,
+) -> Iterator[str]:
+    """
+    Passes through the chunks of a stream, logging the decode speed once it ends.
+
+    The time to the first chunk (the evaluation of the prompt) and the time spent
+    waiting for the consumer of the stream (e.g. when the TTS queue is full) are left
+    out. The generated text is tokenized once the stream ends to count its tokens, as
+    a chunk can hold several tokens (e.g. with speculative decoding).
+
+    Examples:
+        >>> stream = text_to_text_stream(clean_text, model, system_prompt)
+        >>> for chunk in log_generation_speed(stream, model, model.draft_model):
+        ...     print(chunk, end="")
+
+    Args:
+        chunks (Iterator[str]): The stream, e.g. from `text_to_text_stream`.
+        model (Llama): The model generating the stream, used to count the tokens.
+        draft_model (CountingDraftModel | None, optional): The draft model of the
+            speculative decoding, to also log the rate of accepted tokens.
+            Defaults to None.
+        metrics (PodcastMetrics | None, optional): If provided, the speed is also
+            recorded in it, as `text_to_text`, and the generation is profiled under
+            that name if it has a profiler. Defaults to None.
+
+    Yields:
+        str: The same chunks.
+    """
+    if draft_model is not None:
+        n_drafted, n_accepted = draft_model.n_drafted, draft_model.n_accepted
+    chunks = iter(chunks)
+    prompt_seconds = None
+    decode_seconds = 0.0
+    generated = []
+    while True:
+        start = time.perf_counter()
+        if metrics is None:
+            chunk = next(chunks, None)
+        else:
+            with metrics.profile("text_to_text"):
+                chunk = next(chunks, None)
+        if chunk is None:
+            break
+        if prompt_seconds is None:
+            prompt_seconds = time.perf_counter() - start
+        else:
+            decode_seconds += time.perf_counter() - start
+        generated.append(chunk)
+        yield chunk
+    n_tokens = _count_tokens(model, "".join(generated)) if generated else 0
+    if draft_model is not None:
+        draft_model.finish(n_tokens)
+    if prompt_seconds is None:
+        return
+    # The tokens of the first chunk are generated during the prompt evaluation.
+    n_decoded = n_tokens - _count_tokens(model, generated[0])
+    speed = {
+        "prompt_seconds": prompt_seconds,
+        "generated_tokens": n_tokens,
+        "decode_seconds": decode_seconds,
+        "tokens_per_second": max(n_decoded, 0) / max(decode_seconds, 1e-9),
+    }
+    message = (
+        f"Generated {n_tokens} tokens in {decode_seconds:.1f}s"
+        f" ({speed['tokens_per_second']:.1f} tokens/s),"
+        f" after {prompt_seconds:.1f}s of prompt evaluation"
+    )
+    if draft_model is not None:
+        speed["draft_tokens"] = draft_model.n_drafted - n_drafted
+        speed["accepted_draft_tokens"] = draft_model.n_accepted - n_accepted
+        if speed["draft_tokens"]:
+            message += (
+                f". Accepted {speed['accepted_draft_tokens']}/{speed['draft_tokens']}"
+                f" ({speed['accepted_draft_tokens'] / speed['draft_tokens']:.0%})"
+                " draft tokens"
+            )
+    logger.info(message)
+    if metrics is not None:
+        metrics.record("text_to_text", **speed)
@@ -0,0 +1,216 @@
+from typing import TYPE_CHECKING
+
+from document_to_podcast.inference.text_to_text import format_chat_prompt
+
+if TYPE_CHECKING:
+    from llama_cpp import Llama
+
+# The number of tokens reserved in the context for the generated script, unless the
+# context is too small for it. See `get_max_output_tokens`.
+DEFAULT_MAX_OUTPUT_TOKENS = 4096
+
+# An upper bound of the average characters per token of a text, used to bound how
+# much of a document is read before it can be tokenized.
+MAX_CHARACTERS_PER_TOKEN = 10
+
+
+def count_tokens(text: str, model: "Llama") -> int:
+    """
+    Counts the tokens of `text` using the tokenizer of the model.
+
+    Args:
+        text (str): The text to count the tokens of.
+        model (Llama): The model whose tokenizer will be used.
+
+    Returns:
+        int: The number of tokens.
+    """
+    return len(model.tokenize(text.encode("utf-8"), add_bos=False, special=False))
+
+
+def get_max_output_tokens(n_ctx: int) -> int:
+    """
+    Computes the number of tokens reserved for the generated output in a context.
+
+    It's `DEFAULT_MAX_OUTPUT_TOKENS`, capped to a quarter of the context so that
+    small contexts still leave room for the input. The same reservation is used when
+    sizing the context and when truncating the input to it.
+
+    Args:
+        n_ctx (int): The context size.
+
+    Returns:
+        int: The number of tokens to reserve.
+    """
+    return min(DEFAULT_MAX_OUTPUT_TOKENS, n_ctx // 4)
+
+
+def get_input_token_budget(
+    model: "Llama",
+    system_prompt: str,
+    max_output_tokens: int | None = None,
+    n_ctx: int | None = None,
+) -> int:
+    """
+    Computes how many tokens of input text fit in the context of the model.
+
+    The context is shared by the system prompt (rendered with the chat template of
+    the model), the input text and the generated output, so room is reserved for
+    the first and the last.
+
+    Args:
+        model (Llama): The model that will be used for generation.
+        system_prompt (str): The system prompt, with the `{SPEAKERS}` already expanded.
+        max_output_tokens (int | None, optional): The number of tokens to reserve for
+            the generated output. Defaults to `get_max_output_tokens(n_ctx)`.
+        n_ctx (int | None, optional): The context size of the model, e.g. when
+            `model` was loaded with `vocab_only=True` to compute the budget of
+            another instance. Defaults to the context of `model`.
+
+    Returns:
+        int: The number of tokens available for the input text.
+    """
+    n_ctx = n_ctx or model.n_ctx()
+    if max_output_tokens is None:
+        max_output_tokens = get_max_output_tokens(n_ctx)
+    prompt_tokens = _count_prompt_tokens(model, system_prompt)
+    return max(n_ctx - prompt_tokens - max_output_tokens, 0)
+
+
+def _count_prompt_tokens(model: "Llama", system_prompt: str) -> int:
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": ""},
+    ]
+    try:
+        prompt_tokens = len(
+            model.tokenize(
+                format_chat_prompt(model, messages).encode("utf-8"),
+                add_bos=False,
+                special=True,
+            )
+        )
+    except ValueError:
+        # No chat template to render, leave some margin for the role markers.
+        prompt_tokens = count_tokens(system_prompt, model) + 32
+    return prompt_tokens
+
+
+def get_context_size(
+    model: "Llama",
+    system_prompt: str,
+    text: str,
+    max_output_tokens: int | None = None,
+    multiple: int = 1024,
+) -> int:
+    """
+    Computes the smallest context size that fits the system prompt, the text and the
+    generated output, so no memory is allocated for an unused KV cache.
+
+    Only the tokenizer of the model is used, so it can be loaded with `vocab_only=True`.
+
+    Examples:
+        >>> vocab = load_llama_cpp_model(model_id, vocab_only=True)
+        >>> n_ctx = get_context_size(vocab, system_prompt, clean_text)
+        >>> model = load_llama_cpp_model(model_id, n_ctx=n_ctx)
+
+    Args:
+        model (Llama): The model whose tokenizer and chat template will be used.
+        system_prompt (str): The system prompt, with the `{SPEAKERS}` already expanded.
+        text (str): The input text.
+        max_output_tokens (int | None, optional): The number of tokens to reserve for
+            the generated script, which stops when the context is full.
+            Defaults to `get_max_output_tokens` of the context the model was trained
+            with, which is never less than what
+            [get_input_token_budget][document_to_podcast.inference.token_budget.get_input_token_budget]
+            reserves in the returned context, so the text fits in it.
+        multiple (int, optional): The context size is rounded up to a multiple of it.
+            Defaults to 1024.
+
+    Returns:
+        int: The context size, capped to the one the model was trained with.
+            0 (the model limit) if the latter is unknown.
+    """
+    n_ctx_train = get_train_context_size(model)
+    if not n_ctx_train:
+        return 0
+    if max_output_tokens is None:
+        max_output_tokens = get_max_output_tokens(n_ctx_train)
+    prompt_tokens = _count_prompt_tokens(model, system_prompt)
+    text_budget = n_ctx_train - prompt_tokens - max_output_tokens
+    if len(truncate_to_token_budget(text, model, text_budget)) < len(text):
+        return n_ctx_train
+    n_ctx = prompt_tokens + count_tokens(text, model) + max_output_tokens
+    return min(-(-n_ctx // multiple) * multiple, n_ctx_train)
+
+
+def get_train_context_size(model: "Llama") -> int:
+    """
+    Reads the context size the model was trained with from its metadata.
+
+    Args:
+        model (Llama): The model, which can be loaded with `vocab_only=True`.
+
+    Returns:
+        int: The context size, or 0 if it's unknown.
+    """
+    architecture = model.metadata.get("general.architecture")
+    return int(model.metadata.get(f"{architecture}.context_length", 0))
+
+
+def truncate_to_token_budget(
+    text: str, model: "Llama", max_tokens: int, chunk_size: int = 16_384
+) -> str:
+    """
+    Returns the longest prefix of `text` that fits in `max_tokens`.
+
+    Instead of tokenizing the whole text, it is tokenized in chunks of `chunk_size`
+    characters until the budget is exceeded, and the cut inside the last chunk is
+    found with a binary search. Only the characters close to the budget are
+    tokenized, so the cost doesn't depend on the length of the document.
+
+    Chunks are cut at whitespace when possible. Tokenizing a text in pieces generally
+    produces as many or more tokens than tokenizing it at once, so the returned prefix
+    may end a few tokens under the budget.
+
+    Examples:
+        >>> budget = get_input_token_budget(model, system_prompt)
+        >>> clean_text = truncate_to_token_budget(clean_text, model, budget)
+
+    Args:
+        text (str): The text to truncate.
+        model (Llama): The model whose tokenizer will be used.
+        max_tokens (int): The maximum number of tokens of the returned prefix.
+        chunk_size (int, optional): The number of characters tokenized at once.
+            Defaults to 16384.
+
+    Returns:
+        str: The longest prefix of `text` that fits in `max_tokens`.
+    """
+    if max_tokens <= 0:
+        return ""
+    used_tokens = 0
+    start = 0
+    while start < len(text):
+        end = start + chunk_size
+        if end < len(text):
+            space = text.rfind(" ", start + 1, end)
+            end = space if space != -1 else end
+        chunk = text[start:end]
+        chunk_tokens = count_tokens(chunk, model)
+        if used_tokens + chunk_tokens > max_tokens:
+            break
+        used_tokens += chunk_tokens
+        start = end
+    else:
+        return text
+
+    # Largest `cut` such that chunk[:cut] fits in the remaining budget.
+    low, high = 0, len(chunk)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if used_tokens + count_tokens(chunk[:middle], model) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[: start + low]
@@ -0,0 +1,233 @@
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+from document_to_podcast.profiling import StageProfiler
+
+
+def get_peak_rss_mb() -> float | None:
+    """
+    Returns the peak resident memory of the process, in MB.
+
+    Returns:
+        float | None: The peak RSS, or None if it can't be measured on this platform.
+    """
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # It's in bytes on macOS, and in KB on Linux.
+    return max_rss / 1024**2 if sys.platform == "darwin" else max_rss / 1024
+
+
+class PodcastMetrics:
+    """
+    Collects the performance metrics of a podcast generation.
+
+    The time spent in each stage, the speed of the text-to-text model and the latency
+    of each speaker turn are written to a `metrics.json` at the end. If `events_file`
+    is given, each of them is also appended to it as a JSON line as soon as it's
+    recorded, for live monitoring.
+
+    If a `profiler` is given, each stage is profiled as well.
+
+    Use it as a context manager, so the events file is closed even if the generation
+    fails.
+
+    Examples:
+        >>> with PodcastMetrics("events.jsonl") as metrics:
+        ...     with metrics.stage("load_document"):
+        ...         text = load_txt("example_data/a.txt")
+        ...     metrics.record("document", characters=len(text))
+        ...     metrics.write("example_data/metrics.json")
+
+    Args:
+        events_file (str | Path | None, optional): The JSON lines file where the
+            events are appended. Defaults to None.
+        profiler (StageProfiler | None, optional): Profiles each stage.
+            Defaults to None.
+    """
+
+    def __init__(
+        self,
+        events_file: str | Path | None = None,
+        profiler: StageProfiler | None = None,
+    ):
+        self.start_time = time.perf_counter()
+        self.profiler = profiler
+        self.stages: dict[str, float] = {}
+        self.values: dict[str, dict] = {}
+        self.turns: list[dict] = []
+        self._lock = threading.Lock()
+        self._events = None
+        if events_file is not None:
+            Path(events_file).parent.mkdir(parents=True, exist_ok=True)
+            self._events = open(events_file, "a", buffering=1)
+
+    def __enter__(self) -> "PodcastMetrics":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_value is not None:
+            self._emit("failed", error=repr(exc_value))
+        self.close()
+
+    def close(self) -> None:
+        """
+        Closes the events file, if any. Later events are not written.
+        """
+        with self._lock:
+            if self._events is not None:
+                self._events.close()
+                self._events = None
+
+    def _emit(self, event: str, **values) -> None:
+        if self._events is None:
+            return
+        line = json.dumps(
+            {
+                "event": event,
+                "time": time.time(),
+                "elapsed": time.perf_counter() - self.start_time,
+                **values,
+            }
+        )
+        with self._lock:
+            if self._events is not None:
+                self._events.write(line + "\n")
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Measures a stage. The time of a stage run several times is added up.
+
+        Args:
+            name (str): The name of the stage.
+        """
+        self._emit("stage_start", stage=name)
+        start = time.perf_counter()
+        try:
+            if self.profiler is None:
+                yield
+            else:
+                with self.profiler.profile(name, snapshot=True):
+                    yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start)
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        """
+        Records the time of a stage measured by the caller, e.g. of a stage whose work
+        is interleaved with another one.
+
+        Args:
+            name (str): The name of the stage.
+            seconds (float): The time spent in it.
+        """
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+        self._emit("stage_end", stage=name, seconds=seconds)
+
+    def profile(self, name: str):
+        """
+        Profiles a part of the work without timing it, e.g. the parts of a stage
+        running in worker threads. Does nothing if there is no `profiler`.
+
+        Args:
+            name (str): The name of the stage.
+        """
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.profile(name)
+
+    def record(self, name: str, **values) -> None:
+        """
+        Records the values of a group of metrics (e.g. the speed of the text-to-text model).
+
+        Args:
+            name (str): The name of the group.
+            **values: The values, which must be JSON serializable.
+        """
+        with self._lock:
+            self.values[name] = {**self.values.get(name, {}), **values}
+        self._emit(name, **values)
+
+    def add_turn(
+        self,
+        n: int,
+        speaker_id: int,
+        n_characters: int,
+        seconds: float,
+        audio_seconds: float,
+    ) -> None:
+        """
+        Records the synthesis of a speaker turn.
+
+        Args:
+            n (int): The index of the turn.
+            speaker_id (int): The id of the speaker.
+            n_characters (int): The length of the text of the turn.
+            seconds (float): The time it took to synthesize it.
+            audio_seconds (float): The duration of its audio.
+        """
+        turn = {
+            "turn": n,
+            "speaker_id": speaker_id,
+            "characters": n_characters,
+            "seconds": seconds,
+            "audio_seconds": audio_seconds,
+            "real_time_factor": seconds / audio_seconds if audio_seconds else None,
+        }
+        with self._lock:
+            self.turns.append(turn)
+        self._emit("turn", **turn)
+
+    def to_dict(self) -> dict:
+        """
+        Returns:
+            dict: All the metrics, with a summary of the turns.
+        """
+        with self._lock:
+            turns = sorted(self.turns, key=lambda turn: turn["turn"])
+            summary = {}
+            if turns:
+                seconds = sum(turn["seconds"] for turn in turns)
+                audio_seconds = sum(turn["audio_seconds"] for turn in turns)
+                summary = {
+                    "turns": len(turns),
+                    "seconds": seconds,
+                    "audio_seconds": audio_seconds,
+                    "mean_latency": seconds / len(turns),
+                    "max_latency": max(turn["seconds"] for turn in turns),
+                    "real_time_factor": seconds / audio_seconds
+                    if audio_seconds
+                    else None,
+                }
+            return {
+                "wall_seconds": time.perf_counter() - self.start_time,
+                "peak_rss_mb": get_peak_rss_mb(),
+                "stages": dict(self.stages),
+                **self.values,
+                "text_to_speech": summary,
+                "turns": turns,
+            }
+
+    def write(self, path: str | Path) -> None:
+        """
+        Writes the metrics as JSON, and closes the events file.
+
+        Args:
+            path (str | Path): The path of the JSON file.
+        """
+        metrics = self.to_dict()
+        Path(path).write_text(json.dumps(metrics, indent=2))
+        self._emit(
+            "done",
+            wall_seconds=metrics["wall_seconds"],
+            peak_rss_mb=metrics["peak_rss_mb"],
+        )
+        self.close()
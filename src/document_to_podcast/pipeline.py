@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+import numpy as np
+
+from document_to_podcast.inference.model_loaders import TTSModel
+from document_to_podcast.inference.speech_cache import (
+    SpeechCache,
+    cached_text_to_speech,
+)
+from document_to_podcast.inference.text_to_speech import text_to_speech
+
+if TYPE_CHECKING:
+    from document_to_podcast.metrics import PodcastMetrics
+
+
+def pipelined_text_to_speech(
+    turns: Iterable[tuple[int, str]],
+    model: TTSModel,
+    voice_profiles: dict[int, str],
+    queue_size: int = 2,
+    num_workers: int = 1,
+    speech_cache: SpeechCache | None = None,
+    metrics: "PodcastMetrics | None" = None,
+) -> Iterator[np.ndarray]:
+    """
+    Synthesize speaker turns while they are still being produced.
+
+    Each turn pulled from `turns` is handed to a pool of TTS worker threads, so the
+    producer (usually the text-to-text model) keeps generating while the previous
+    turns are converted to speech. The waveforms are yielded in the same order as the
+    turns, regardless of which worker finishes first.
+
+    The TTS model is not thread-safe, so the workers synthesize one turn at a time.
+    Only reading turns from the `speech_cache` runs in parallel between workers.
+
+    Examples:
+        >>> turns = parse_speaker_turns(text_to_text_stream(text, text_model, system_prompt))
+        >>> for speech in pipelined_text_to_speech(turns, speech_model, {1: "af_sarah", 2: "am_michael"}):
+        ...     podcast_audio.append(speech)
+
+    Args:
+        turns (Iterable[tuple[int, str]]): The speaker id and text of each turn.
+        model (TTSModel): The TTS model to use.
+        voice_profiles (dict[int, str]): The voice profile to use for each speaker id.
+        queue_size (int, optional): The maximum number of turns waiting to be collected.
+            Once reached, the producer is blocked until the oldest turn is synthesized.
+            Defaults to 2.
+        num_workers (int, optional): The number of TTS worker threads. As they share
+            the model, more than one doesn't synthesize turns in parallel, it only lets
+            the turns found in the `speech_cache` be read while another is synthesized.
+            If 0, each turn is synthesized inline, before pulling the next one.
+            Defaults to 1.
+        speech_cache (SpeechCache | None, optional): If provided, turns already
+            synthesized are read from this cache instead of synthesized again.
+            Defaults to None.
+        metrics (PodcastMetrics | None, optional): If provided, the synthesis time of
+            each turn is recorded in it. Defaults to None.
+
+    Yields:
+        np.ndarray: The waveform of each turn, in order.
+    """
+    model_lock = threading.Lock()
+
+    def synthesize(text: str, voice_profile: str) -> np.ndarray:
+        if speech_cache is None:
+            with model_lock:
+                return text_to_speech(text, model, voice_profile)
+        return cached_text_to_speech(
+            text, model, voice_profile, cache=speech_cache, lock=model_lock
+        )
+
+    def synthesize_turn(n: int, speaker_id: int, text: str) -> np.ndarray:
+        if metrics is None:
+            return synthesize(text, voice_profiles[speaker_id])
+        start = time.perf_counter()
+        with metrics.profile("text_to_speech"):
+            speech = synthesize(text, voice_profiles[speaker_id])
+        metrics.add_turn(
+            n,
+            speaker_id,
+            len(text),
+            time.perf_counter() - start,
+            len(speech) / model.sample_rate,
+        )
+        return speech
+
+    if num_workers == 0:
+        for n, (speaker_id, text) in enumerate(turns):
+            yield synthesize_turn(n, speaker_id, text)
+        return
+
+    pending: deque[Future] = deque()
+    with ThreadPoolExecutor(
+        max_workers=num_workers, thread_name_prefix="text_to_speech"
+    ) as executor:
+        try:
+            for n, (speaker_id, text) in enumerate(turns):
+                pending.append(executor.submit(synthesize_turn, n, speaker_id, text))
+                while pending and (len(pending) > queue_size or pending[0].done()):
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
@@ -1,5 +1,21 @@
-from .data_loaders import load_pdf, load_txt, load_docx, load_url
-from .data_cleaners import clean_with_regex, clean_html, clean_markdown
+from .data_loaders import (
+    iter_docx,
+    iter_pdf,
+    iter_txt,
+    iter_url,
+    load_pdf,
+    load_txt,
+    load_docx,
+    load_url,
+)
+from .data_cleaners import (
+    clean_with_regex,
+    clean_html,
+    clean_markdown,
+    iter_clean_html,
+    iter_clean_markdown,
+    iter_clean_with_regex,
+)
 
 
 DATA_LOADERS = {
@@ -18,3 +34,22 @@ DATA_CLEANERS = {
     ".pdf": clean_with_regex,
     ".txt": clean_with_regex,
 }
+
+# The lazy versions of the above, yielding the text in chunks, so a document can be
+# loaded and cleaned only until there is enough text (see `data_loaders.join_chunks`).
+DATA_CHUNK_LOADERS = {
+    ".docx": iter_docx,
+    ".html": iter_txt,
+    ".md": iter_txt,
+    ".pdf": iter_pdf,
+    ".txt": iter_txt,
+    "url": iter_url,
+}
+
+DATA_CHUNK_CLEANERS = {
+    ".docx": iter_clean_with_regex,
+    ".html": iter_clean_html,
+    ".md": iter_clean_markdown,
+    ".pdf": iter_clean_with_regex,
+    ".txt": iter_clean_with_regex,
+}
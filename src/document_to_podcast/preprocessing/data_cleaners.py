@@ -1,8 +1,87 @@
 import re
-from bs4 import BeautifulSoup
+from functools import partial
+from html.entities import html5
+from html.parser import HTMLParser
+from typing import Callable, Iterable, Iterator
 
+from document_to_podcast.preprocessing.data_loaders import join_chunks
 
-def clean_with_regex(text: str) -> str:
+# Equivalent to `http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+`,
+# whose `$-_` is a range covering the digits, the uppercase letters and most of the
+# punctuation, as a single character class that doesn't backtrack.
+_URL = re.compile(r"https?://[!$-_a-z]+")
+_EMAIL = re.compile(r"[\w\.-]+@[\w\.-]+\.[\w]+")
+# The non-ASCII characters matched by `\s`.
+_NON_ASCII_SPACES = (
+    "\x85\xa0\u1680\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009"
+    "\u200a\u2028\u2029\u202f\u205f\u3000"
+)
+# The size of the blocks in which large texts are cleaned.
+_TEXT_BLOCK_SIZE = 64 * 1024
+_MARKDOWN_IMAGE = re.compile(r'!\[.*?\]\(.*?(".*?")?\)')
+
+_ALLOWED_PUNCTUATION = ".,!?;:\"'"
+# Deletes the ASCII characters that are not letters, digits, whitespace or the
+# allowed punctuation.
+_ASCII_WHITELIST = str.maketrans(
+    "",
+    "",
+    "".join(
+        char
+        for char in map(chr, range(128))
+        if not (char.isalnum() or char.isspace() or char in _ALLOWED_PUNCTUATION)
+    ),
+)
+
+
+def _remove_emails(text: str) -> str:
+    # Same as `_EMAIL.sub("", text)`, but only tried around each "@", instead of
+    # from every position of every word.
+    pieces = []
+    end = 0
+    at = text.find("@")
+    while at != -1:
+        start = at
+        while start > end and (text[start - 1].isalnum() or text[start - 1] in "_.-"):
+            start -= 1
+        match = _EMAIL.match(text, start) if start < at else None
+        if match is None:
+            at = text.find("@", at + 1)
+            continue
+        pieces.append(text[end:start])
+        end = match.end()
+        at = text.find("@", end)
+    pieces.append(text[end:])
+    return "".join(pieces)
+
+
+def _get_clean_words(text: str) -> list[str]:
+    if "http" in text:
+        text = _URL.sub("", text)
+    if "@" in text:
+        text = _remove_emails(text)
+    if not text.isascii():
+        # Only ASCII characters are kept, but whitespace still separates words.
+        for space in _NON_ASCII_SPACES:
+            if space in text:
+                text = text.replace(space, " ")
+        text = text.encode("ascii", "ignore").decode("ascii")
+    return text.translate(_ASCII_WHITELIST).split()
+
+
+def _clean_until(
+    iter_clean: Callable[[Iterable[str]], Iterator[str]],
+    text: str,
+    max_characters: int,
+) -> str:
+    # Cleaned in blocks, so the text after the one reaching the budget isn't cleaned.
+    blocks = (
+        text[n : n + _TEXT_BLOCK_SIZE] for n in range(0, len(text), _TEXT_BLOCK_SIZE)
+    )
+    return join_chunks(iter_clean(blocks), max_characters)
+
+
+def clean_with_regex(text: str, max_characters: int | None = None) -> str:
     """
     Clean text using regular expressions.
 
@@ -18,22 +97,288 @@ def clean_with_regex(text: str) -> str:
 
     Args:
         text (str): The text to clean.
+        max_characters (int | None, optional): If provided, the text is cleaned in
+            blocks until this number of cleaned characters is reached, and the rest
+            is left out. Defaults to None.
 
     Returns:
         str: The cleaned text.
     """
-    text = re.sub(
-        r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+",
-        "",
-        text,
-    )
-    text = re.sub(r"[\w\.-]+@[\w\.-]+\.[\w]+", "", text)
-    text = re.sub(r'[^a-zA-Z0-9\s.,!?;:"\']', "", text)
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
+    if max_characters is not None:
+        return _clean_until(iter_clean_with_regex, text, max_characters)
+    return " ".join(_get_clean_words(text))
+
+
+def _iter_clean_chunks(
+    chunks: Iterable[str],
+    get_clean_words: Callable[[str], list[str]],
+    separators: tuple[str, ...],
+) -> Iterator[str]:
+    # The text is only cut after one of the `separators`, which no pattern matches
+    # across, so each piece is cleaned as it would be within the whole text.
+    # The chunks since the last cut have no separator, so only the new chunk is
+    # searched, and they are joined once, to keep it linear on long runs of them.
+    carry: list[str] = []
+    started = False
+
+    def clean(text: str) -> Iterator[str]:
+        nonlocal started
+        words = get_clean_words(text)
+        if words:
+            yield (" " if started else "") + " ".join(words)
+            started = True
+
+    for chunk in chunks:
+        cut = max(chunk.rfind(separator) for separator in separators)
+        if cut == -1:
+            carry.append(chunk)
+            continue
+        carry.append(chunk[: cut + 1])
+        yield from clean("".join(carry))
+        carry = [chunk[cut + 1 :]]
+    yield from clean("".join(carry))
+
+
+def iter_clean_with_regex(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Clean text that comes in chunks (e.g. read from a large file) with
+    [clean_with_regex][document_to_podcast.preprocessing.data_cleaners.clean_with_regex],
+    without holding all of it in memory.
+
+    The chunks are cut at whitespace, so the URLs, emails and words split between
+    two chunks are handled as in the whole text.
+
+    Examples:
+        >>> "".join(iter_clean_with_regex(["Hello,   wor", "ld! http://exa", "mple.com"]))
+        "Hello, world!"
+
+    Args:
+        chunks (Iterable[str]): The text to clean, in chunks of any size.
+
+    Yields:
+        str: The cleaned text, in pieces. Joined, they are the same as
+            `clean_with_regex("".join(chunks))`.
+    """
+    return _iter_clean_chunks(chunks, _get_clean_words, (" ", "\n"))
+
+
+# The elements whose text is not part of the page: scripts and styles, and the ones
+# left out by BeautifulSoup's `get_text` as well. `link` and `meta` have no text.
+_SKIPPED_ELEMENTS = frozenset(["script", "style", "template", "rt", "rp"])
+# The elements without an end tag, as BeautifulSoup's `html.parser` builder sees them.
+_VOID_ELEMENTS = frozenset(
+    [
+        "area",
+        "base",
+        "basefont",
+        "bgsound",
+        "br",
+        "col",
+        "command",
+        "embed",
+        "frame",
+        "hr",
+        "image",
+        "img",
+        "input",
+        "isindex",
+        "keygen",
+        "link",
+        "menuitem",
+        "meta",
+        "nextid",
+        "param",
+        "source",
+        "spacer",
+        "track",
+        "wbr",
+    ]
+)
+
+
+def _decode_charref(name: str) -> str:
+    # As BeautifulSoup does: the Windows-1252 characters are used for 128-159, and
+    # what follows the digits of a malformed reference is kept as text.
+    base, digits = (16, name[1:]) if name[:1] in ("x", "X") else (10, name)
+    try:
+        number, extra = int(digits, base), ""
+    except ValueError:
+        match = re.match(
+            r"([0-9a-f]+)(.*)" if base == 16 else r"([0-9]+)(.*)", digits, re.S
+        )
+        if match is None:
+            return digits
+        number, extra = int(match[1], base), match[2]
+    if number == 0 or number > 0x10FFFF or 0xD800 <= number <= 0xDFFF:
+        return "\ufffd" + extra
+    if 0x80 <= number <= 0x9F:
+        try:
+            return bytes([number]).decode("cp1252") + extra
+        except UnicodeDecodeError:
+            pass
+    return chr(number) + extra
+
+
+class _HTMLTextParser(HTMLParser):
+    """
+    Collects the text of an HTML document as it's fed, without building its tree.
+
+    It follows the open elements as BeautifulSoup does with the `html.parser`
+    builder (an end tag closes everything up to the last element of that name, and
+    is ignored if there is none), so the text is the same as its `get_text()`.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self._text: list[str] = []
+        self._text_size = 0
+        self._blocks: list[str] = []
+        self._open: list[str] = []
+        self._skipping = 0
+
+    def _add_text(self, text: str) -> None:
+        # A large chunk is parsed at once, so its text is joined in blocks to be
+        # cleaned one by one.
+        self._text.append(text)
+        self._text_size += len(text)
+        if self._text_size >= _TEXT_BLOCK_SIZE:
+            self._blocks.append("".join(self._text))
+            self._text.clear()
+            self._text_size = 0
+
+    def pop_text(self) -> list[str]:
+        """Returns the text parsed since the last call, in blocks."""
+        blocks = [*self._blocks, "".join(self._text)]
+        self._blocks.clear()
+        self._text.clear()
+        self._text_size = 0
+        return blocks
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _VOID_ELEMENTS:
+            return
+        self._open.append(tag)
+        if tag in _SKIPPED_ELEMENTS:
+            self._skipping += 1
+
+    def handle_startendtag(self, tag, attrs):
+        # Opened and closed right away, like `<br/>` or `<script src="a.js"/>`.
+        pass
 
+    def handle_endtag(self, tag):
+        if tag not in self._open:
+            return
+        while True:
+            closed = self._open.pop()
+            if closed in _SKIPPED_ELEMENTS:
+                self._skipping -= 1
+            if closed == tag:
+                break
 
-def clean_html(text: str) -> str:
+    def handle_data(self, data):
+        if not self._skipping:
+            self._add_text(data)
+
+    def handle_entityref(self, name):
+        self.handle_data(html5.get(f"{name};", f"&{name}"))
+
+    def handle_charref(self, name):
+        self.handle_data(_decode_charref(name))
+
+    def unknown_decl(self, data):
+        if data.upper().startswith("CDATA["):
+            self._add_text(data[len("CDATA[") :])
+
+
+def _iter_html_text_with_html_parser(chunks: Iterable[str]) -> Iterator[str]:
+    parser = _HTMLTextParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from parser.pop_text()
+    parser.close()
+    yield from parser.pop_text()
+
+
+class _LxmlTextTarget:
+    # Receives the events of `lxml.etree.HTMLParser`, which then builds no tree.
+    def __init__(self):
+        self.text: list[str] = []
+        self._skipping = 0
+
+    def start(self, tag, attrib):
+        if tag in _SKIPPED_ELEMENTS:
+            self._skipping += 1
+
+    def end(self, tag):
+        if tag in _SKIPPED_ELEMENTS:
+            self._skipping -= 1
+
+    def data(self, data):
+        if not self._skipping:
+            self.text.append(data)
+
+    def close(self):
+        pass
+
+
+def _iter_html_text_with_lxml(chunks: Iterable[str]) -> Iterator[str]:
+    from lxml import etree
+
+    target = _LxmlTextTarget()
+    parser = etree.HTMLParser(target=target)
+    for chunk in chunks:
+        # Fed in slices, so the text of a large chunk is cleaned piece by piece.
+        for start in range(0, len(chunk), _TEXT_BLOCK_SIZE):
+            parser.feed(chunk[start : start + _TEXT_BLOCK_SIZE])
+            yield "".join(target.text)
+            target.text.clear()
+    try:
+        parser.close()
+    except etree.LxmlError:
+        # e.g. "no element found" for an empty document, which has no text anyway.
+        pass
+    yield "".join(target.text)
+
+
+HTML_PARSERS = {
+    "lxml": _iter_html_text_with_lxml,
+    "html.parser": _iter_html_text_with_html_parser,
+}
+
+
+def _get_html_parser(parser: str) -> Callable[[Iterable[str]], Iterator[str]]:
+    if parser not in HTML_PARSERS:
+        raise ValueError(f"parser must be one of {list(HTML_PARSERS.keys())}")
+    return HTML_PARSERS[parser]
+
+
+def iter_clean_html(
+    chunks: Iterable[str], parser: str = "html.parser"
+) -> Iterator[str]:
+    """
+    Clean HTML text that comes in chunks with
+    [clean_html][document_to_podcast.preprocessing.data_cleaners.clean_html],
+    without holding all of it in memory.
+
+    The text is extracted as the chunks are parsed, and cleaned with
+    [iter_clean_with_regex][document_to_podcast.preprocessing.data_cleaners.iter_clean_with_regex].
+
+    Args:
+        chunks (Iterable[str]): The HTML text to clean, in chunks of any size.
+        parser (str, optional): One of `HTML_PARSERS`. Defaults to `html.parser`.
+
+    Yields:
+        str: The cleaned text, in pieces. Joined, they are the same as
+            `clean_html("".join(chunks), parser=parser)`, unless there are malformed
+            character references (e.g. `&#12a;`), which `html.parser` reads
+            differently depending on where the chunks end.
+    """
+    return iter_clean_with_regex(_get_html_parser(parser)(chunks))
+
+
+def clean_html(
+    text: str, max_characters: int | None = None, parser: str = "html.parser"
+) -> str:
     """Clean HTML text.
 
     This function removes:
@@ -44,24 +389,37 @@ def clean_html(text: str) -> str:
 
     In addition, it calls [clean_with_regex][document_to_podcast.preprocessing.data_cleaners.clean_with_regex].
 
+    The text is streamed out of the parser, skipping those elements, without building
+    the tree of the document. Two parsers are available in `HTML_PARSERS`:
+
+    - `html.parser`: Python's own, the default, giving the same text as
+        BeautifulSoup's `get_text()` with its `html.parser` builder, even on broken
+        markup.
+    - `lxml`: Faster, but it recovers from broken markup differently, so the text
+        of such documents can differ. Requires `pip install lxml`.
+
     Examples:
         >>> clean_html("<html><body><p>Hello,  world!  </p></body></html>"")
         "Hello, world!"
 
     Args:
         text (str): The HTML text to clean.
+        max_characters (int | None, optional): If provided, the text is cleaned in
+            blocks until this number of cleaned characters is reached, and the rest
+            is left out. Defaults to None.
+        parser (str, optional): One of `HTML_PARSERS`. Defaults to `html.parser`.
 
     Returns:
         str: The cleaned text.
     """
-    soup = BeautifulSoup(text, "html.parser")
-    for tag in soup(["script", "style", "link", "meta"]):
-        tag.decompose()
-    text = soup.get_text()
-    return clean_with_regex(text)
+    if max_characters is not None:
+        return _clean_until(
+            partial(iter_clean_html, parser=parser), text, max_characters
+        )
+    return "".join(iter_clean_html([text], parser))
 
 
-def clean_markdown(text: str) -> str:
+def clean_markdown(text: str, max_characters: int | None = None) -> str:
     """Clean Markdown text.
 
     This function removes:
@@ -75,10 +433,39 @@ def clean_markdown(text: str) -> str:
 
     Args:
         text (str): The Markdown text to clean.
+        max_characters (int | None, optional): If provided, the text is cleaned in
+            blocks until this number of cleaned characters is reached, and the rest
+            is left out. Defaults to None.
 
     Returns:
         str: The cleaned text.
     """
-    text = re.sub(r'!\[.*?\]\(.*?(".*?")?\)', "", text)
+    if max_characters is not None:
+        return _clean_until(iter_clean_markdown, text, max_characters)
+    return clean_with_regex(_remove_markdown_images(text))
 
-    return clean_with_regex(text)
+
+def _remove_markdown_images(text: str) -> str:
+    if "![" not in text:
+        return text
+    return _MARKDOWN_IMAGE.sub("", text)
+
+
+def iter_clean_markdown(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Clean Markdown text that comes in chunks with
+    [clean_markdown][document_to_podcast.preprocessing.data_cleaners.clean_markdown],
+    without holding all of it in memory.
+
+    The chunks are cut at line breaks, as images don't span several lines.
+
+    Args:
+        chunks (Iterable[str]): The Markdown text to clean, in chunks of any size.
+
+    Yields:
+        str: The cleaned text, in pieces. Joined, they are the same as
+            `clean_markdown("".join(chunks))`.
+    """
+    return _iter_clean_chunks(
+        chunks, lambda text: _get_clean_words(_remove_markdown_images(text)), ("\n",)
+    )
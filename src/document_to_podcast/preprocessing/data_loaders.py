@@ -1,46 +1,300 @@
-import PyPDF2
-import requests
+import codecs
+import io
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import closing
+from functools import partial
+from typing import TYPE_CHECKING, Iterable, Iterator
 
-from docx import Document
 from loguru import logger
-from streamlit.runtime.uploaded_file_manager import UploadedFile
 
+# The parsers are imported by each loader, so they are only loaded when needed.
+if TYPE_CHECKING:
+    from streamlit.runtime.uploaded_file_manager import UploadedFile
 
-def load_pdf(pdf_file: str | UploadedFile) -> str | None:
+# The size of the blocks in which text files and web pages are read.
+_CHUNK_SIZE = 64 * 1024
+
+# The reader of each worker process of `iter_pdf_pages`.
+_pdf_reader = None
+
+
+def join_chunks(chunks: Iterable[str], max_characters: int | None = None) -> str:
+    """
+    Joins the chunks of a text, stopping after the one reaching `max_characters`, so
+    the rest of a lazy iterator is never read (and it's closed right away).
+
+    Examples:
+        >>> text = join_chunks(iter_txt("example_data/a.txt"), max_characters=100_000)
+
+    Args:
+        chunks (Iterable[str]): The chunks of the text.
+        max_characters (int | None, optional): If provided, the chunks after the one
+            reaching this number of characters are not read. Defaults to None.
+
+    Returns:
+        str: The joined chunks.
+    """
+    text = []
+    n_characters = 0
+    chunks = iter(chunks)
+    try:
+        for chunk in chunks:
+            text.append(chunk)
+            n_characters += len(chunk)
+            if max_characters is not None and n_characters >= max_characters:
+                break
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+    return "".join(text)
+
+
+def _iter_joined(items: Iterator[str], separator: str) -> Iterator[str]:
+    # The items as chunks of their `separator.join`.
+    with closing(items):
+        for n, item in enumerate(items):
+            yield separator + item if n else item
+
+
+def _init_pdf_worker(source: "str | bytes") -> None:
+    import PyPDF2
+
+    global _pdf_reader
+    _pdf_reader = PyPDF2.PdfReader(
+        io.BytesIO(source) if isinstance(source, bytes) else source
+    )
+
+
+def _extract_pdf_pages(start: int, end: int) -> list[str]:
+    return [_pdf_reader.pages[n].extract_text() for n in range(start, end)]
+
+
+def iter_pdf_pages(
+    pdf_file: "str | UploadedFile", num_workers: int = 0, pages_per_task: int = 8
+) -> Iterator[str]:
+    """
+    Extracts the text of a PDF page by page, so the caller can stop as soon as it has
+    enough text.
+
+    With `num_workers`, ranges of `pages_per_task` pages are extracted in parallel by
+    a pool of processes, a few ranges ahead of the ones consumed, and the pages are
+    still yielded in order.
+
+    Examples:
+        >>> for page in iter_pdf_pages("example_data/Mozilla-Trustworthy_AI.pdf", num_workers=4):
+        ...     print(page)
+
+    Args:
+        pdf_file (str | UploadedFile): The path to the PDF, or a file uploaded to Streamlit.
+        num_workers (int, optional): The number of processes extracting pages.
+            0 extracts them in the calling process. Defaults to 0.
+        pages_per_task (int, optional): The number of pages extracted by each task
+            sent to a worker. Defaults to 8.
+
+    Yields:
+        str: The text of each page.
+    """
+    import PyPDF2
+
+    pdf_reader = PyPDF2.PdfReader(pdf_file)
+    if num_workers == 0:
+        for page in pdf_reader.pages:
+            yield page.extract_text()
+        return
+
+    n_pages = len(pdf_reader.pages)
+    # Each worker opens the PDF once, from its path or from the uploaded bytes.
+    source = pdf_file.getvalue() if hasattr(pdf_file, "getvalue") else str(pdf_file)
+    ranges = (
+        (start, min(start + pages_per_task, n_pages))
+        for start in range(0, n_pages, pages_per_task)
+    )
+    # Not forked, as the threads of the parent (e.g. the text-to-speech workers or
+    # the ones of torch) could be holding locks that would stay held in the child.
+    executor = ProcessPoolExecutor(
+        max_workers=num_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_pdf_worker,
+        initargs=(source,),
+    )
+    pending: deque[Future] = deque()
     try:
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        return "\n".join(page.extract_text() for page in pdf_reader.pages)
+        for start, end in ranges:
+            pending.append(executor.submit(_extract_pdf_pages, start, end))
+            while len(pending) > 2 * num_workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        # When stopped early, the ranges not started yet are not extracted.
+        executor.shutdown(cancel_futures=True)
+
+
+def iter_pdf(pdf_file: "str | UploadedFile", num_workers: int = 0) -> Iterator[str]:
+    """
+    Lazily loads the text of a PDF, in chunks joining to the text of `load_pdf`.
+
+    Args:
+        pdf_file (str | UploadedFile): The path to the PDF, or a file uploaded to Streamlit.
+        num_workers (int, optional): The number of processes extracting pages.
+            See `iter_pdf_pages`. Defaults to 0.
+
+    Yields:
+        str: The text of each page, after a line break for all but the first one.
+    """
+    return _iter_joined(iter_pdf_pages(pdf_file, num_workers=num_workers), "\n")
+
+
+def load_pdf(
+    pdf_file: "str | UploadedFile",
+    max_characters: int | None = None,
+    num_workers: int = 0,
+) -> str | None:
+    """
+    Loads the text of a PDF.
+
+    Args:
+        pdf_file (str | UploadedFile): The path to the PDF, or a file uploaded to Streamlit.
+        max_characters (int | None, optional): If provided, the pages after the one
+            reaching this number of characters are not extracted. Defaults to None.
+        num_workers (int, optional): The number of processes extracting pages.
+            See `iter_pdf_pages`. Defaults to 0.
+
+    Returns:
+        str | None: The text of the pages, one per line, or None if it can't be read.
+    """
+    try:
+        return join_chunks(iter_pdf(pdf_file, num_workers=num_workers), max_characters)
     except Exception as e:
         logger.exception(e)
         return None
 
 
-def load_txt(txt_file: str | UploadedFile) -> str | None:
+def iter_txt(
+    txt_file: "str | UploadedFile", chunk_size: int = _CHUNK_SIZE
+) -> Iterator[str]:
+    """
+    Lazily loads a text file, reading it in blocks through a buffered file, so only
+    the blocks actually used are read from the disk.
+
+    Args:
+        txt_file (str | UploadedFile): The path to the file, or a file uploaded to Streamlit.
+        chunk_size (int, optional): The number of characters of each chunk.
+            Defaults to 64 KB.
+
+    Yields:
+        str: The text, in chunks.
+    """
+    if hasattr(txt_file, "getvalue"):  # UploadedFile
+        data = txt_file.getvalue()
+        blocks = (data[n : n + chunk_size] for n in range(0, len(data), chunk_size))
+        yield from codecs.iterdecode(blocks, "utf-8")
+    else:
+        with open(txt_file, "r") as file:
+            yield from iter(partial(file.read, chunk_size), "")
+
+
+def load_txt(
+    txt_file: "str | UploadedFile", max_characters: int | None = None
+) -> str | None:
+    """
+    Loads a text file (also used for HTML and Markdown files).
+
+    Args:
+        txt_file (str | UploadedFile): The path to the file, or a file uploaded to Streamlit.
+        max_characters (int | None, optional): If provided, the file is read until
+            this number of characters, rounded up to a block of 64 KB.
+            Defaults to None.
+
+    Returns:
+        str | None: The text, or None if it can't be read.
+    """
     try:
-        if isinstance(txt_file, UploadedFile):
-            return txt_file.getvalue().decode("utf-8")
-        else:
-            with open(txt_file, "r") as file:
-                return file.read()
+        return join_chunks(iter_txt(txt_file), max_characters)
     except Exception as e:
         logger.exception(e)
         return None
 
 
-def load_docx(docx_file: str | UploadedFile) -> str | None:
+def iter_docx(docx_file: "str | UploadedFile") -> Iterator[str]:
+    """
+    Lazily loads the text of a DOCX, in chunks joining to the text of `load_docx`.
+
+    Args:
+        docx_file (str | UploadedFile): The path to the DOCX, or a file uploaded to Streamlit.
+
+    Yields:
+        str: The text of each paragraph, after a line break for all but the first one.
+    """
+    from docx import Document
+
+    docx_reader = Document(docx_file)
+    paragraphs = (paragraph.text for paragraph in docx_reader.paragraphs)
+    return _iter_joined(paragraphs, "\n")
+
+
+def load_docx(
+    docx_file: "str | UploadedFile", max_characters: int | None = None
+) -> str | None:
+    """
+    Loads the text of a DOCX.
+
+    Args:
+        docx_file (str | UploadedFile): The path to the DOCX, or a file uploaded to Streamlit.
+        max_characters (int | None, optional): If provided, the paragraphs after the
+            one reaching this number of characters are not read. Defaults to None.
+
+    Returns:
+        str | None: The text of the paragraphs, one per line, or None if it can't be read.
+    """
     try:
-        docx_reader = Document(docx_file)
-        return "\n".join(paragraph.text for paragraph in docx_reader.paragraphs)
+        return join_chunks(iter_docx(docx_file), max_characters)
     except Exception as e:
         logger.exception(e)
         return None
 
 
-def load_url(url: str) -> str | None:
-    try:
-        response = requests.get(url)
+def iter_url(url: str, chunk_size: int = _CHUNK_SIZE) -> Iterator[str]:
+    """
+    Lazily downloads a web page, so the rest of the body is not downloaded if the
+    iterator is stopped.
+
+    Args:
+        url (str): The URL of the page.
+        chunk_size (int, optional): The number of bytes of each chunk.
+            Defaults to 64 KB.
+
+    Yields:
+        str: The text of the page, in chunks.
+    """
+    import requests
+
+    with requests.get(url, stream=True) as response:
         response.raise_for_status()
-        return response.text
+        if response.encoding is None:
+            # It's guessed from the whole body, as `response.text` does.
+            yield response.text
+        else:
+            yield from response.iter_content(chunk_size, decode_unicode=True)
+
+
+def load_url(url: str, max_characters: int | None = None) -> str | None:
+    """
+    Loads the text of a web page.
+
+    Args:
+        url (str): The URL of the page.
+        max_characters (int | None, optional): If provided, the page is downloaded
+            until this number of characters, rounded up to a chunk of 64 KB.
+            Defaults to None.
+
+    Returns:
+        str | None: The text of the page, or None if it can't be downloaded.
+    """
+    try:
+        return join_chunks(iter_url(url), max_characters)
     except Exception as e:
         logger.exception(e)
         return None
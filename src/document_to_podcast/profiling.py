@@ -0,0 +1,283 @@
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import tracemalloc
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+
+from loguru import logger
+
+
+# Since Python 3.12, cProfile is built on `sys.monitoring`, which allows a single
+# profiler at a time, receiving the calls of all the threads.
+_CPROFILE_ALL_THREADS = sys.version_info >= (3, 12)
+
+
+class StageProfiler(ABC):
+    """
+    Profiles the stages of a podcast generation, each one separately.
+
+    The stages can be nested: while an inner stage runs, the outer one is paused, so
+    each function call is attributed to the innermost stage only (e.g. `write_audio`
+    inside `generate_podcast`). Each thread keeps its own stack of stages, so the
+    stages running in worker threads (e.g. `text_to_speech`) are profiled as well.
+
+    Subclasses implement `_create`, `_resume`, `_pause` and `_write_stage` for a
+    given profiler.
+
+    Args:
+        memory (bool, optional): Whether to also trace the memory allocations with
+            `tracemalloc`, taking a snapshot at the end of each outermost stage.
+            Defaults to False.
+        top (int, optional): The number of functions (or allocation sites) listed for
+            each stage in the summary. Defaults to 20.
+    """
+
+    extension = ".prof"
+
+    def __init__(self, memory: bool = False, top: int = 20):
+        self.memory = memory
+        self.top = top
+        self.handles: dict[str, list] = {}
+        self.snapshots: dict[str, tuple] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._started_tracemalloc = memory and not tracemalloc.is_tracing()
+        if self._started_tracemalloc:
+            tracemalloc.start()
+
+    @abstractmethod
+    def _create(self):
+        """Returns a new profiler, for one stage in one thread."""
+
+    @abstractmethod
+    def _resume(self, handle) -> None:
+        """Starts or resumes the profiling of a stage in the current thread."""
+
+    @abstractmethod
+    def _pause(self, handle) -> None:
+        """Pauses the profiling of a stage in the current thread."""
+
+    @abstractmethod
+    def _write_stage(self, handles: list, path: Path) -> str:
+        """Writes the merged profile of `handles` to `path` and returns its summary."""
+
+    def _write_merged(self, handles: list, path: Path) -> str:
+        """Writes the profile of all the stages to `path` and returns its summary."""
+        return self._write_stage(handles, path)
+
+    def _get_handle(self, name: str):
+        # One profiler per stage and thread, resumed every time the stage runs again.
+        handles = self._local.__dict__.setdefault("handles", {})
+        if name not in handles:
+            handles[name] = self._create()
+            with self._lock:
+                self.handles.setdefault(name, []).append(handles[name])
+        return handles[name]
+
+    @contextmanager
+    def profile(self, name: str, snapshot: bool = False):
+        """
+        Profiles a stage. A stage run several times is merged into a single profile.
+
+        Args:
+            name (str): The name of the stage.
+            snapshot (bool, optional): Whether to take a `tracemalloc` snapshot at the
+                end of the stage, if `memory` is enabled and it is not nested in
+                another stage. Defaults to False.
+        """
+        stack = self._local.__dict__.setdefault("stack", [])
+        if stack:
+            self._pause(self._get_handle(stack[-1]))
+        snapshot = snapshot and self.memory and not stack
+        if snapshot:
+            before = tracemalloc.take_snapshot()
+        stack.append(name)
+        handle = self._get_handle(name)
+        self._resume(handle)
+        try:
+            yield
+        finally:
+            self._pause(handle)
+            stack.pop()
+            if snapshot:
+                with self._lock:
+                    self.snapshots[name] = (before, tracemalloc.take_snapshot())
+            if stack:
+                self._resume(self._get_handle(stack[-1]))
+
+    def write(self, folder: str | Path) -> None:
+        """
+        Writes a profile file for each stage, one merging all the stages, and a
+        `summary.txt` listing the hottest functions of each of them.
+
+        With `memory`, the `tracemalloc` snapshot at the end of each stage is written
+        too, and the allocation sites that grew the most during it are listed. The
+        tracing is stopped, if it was started by the profiler.
+
+        Args:
+            folder (str | Path): The folder where the files are written.
+        """
+        folder = Path(folder)
+        folder.mkdir(parents=True, exist_ok=True)
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        with self._lock:
+            handles = {name: list(stage) for name, stage in self.handles.items()}
+            snapshots = dict(self.snapshots)
+
+        summary = []
+        all_handles = [handle for stage in handles.values() for handle in stage]
+        if all_handles:
+            summary.append(
+                _section(
+                    "All stages",
+                    self._write_merged(all_handles, folder / f"all{self.extension}"),
+                )
+            )
+        for name, stage_handles in handles.items():
+            summary.append(
+                _section(
+                    name,
+                    self._write_stage(
+                        stage_handles, folder / f"{name}{self.extension}"
+                    ),
+                )
+            )
+        for name, (before, after) in snapshots.items():
+            after.dump(str(folder / f"{name}.tracemalloc"))
+            stats = after.compare_to(before, "lineno")[: self.top]
+            summary.append(
+                _section(
+                    f"{name} (memory)", "\n".join(str(stat) for stat in stats) + "\n"
+                )
+            )
+        (folder / "summary.txt").write_text("\n".join(summary))
+        logger.info(f"Profiles written to {folder}")
+
+
+def _section(title: str, text: str) -> str:
+    return f"{'=' * 80}\n{title}\n{'=' * 80}\n{text}"
+
+
+class CProfileProfiler(StageProfiler):
+    """
+    Profiles the stages with `cProfile`. Each stage is written as a `.prof` file, which
+    can be opened with `pstats` or tools such as `snakeviz`.
+
+    Since Python 3.12, `cProfile` can only profile one thread at a time, so only the
+    stages of the main thread are profiled (and the calls of the other threads are
+    attributed to them). Use `PyinstrumentProfiler` to profile the worker threads.
+    """
+
+    extension = ".prof"
+
+    def __init__(self, memory: bool = False, top: int = 20):
+        super().__init__(memory=memory, top=top)
+        self._warned = False
+
+    def _create(self):
+        return cProfile.Profile()
+
+    def _resume(self, handle) -> None:
+        if (
+            _CPROFILE_ALL_THREADS
+            and threading.current_thread() is not threading.main_thread()
+        ):
+            # Enabling it would raise "Another profiling tool is already active".
+            if not self._warned:
+                self._warned = True
+                logger.warning(
+                    "cProfile can't profile the stages of worker threads since"
+                    " Python 3.12, use `--profile pyinstrument` instead"
+                )
+            return
+        try:
+            handle.enable()
+        except ValueError:  # Another thread is being profiled.
+            pass
+
+    def _pause(self, handle) -> None:
+        handle.disable()
+
+    def _get_stats(self, handles: list, stream: io.StringIO) -> pstats.Stats | None:
+        profiles = []
+        for profile in handles:
+            profile.create_stats()
+            if profile.stats:
+                profiles.append(profile)
+        return pstats.Stats(*profiles, stream=stream) if profiles else None
+
+    def _write_stage(self, handles: list, path: Path, sort: str = "cumulative") -> str:
+        stream = io.StringIO()
+        stats = self._get_stats(handles, stream)
+        if stats is None:
+            return "Nothing was profiled.\n"
+        stats.dump_stats(path)
+        stats.strip_dirs().sort_stats(sort).print_stats(self.top)
+        return stream.getvalue()
+
+    def _write_merged(self, handles: list, path: Path) -> str:
+        # The time spent in each function itself, across stages, shows the hot spots.
+        return self._write_stage(handles, path, sort="tottime")
+
+
+class PyinstrumentProfiler(StageProfiler):
+    """
+    Profiles the stages with the `pyinstrument` sampling profiler, which has a lower
+    overhead than `cProfile` on code making many small calls. Each stage is written
+    as an interactive `.html` call tree.
+
+    Requires `pip install document-to-podcast[profiling]`.
+    """
+
+    extension = ".html"
+
+    def __init__(self, memory: bool = False, top: int = 20):
+        try:
+            import pyinstrument  # noqa: F401
+        except ImportError as e:
+            raise ImportError(
+                "The pyinstrument profiler requires"
+                " `pip install document-to-podcast[profiling]`"
+            ) from e
+        super().__init__(memory=memory, top=top)
+
+    def _create(self):
+        from pyinstrument import Profiler
+
+        return Profiler(async_mode="disabled")
+
+    def _resume(self, handle) -> None:
+        handle.start()
+
+    def _pause(self, handle) -> None:
+        # The sessions of a profiler stopped and started again are combined.
+        handle.stop()
+
+    def _write_stage(self, handles: list, path: Path) -> str:
+        from pyinstrument.renderers import ConsoleRenderer, HTMLRenderer
+        from pyinstrument.session import Session
+
+        sessions = [
+            profiler.last_session
+            for profiler in handles
+            if profiler.last_session is not None
+        ]
+        if not sessions:
+            return "Nothing was profiled.\n"
+        session = sessions[0]
+        for other in sessions[1:]:
+            session = Session.combine(session, other)
+        path.write_text(HTMLRenderer().render(session))
+        return ConsoleRenderer(unicode=False, color=False).render(session)
+
+
+PROFILERS = {
+    "cprofile": CProfileProfiler,
+    "pyinstrument": PyinstrumentProfiler,
+}
@@ -0,0 +1,309 @@
+import json
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from queue import Queue
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from fire import Fire
+from loguru import logger
+from pydantic import ValidationError
+
+from document_to_podcast.batch import BatchWorker
+from document_to_podcast.config import (
+    Config,
+    LlamaParams,
+    Speaker,
+    DEFAULT_LLAMA_PROFILE,
+    DEFAULT_SPEAKERS,
+)
+
+DEFAULT_SERVER_URL = "http://127.0.0.1:8765"
+
+# The `Config` fields holding paths, made absolute before being sent to the server.
+PATH_FIELDS = [
+    "input_file",
+    "output_folder",
+    "from_script",
+    "tts_cache_dir",
+    "prompt_cache_dir",
+    "script_cache_dir",
+    "llama_profile",
+    "metrics_events_file",
+]
+
+
+def _absolute_path(path: str | None) -> str | None:
+    return str(Path(path).expanduser().resolve()) if path is not None else None
+
+
+class PodcastRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handles the requests to a [serve][document_to_podcast.server.serve] server.
+
+    - `GET /health`: Returns `{"status": "ok"}`.
+    - `POST /podcast`: Generates a podcast. The body is a `Config` as JSON, and the
+        response includes the paths of the generated files.
+    """
+
+    server: "PodcastServer"
+
+    def do_GET(self):
+        if self.path != "/health":
+            self._send_json(
+                HTTPStatus.NOT_FOUND, {"error": f"Unknown path {self.path}"}
+            )
+            return
+        self._send_json(HTTPStatus.OK, {"status": "ok"})
+
+    def do_POST(self):
+        if self.path != "/podcast":
+            self._send_json(
+                HTTPStatus.NOT_FOUND, {"error": f"Unknown path {self.path}"}
+            )
+            return
+        try:
+            length = int(self.headers["Content-Length"])
+            if length < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            self._send_json(
+                HTTPStatus.BAD_REQUEST,
+                {"error": f"Invalid Content-Length: {self.headers['Content-Length']}"},
+            )
+            return
+        try:
+            config = Config.model_validate_json(self.rfile.read(length))
+        except ValidationError as e:
+            self._send_json(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+            return
+        # The models are already loaded, so they can't be changed by a request.
+        for name, value in self.server.served_settings.items():
+            if getattr(config, name) == value:
+                continue
+            if isinstance(value, LlamaParams):
+                value = value.model_dump(exclude_none=True)
+            error = (
+                f"The server only runs {value}"
+                if name in ("text_to_text_model", "text_to_speech_model")
+                else f"The server only runs with {name}={value}"
+            )
+            self._send_json(HTTPStatus.BAD_REQUEST, {"error": error})
+            return
+
+        # Wait for a worker to be free, so only `num_workers` jobs run at once.
+        worker = self.server.workers.get()
+        try:
+            logger.info(f"Generating podcast in {config.output_folder}")
+            worker.generate(config)
+        except Exception as e:
+            logger.opt(exception=e).error("Failed to generate podcast")
+            self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)})
+            return
+        finally:
+            self.server.workers.put(worker)
+
+        output_folder = Path(config.output_folder)
+        self._send_json(
+            HTTPStatus.OK,
+            {
+                "podcast_script": str(output_folder / "podcast.txt"),
+                "podcast_audio": str(output_folder / "podcast.wav"),
+            },
+        )
+
+    def _send_json(self, status: HTTPStatus, content: dict) -> None:
+        body = json.dumps(content).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+
+class PodcastServer(ThreadingHTTPServer):
+    """
+    HTTP server keeping a pool of workers with their models loaded.
+
+    Requests whose models, `llama_params`, `llama_profile` or `draft_model` (and
+    `num_draft_tokens`) differ from the ones the models were loaded with are rejected.
+    So are requests whose `prompt_cache_dir` or `prompt_cache_max_size` differ from
+    the ones of the server, as each worker keeps a single prompt state cache.
+
+    Args:
+        address (tuple[str, int]): The host and port to listen on.
+        settings (dict): The models to serve (`text_to_text_model` and
+            `text_to_speech_model`) and, optionally, the `llama_params`,
+            `llama_profile`, `draft_model` and `num_draft_tokens` they are loaded with,
+            and the `prompt_cache_dir` and `prompt_cache_max_size` of the workers.
+        workers (list[BatchWorker]): The pool of workers. Each of them handles
+            one request at a time.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self, address: tuple[str, int], settings: dict, workers: list[BatchWorker]
+    ):
+        super().__init__(address, PodcastRequestHandler)
+        self.settings = settings
+        # The values of the `Config` fields matching the loaded models.
+        self.served_settings = {
+            "text_to_text_model": settings["text_to_text_model"],
+            "text_to_speech_model": settings["text_to_speech_model"],
+            "llama_params": LlamaParams.model_validate(
+                settings.get("llama_params") or {}
+            ),
+            "llama_profile": _absolute_path(
+                settings.get("llama_profile", DEFAULT_LLAMA_PROFILE)
+            ),
+            "draft_model": settings.get("draft_model"),
+            "prompt_cache_dir": _absolute_path(settings.get("prompt_cache_dir")),
+            "prompt_cache_max_size": settings.get("prompt_cache_max_size", 4096),
+        }
+        if self.served_settings["draft_model"]:
+            self.served_settings["num_draft_tokens"] = settings.get(
+                "num_draft_tokens", 10
+            )
+        self.workers: Queue[BatchWorker] = Queue()
+        for worker in workers:
+            self.workers.put(worker)
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    text_to_text_model: str = "bartowski/Qwen2.5-7B-Instruct-GGUF/Qwen2.5-7B-Instruct-Q8_0.gguf",
+    text_to_speech_model: str = "hexgrad/Kokoro-82M",
+    num_workers: int = 1,
+    threads_per_worker: int | None = None,
+    llama_params: dict | None = None,
+    llama_profile: str | None = DEFAULT_LLAMA_PROFILE,
+    draft_model: str | None = None,
+    num_draft_tokens: int = 10,
+    prompt_cache_dir: str | None = None,
+    prompt_cache_max_size: int = 4096,
+):
+    """
+    Run a local server that keeps the models loaded and generates podcasts on request.
+
+    Send jobs to it with `document-to-podcast --server_url http://127.0.0.1:8765`,
+    so they only pay for the generation and not for loading the models.
+
+    Args:
+        host (str, optional): The host to listen on. Defaults to `127.0.0.1`.
+
+        port (int, optional): The port to listen on. Defaults to 8765.
+
+        text_to_text_model (str, optional): The text-to-text model to serve.
+            Requests using another model are rejected.
+            Defaults to `bartowski/Qwen2.5-7B-Instruct-GGUF/Qwen2.5-7B-Instruct-Q8_0.gguf`.
+
+        text_to_speech_model (str, optional): The text-to-speech model to serve.
+            Requests using another model are rejected.
+            Defaults to `hexgrad/Kokoro-82M`.
+
+        num_workers (int, optional): The number of podcasts generated at the same time.
+            Each worker keeps its own copy of the models, so memory grows with it.
+            Other requests wait for a worker to be free.
+            Defaults to 1.
+
+        threads_per_worker (int, optional): The number of threads used by the models
+            of each worker. If None, the defaults of each backend are used.
+            Defaults to None.
+
+        llama_params (dict | None, optional): Same as in
+            [document_to_podcast][document_to_podcast.cli.document_to_podcast].
+            Requests with other ones are rejected. Defaults to None.
+
+        llama_profile (str | None, optional): Same as in
+            [document_to_podcast][document_to_podcast.cli.document_to_podcast].
+            Requests with another one are rejected.
+            Defaults to `~/.cache/document-to-podcast/llama_profile.json`.
+
+        draft_model (str | None, optional): Same as in
+            [document_to_podcast][document_to_podcast.cli.document_to_podcast].
+            Requests with another one are rejected. Defaults to None.
+
+        num_draft_tokens (int, optional): Same as in
+            [document_to_podcast][document_to_podcast.cli.document_to_podcast].
+            Requests with another one are rejected when `draft_model` is used.
+            Defaults to 10.
+
+        prompt_cache_dir (str | None, optional): Same as in
+            [document_to_podcast][document_to_podcast.cli.document_to_podcast].
+            Requests with another one are rejected. Defaults to None.
+
+        prompt_cache_max_size (int, optional): Same as in
+            [document_to_podcast][document_to_podcast.cli.document_to_podcast].
+            Requests with another one are rejected. Defaults to 4096.
+    """
+    settings = {
+        "text_to_text_model": text_to_text_model,
+        "text_to_speech_model": text_to_speech_model,
+        "llama_params": LlamaParams.model_validate(llama_params or {}).model_dump(),
+        # Absolute, like the ones sent by `send_podcast_request`.
+        "llama_profile": _absolute_path(llama_profile),
+        "draft_model": draft_model,
+        "num_draft_tokens": num_draft_tokens,
+        "prompt_cache_dir": _absolute_path(prompt_cache_dir),
+        "prompt_cache_max_size": prompt_cache_max_size,
+    }
+    speakers = [Speaker.model_validate(speaker) for speaker in DEFAULT_SPEAKERS]
+    workers = []
+    for _ in range(num_workers):
+        worker = BatchWorker(settings, n_threads=threads_per_worker)
+        worker.load_text_model()
+        # Warm up the TTS model for the language of the default speakers.
+        worker.load_speech_model(speakers)
+        workers.append(worker)
+
+    with PodcastServer((host, port), settings, workers) as server:
+        logger.success(f"Serving on http://{host}:{port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logger.info("Stopping server.")
+
+
+def send_podcast_request(config: Config, server_url: str = DEFAULT_SERVER_URL) -> dict:
+    """
+    Sends a podcast generation job to a [serve][document_to_podcast.server.serve] server.
+
+    The paths in `config` (see `PATH_FIELDS`) are made absolute, with `~` expanded,
+    as the server runs from its own folder.
+
+    Args:
+        config (Config): The configuration of the podcast.
+        server_url (str, optional): The URL of the server.
+            Defaults to `http://127.0.0.1:8765`.
+
+    Raises:
+        RuntimeError: If the server fails to generate the podcast.
+
+    Returns:
+        dict: The paths of the generated `podcast_script` and `podcast_audio`.
+    """
+    content = config.model_dump(mode="json")
+    for path in PATH_FIELDS:
+        content[path] = _absolute_path(content[path])
+    request = Request(
+        f"{server_url.rstrip('/')}/podcast",
+        data=json.dumps(content).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urlopen(request) as response:
+            return json.loads(response.read())
+    except HTTPError as e:
+        error = json.loads(e.read()).get("error", e.reason)
+        raise RuntimeError(f"The server failed to generate the podcast: {error}") from e
+
+
+def main():
+    Fire(serve)
@@ -0,0 +1,217 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from fire import Fire
+from loguru import logger
+
+from document_to_podcast.config import DEFAULT_LLAMA_PROFILE, LlamaParams
+from document_to_podcast.inference.model_loaders import load_llama_cpp_model
+
+if TYPE_CHECKING:
+    from llama_cpp import Llama
+
+PROBE_TEXT = (
+    "A podcast is a series of spoken episodes, often focused on a particular topic,"
+    " that listeners can download or stream. "
+)
+
+
+def load_llama_profile(profile: str | Path) -> dict[str, dict]:
+    """
+    Loads the tuned llama.cpp parameters of each model.
+
+    Args:
+        profile (str | Path): The path of the profile file.
+
+    Returns:
+        dict[str, dict]: The parameters by text-to-text model_id. Empty if the file
+            doesn't exist.
+    """
+    path = Path(profile).expanduser()
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def save_llama_profile(profile: str | Path, model_id: str, params: dict) -> None:
+    """
+    Stores the tuned llama.cpp parameters of a model, keeping those of other models.
+
+    Args:
+        profile (str | Path): The path of the profile file.
+        model_id (str): The text-to-text model_id.
+        params (dict): The parameters, as accepted by `LlamaParams`.
+    """
+    path = Path(profile).expanduser()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    profiles = load_llama_profile(path)
+    profiles[model_id] = LlamaParams.model_validate(params).model_dump(
+        exclude_none=True
+    )
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(profiles, indent=2))
+    os.replace(tmp_path, path)
+
+
+def get_llama_kwargs(
+    model_id: str, params: LlamaParams, profile: str | Path | None = None
+) -> dict:
+    """
+    Resolves the arguments of `load_llama_cpp_model`.
+
+    The parameters set in `params` take precedence over the ones in `profile`, and
+    those set in neither are left to llama.cpp.
+
+    Args:
+        model_id (str): The text-to-text model_id.
+        params (LlamaParams): The parameters set by the user.
+        profile (str | Path | None, optional): The path of the profile file written
+            by [tune][document_to_podcast.tune.tune]. Defaults to None.
+
+    Returns:
+        dict: The keyword arguments for `Llama`.
+    """
+    kwargs = {}
+    if profile is not None:
+        kwargs.update(load_llama_profile(profile).get(model_id, {}))
+    kwargs.update(params.model_dump(exclude_none=True))
+    if kwargs.get("type_v", "f16") != "f16" and not kwargs.get("flash_attn"):
+        logger.warning("A quantized type_v requires flash_attn in llama.cpp")
+    for cache_type in ["type_k", "type_v"]:
+        if cache_type in kwargs:
+            import llama_cpp
+
+            kwargs[cache_type] = getattr(
+                llama_cpp, f"GGML_TYPE_{kwargs[cache_type].upper()}"
+            )
+    return kwargs
+
+
+def probe(
+    model: "Llama", n_prompt_tokens: int = 512, n_decode_tokens: int = 32
+) -> tuple[float, float]:
+    """
+    Measures the prefill and decode speed of a loaded model.
+
+    Args:
+        model (Llama): The model, with a context of at least
+            `n_prompt_tokens + n_decode_tokens`.
+        n_prompt_tokens (int, optional): The number of tokens evaluated at once.
+            Defaults to 512.
+        n_decode_tokens (int, optional): The number of tokens evaluated one by one
+            after the prompt. Defaults to 32.
+
+    Returns:
+        tuple[float, float]: The prefill and the decode speed, in tokens per second.
+    """
+    tokens = []
+    while len(tokens) < n_prompt_tokens + n_decode_tokens:
+        tokens += model.tokenize(PROBE_TEXT.encode("utf-8"), add_bos=not tokens)
+    model.reset()
+    start = time.perf_counter()
+    model.eval(tokens[:n_prompt_tokens])
+    prefill_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for token in tokens[n_prompt_tokens : n_prompt_tokens + n_decode_tokens]:
+        model.eval([token])
+    decode_time = time.perf_counter() - start
+    model.reset()
+    return n_prompt_tokens / prefill_time, n_decode_tokens / decode_time
+
+
+def _default_thread_counts() -> list[int]:
+    n_cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else 0
+    n_cores = n_cores or os.cpu_count() or 1
+    return sorted({max(n_cores // 4, 1), max(n_cores // 2, 1), n_cores})
+
+
+def tune(
+    text_to_text_model: str = "bartowski/Qwen2.5-7B-Instruct-GGUF/Qwen2.5-7B-Instruct-Q8_0.gguf",
+    profile: str = DEFAULT_LLAMA_PROFILE,
+    thread_counts: list[int] | None = None,
+    batch_sizes: list[int] | None = None,
+    n_prompt_tokens: int = 512,
+    n_decode_tokens: int = 32,
+) -> dict:
+    """
+    Find the fastest llama.cpp parameters for a model on this machine, and save them
+    to a profile that later runs use.
+
+    Short prefill and decode probes are run for each candidate:
+
+        1. The thread counts, keeping the fastest one for the decode (`n_threads`)
+            and for the prefill (`n_threads_batch`) separately.
+        2. The batch sizes (`n_batch` and `n_ubatch`), by prefill speed.
+        3. Flash attention on and off, by the total time of the probes.
+
+    The KV cache types are not tuned, as they trade quality for memory. Set them
+    with `llama_params` instead.
+
+    Args:
+        text_to_text_model (str, optional): The text-to-text model_id to tune.
+            Defaults to `bartowski/Qwen2.5-7B-Instruct-GGUF/Qwen2.5-7B-Instruct-Q8_0.gguf`.
+
+        profile (str, optional): The path of the profile file.
+            The parameters of other models in it are kept.
+            Defaults to `~/.cache/document-to-podcast/llama_profile.json`.
+
+        thread_counts (list[int] | None, optional): The thread counts to try.
+            Defaults to a quarter, half and all of the available cores.
+
+        batch_sizes (list[int] | None, optional): The batch sizes to try.
+            Defaults to `[128, 256, 512]`.
+
+        n_prompt_tokens (int, optional): The length of the prefill probe. Defaults to 512.
+
+        n_decode_tokens (int, optional): The length of the decode probe. Defaults to 32.
+
+    Returns:
+        dict: The saved parameters.
+    """
+    thread_counts = thread_counts or _default_thread_counts()
+    batch_sizes = batch_sizes or [128, 256, 512]
+    n_ctx = n_prompt_tokens + n_decode_tokens
+
+    def run(**params) -> tuple[float, float]:
+        model = load_llama_cpp_model(text_to_text_model, n_ctx=n_ctx, **params)
+        # Warm up, so the first candidate doesn't pay for reading the weights.
+        probe(model, min(n_prompt_tokens, 32), 1)
+        prefill, decode = probe(model, n_prompt_tokens, n_decode_tokens)
+        del model
+        logger.info(f"{params}: prefill {prefill:.1f} tok/s, decode {decode:.1f} tok/s")
+        return prefill, decode
+
+    best = {}
+    speeds = {
+        n_threads: run(n_threads=n_threads, n_threads_batch=n_threads)
+        for n_threads in thread_counts
+    }
+    best["n_threads"] = max(speeds, key=lambda n: speeds[n][1])
+    best["n_threads_batch"] = max(speeds, key=lambda n: speeds[n][0])
+
+    speeds = {
+        n_batch: run(**best, n_batch=n_batch, n_ubatch=n_batch)
+        for n_batch in batch_sizes
+    }
+    best["n_batch"] = best["n_ubatch"] = max(speeds, key=lambda n: speeds[n][0])
+
+    def probe_time(speed: tuple[float, float]) -> float:
+        return n_prompt_tokens / speed[0] + n_decode_tokens / speed[1]
+
+    speeds = {False: run(**best, flash_attn=False)}
+    try:
+        speeds[True] = run(**best, flash_attn=True)
+    except ValueError as e:
+        logger.warning(f"Flash attention is not supported: {e}")
+    best["flash_attn"] = min(speeds, key=lambda f: probe_time(speeds[f]))
+
+    save_llama_profile(profile, text_to_text_model, best)
+    logger.success(f"Saved {best} to {profile}")
+    return best
+
+
+def main():
+    Fire(tune)
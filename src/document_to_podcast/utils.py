@@ -1,29 +1,137 @@
-from typing import List
+from pathlib import Path
+from typing import Iterable, List
 
 import numpy as np
 
 
+def _sample_silence_pads(
+    rng: np.random.Generator, size: int, sample_rate: int, silence_pad: float
+) -> np.ndarray:
+    """
+    Sample the length (in samples) of the silence padded after each of `size` segments.
+    """
+    if silence_pad <= 0.0:
+        return np.zeros(size, dtype=np.int64)
+    return (rng.uniform(low=0.0, high=silence_pad, size=size) * sample_rate).astype(
+        np.int64
+    )
+
+
 def stack_audio_segments(
-    audio_segments: List[np.ndarray], sample_rate: int, silence_pad: float = 1.0
+    audio_segments: List[np.ndarray],
+    sample_rate: int,
+    silence_pad: float = 1.0,
+    dtype: np.dtype | None = None,
+    out: np.ndarray | memoryview | None = None,
 ) -> np.ndarray:
     """
     Stack / concatenate all the individual audio segments (speaker audios) sequentially to form the complete podcast.
     Additionally, at the end of each speaker's audio, add a small silence audio as buffer between speakers for a more
     natural sounding podcast. You can turn off this feature by setting silence_pad = 0.0
+
+    The output is allocated once, with the dtype of the segments, and each segment is copied into its slice.
     Args:
         audio_segments: A list of each speaker's audio in order.
         sample_rate: The sample rate of the waveform generated by the model.
         silence_pad: The maximum length of silence to pad at the end of each audio, sampling between 0.0 and this number.
+        dtype: The dtype of the complete podcast. Defaults to the dtype of the audio segments.
+        out: A preallocated buffer (e.g. a `np.memmap` or a writable `memoryview`) to write the complete podcast to.
+            It must be big enough to hold all the segments and the silence pads.
 
-    Returns: The complete podcast as a single, concatenated waveform.
+    Returns: The complete podcast as a single, concatenated waveform. If `out` is given, a view of it.
 
     """
-    stacked = []
-    rng = np.random.default_rng(42)
-    for segment in audio_segments:
-        stacked.append(segment)
-        if silence_pad > 0.0:
-            stacked.append(
-                np.zeros(int(rng.uniform(low=0.0, high=silence_pad) * sample_rate))
+    pads = _sample_silence_pads(
+        np.random.default_rng(42), len(audio_segments), sample_rate, silence_pad
+    )
+    total = sum(len(segment) for segment in audio_segments) + int(pads.sum())
+
+    if out is None:
+        if dtype is None:
+            dtype = np.result_type(*audio_segments) if audio_segments else np.float32
+        out = np.empty(total, dtype=dtype)
+    else:
+        out = np.asarray(out)
+        if len(out) < total:
+            raise ValueError(
+                f"`out` is too small ({len(out)}) to hold the complete podcast ({total})."
             )
-    return np.concatenate(stacked)
+
+    offset = 0
+    for segment, pad in zip(audio_segments, pads):
+        out[offset : offset + len(segment)] = segment
+        offset += len(segment)
+        out[offset : offset + pad] = 0
+        offset += pad
+    return out[:total]
+
+
+class AudioSink:
+    """
+    Write the podcast audio to disk incrementally, as each speaker's audio is produced.
+
+    The file is opened once and every segment (followed by its silence pad) is appended
+    and flushed right away, so memory usage doesn't grow with the length of the podcast
+    and the audio generated so far is kept on disk if the process dies.
+    The silence pads are sampled in the same way as in
+    [stack_audio_segments][document_to_podcast.utils.stack_audio_segments], so both
+    produce the same waveform for the same segments.
+
+    Examples:
+        >>> with AudioSink("podcast.wav", sample_rate=24000) as sink:
+        ...     for speech in podcast_audio:
+        ...         sink.write(speech)
+
+    Args:
+        file (str | Path): The path to the output audio file.
+        sample_rate (int): The sample rate of the waveform generated by the model.
+        silence_pad (float): The maximum length of silence to pad at the end of each audio,
+            sampling between 0.0 and this number.
+    """
+
+    def __init__(self, file: str | Path, sample_rate: int, silence_pad: float = 1.0):
+        import soundfile as sf
+
+        self.sample_rate = sample_rate
+        self.silence_pad = silence_pad
+        self.frames = 0
+        self._rng = np.random.default_rng(42)
+        # Every silence pad is a slice of this buffer, instead of a new array per segment.
+        self._silence = np.zeros(int(silence_pad * sample_rate) + 1, dtype=np.float32)
+        self._file = sf.SoundFile(
+            str(file), mode="w", samplerate=sample_rate, channels=1
+        )
+
+    def write(self, segment: np.ndarray | Iterable[np.ndarray]) -> None:
+        """
+        Append a speaker's audio, followed by its silence pad, to the file.
+
+        Args:
+            segment (np.ndarray | Iterable[np.ndarray]): The speaker's audio.
+                It can also be given as the chunks yielded by
+                [text_to_speech_stream][document_to_podcast.inference.text_to_speech.text_to_speech_stream],
+                which are written as they are generated.
+        """
+        chunks = [segment] if isinstance(segment, np.ndarray) else segment
+        for chunk in chunks:
+            self._file.write(chunk)
+            self.frames += len(chunk)
+        if self.silence_pad > 0.0:
+            pad = _sample_silence_pads(
+                self._rng, 1, self.sample_rate, self.silence_pad
+            )[0]
+            self._file.write(self._silence[:pad])
+            self.frames += pad
+        self._file.flush()
+
+    def close(self) -> None:
+        """
+        Finalize the file header and close the file.
+        """
+        self._file.close()
+
+    def __enter__(self) -> "AudioSink":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,137 @@
+import pytest
+
+from document_to_podcast.inference.long_document import (
+    condense_document,
+    condense_sections,
+    split_into_sections,
+    split_into_token_sections,
+    split_llama_threads,
+)
+
+
+@pytest.fixture()
+def model(mocker):
+    # One token per word
+    model = mocker.MagicMock()
+    model.tokenize.side_effect = lambda text, add_bos, special: text.split()
+    model.n_ctx.return_value = 80
+    model.metadata = {}
+    return model
+
+
+def test_split_into_sections():
+    text = "First sentence. Second sentence. Averyveryverylongword."
+    assert split_into_sections(text, max_characters=20) == [
+        "First sentence.",
+        "Second sentence.",
+        "Averyveryverylongwor",
+        "d.",
+    ]
+    assert split_into_sections(text, max_characters=100) == [text]
+
+
+def test_split_into_token_sections(model):
+    text = "One two three. Four five six seven. Eight."
+    assert split_into_token_sections(text, model, max_tokens=4) == [
+        "One two three.",
+        "Four five six seven.",
+        "Eight.",
+    ]
+    assert split_into_token_sections(text, model, max_tokens=100) == [text]
+
+
+def test_condense_sections_keeps_order(mocker):
+    mocker.patch(
+        "document_to_podcast.inference.long_document.text_to_text",
+        side_effect=lambda section, model, **kwargs: section.upper(),
+    )
+    models = [mocker.MagicMock(), mocker.MagicMock()]
+    sections = [f"section {n}" for n in range(5)]
+    assert condense_sections(sections, models, system_prompt="Take notes.") == [
+        f"SECTION {n}" for n in range(5)
+    ]
+
+
+def test_condense_document(mocker, model):
+    text_to_text = mocker.patch(
+        "document_to_podcast.inference.long_document.text_to_text",
+        side_effect=lambda section, model, **kwargs: section[:5],
+    )
+    text = " ".join(["Some sentence."] * 20)
+    notes = condense_document(
+        text, [model], system_prompt="Take notes.", max_characters=50
+    )
+    assert len(notes) <= 50
+    assert text_to_text.call_args.kwargs == {
+        "system_prompt": "Take notes.",
+        "return_json": False,
+    }
+
+
+def test_condense_document_sections_fit_the_context(mocker, model):
+    text_to_text = mocker.patch(
+        "document_to_podcast.inference.long_document.text_to_text",
+        side_effect=lambda section, model, **kwargs: section[:5],
+    )
+    text = " ".join(["Some sentence."] * 20)
+    condense_document(text, [model], system_prompt="Take notes.", max_characters=100)
+    # 80 tokens of context - (2 + 32) for the prompt - 20 for the notes
+    sections = [call.args[0] for call in text_to_text.call_args_list]
+    assert len(sections[0].split()) == 26
+    assert all(len(section.split()) <= 26 for section in sections)
+
+
+def test_condense_document_sections_fit_the_smallest_context(mocker, model):
+    text_to_text = mocker.patch(
+        "document_to_podcast.inference.long_document.text_to_text",
+        side_effect=lambda section, model, **kwargs: section[:5],
+    )
+    main_model = mocker.MagicMock()
+    main_model.tokenize.side_effect = model.tokenize.side_effect
+    main_model.n_ctx.return_value = 800
+    main_model.metadata = {}
+    text = " ".join(["Some sentence."] * 20)
+    condense_document(
+        text, [main_model, model], system_prompt="Take notes.", max_characters=100
+    )
+    sections = [call.args[0] for call in text_to_text.call_args_list]
+    assert all(len(section.split()) <= 26 for section in sections)
+
+
+def test_condense_document_prompt_too_long(model):
+    model.n_ctx.return_value = 40
+    with pytest.raises(ValueError, match="context"):
+        condense_document(
+            "Some sentence. " * 20, [model], "Take notes.", max_characters=100
+        )
+
+
+def test_condense_document_section_tokens(mocker, model):
+    text_to_text = mocker.patch(
+        "document_to_podcast.inference.long_document.text_to_text",
+        side_effect=lambda section, model, **kwargs: section[:5],
+    )
+    text = " ".join(["Some sentence."] * 20)
+    condense_document(
+        text,
+        [model],
+        system_prompt="Take notes.",
+        max_characters=100,
+        section_tokens=6,
+    )
+    sections = [call.args[0] for call in text_to_text.call_args_list]
+    assert sections[0] == "Some sentence. Some sentence. Some sentence."
+    assert all(len(section.split()) <= 6 for section in sections)
+
+
+def test_split_llama_threads(mocker):
+    mocker.patch("os.cpu_count", return_value=8)
+    assert split_llama_threads({"n_ctx": 4096}, 2) == {
+        "n_ctx": 4096,
+        "n_threads": 2,
+        "n_threads_batch": 4,
+    }
+    assert split_llama_threads({"n_threads": 6, "n_threads_batch": 3}, 4) == {
+        "n_threads": 1,
+        "n_threads_batch": 1,
+    }
@@ -5,6 +5,7 @@ from kokoro import KPipeline
 from llama_cpp import Llama
 
 from document_to_podcast.inference.model_loaders import (
+    MAX_LOGITS_MEMORY,
     load_llama_cpp_model,
     load_tts_model,
 )
@@ -19,6 +20,45 @@ def test_load_llama_cpp_model():
     assert model.n_ctx() == 2048
 
 
+@pytest.mark.parametrize("n_ctx, expected_n_ctx", [(0, 8192), (4096, 4096)])
+def test_load_llama_cpp_model_caps_logits_memory(mocker, n_ctx, expected_n_ctx):
+    vocab = mocker.MagicMock(
+        metadata={"general.architecture": "qwen2", "qwen2.context_length": "32768"}
+    )
+    vocab.n_vocab.return_value = 131072
+    from_pretrained = mocker.patch.object(Llama, "from_pretrained", return_value=vocab)
+    load_draft_model = mocker.patch(
+        "document_to_podcast.inference.speculative.load_draft_model"
+    )
+
+    load_llama_cpp_model(
+        "org/repo/model.gguf", draft_model="org/repo/draft.gguf", n_ctx=n_ctx
+    )
+
+    assert expected_n_ctx * 131072 * 4 <= MAX_LOGITS_MEMORY
+    assert load_draft_model.call_args.kwargs == {"n_ctx": expected_n_ctx}
+    assert from_pretrained.call_args.kwargs["n_ctx"] == expected_n_ctx
+    assert from_pretrained.call_args.kwargs["logits_all"]
+
+
+def test_load_llama_cpp_model_reuses_vocab(mocker):
+    vocab = mocker.MagicMock(
+        metadata={"general.architecture": "qwen2", "qwen2.context_length": "32768"}
+    )
+    vocab.n_vocab.return_value = 131072
+    from_pretrained = mocker.patch.object(Llama, "from_pretrained")
+    mocker.patch("document_to_podcast.inference.speculative.load_draft_model")
+
+    load_llama_cpp_model(
+        "org/repo/model.gguf", draft_model="prompt_lookup", vocab=vocab
+    )
+
+    # Only the model itself is loaded.
+    from_pretrained.assert_called_once()
+    assert from_pretrained.call_args.kwargs["n_ctx"] == 8192
+    assert "vocab_only" not in from_pretrained.call_args.kwargs
+
+
 @pytest.mark.parametrize(
     "model_id, expected_model_type, expected_custom_args",
     [
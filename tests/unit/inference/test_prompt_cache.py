@@ -0,0 +1,122 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from llama_cpp import LlamaState
+
+from document_to_podcast.inference.prompt_cache import (
+    PromptStateCache,
+    prefill_system_prompt,
+)
+
+
+def make_state(n_tokens=3, n_vocab=5):
+    return LlamaState(
+        input_ids=np.arange(8, dtype=np.intc),
+        scores=np.ones((n_tokens, n_vocab), dtype=np.single),
+        n_tokens=n_tokens,
+        llama_state=b"state",
+        llama_state_size=5,
+        seed=42,
+    )
+
+
+def test_prompt_state_cache_disk(tmp_path):
+    cache = PromptStateCache(tmp_path)
+    key = cache.get_key("model.gguf", [1, 2, 3])
+    assert cache.get(key) is None
+    cache.put(key, make_state())
+
+    state = PromptStateCache(tmp_path).get(key)
+    assert state.llama_state == b"state"
+    assert state.n_tokens == 3
+    # Only the logits of the last token are kept.
+    assert state.scores.shape == (1, 5)
+
+
+def test_prompt_state_cache_memory():
+    cache = PromptStateCache(max_states_in_memory=1)
+    cache.put("a", make_state())
+    cache.put("b", make_state())
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.fixture
+def model(mocker):
+    mocker.patch(
+        "document_to_podcast.inference.prompt_cache.format_chat_prompt",
+        side_effect=lambda model, messages, add_generation_prompt=True: "".join(
+            f"<{message['role']}>{message['content']}</{message['role']}>"
+            for message in messages
+        ),
+    )
+
+    def make_model():
+        model = mocker.MagicMock(
+            model_path="model.gguf",
+            n_tokens=0,
+            draft_model=None,
+            context_params=SimpleNamespace(
+                type_k=1, type_v=1, flash_attn=False, logits_all=False
+            ),
+        )
+        model.n_ctx.return_value = 4096
+        model.input_ids = np.zeros(64, dtype=np.intc)
+        model.tokenize.side_effect = lambda text, add_bos, special: list(
+            text.decode("utf-8").encode("ascii")
+        )
+        model.save_state.return_value = make_state()
+        return model
+
+    return make_model
+
+
+def test_prefill_system_prompt(model):
+    cache = PromptStateCache()
+    first = model()
+    prefill_system_prompt(first, "Be nice.", "Hello!", cache)
+    first.eval.assert_called_once_with(list(b"<system>Be nice.</system"))
+    first.load_state.assert_not_called()
+
+    second = model()
+    prefill_system_prompt(second, "Be nice.", "Bye!", cache)
+    second.eval.assert_not_called()
+    second.load_state.assert_called_once()
+
+
+def test_prefill_system_prompt_settings(model):
+    cache = PromptStateCache()
+    prefill_system_prompt(model(), "Be nice.", "Hello!", cache)
+
+    quantized = model()
+    quantized.context_params.type_k = 8
+    prefill_system_prompt(quantized, "Be nice.", "Hello!", cache)
+    quantized.load_state.assert_not_called()
+    quantized.eval.assert_called_once()
+
+
+def test_prefill_system_prompt_draft_context(model):
+    cache = PromptStateCache()
+    speculative = model()
+    speculative.draft_model = object()
+    prefill_system_prompt(speculative, "Be nice.", "Hello!", cache)
+
+    capped = model()
+    capped.draft_model = object()
+    capped.n_ctx.return_value = 2048
+    prefill_system_prompt(capped, "Be nice.", "Hello!", cache)
+    capped.load_state.assert_not_called()
+    capped.eval.assert_called_once()
+
+
+def test_prefill_system_prompt_invalid_state(model, tmp_path):
+    cache = PromptStateCache(tmp_path)
+    prefill_system_prompt(model(), "Be nice.", "Hello!", cache)
+
+    second = model()
+    second.load_state.side_effect = RuntimeError("Failed to set llama state data")
+    prefill_system_prompt(second, "Be nice.", "Hello!", cache)
+    second.eval.assert_called_once()
+    second.save_state.assert_called_once()
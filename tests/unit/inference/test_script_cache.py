@@ -0,0 +1,16 @@
+from document_to_podcast.inference.script_cache import ScriptCache
+
+
+def test_script_cache_roundtrip(tmp_path):
+    cache = ScriptCache(tmp_path)
+    key = cache.get_key("text", "prompt", "model", long_document=False)
+    assert cache.get(key) is None
+    cache.put(key, '{"Speaker 1": "Hi!"}')
+    assert cache.get(key) == '{"Speaker 1": "Hi!"}'
+
+
+def test_script_cache_key_changes():
+    key = ScriptCache.get_key("text", "prompt", "model", long_document=False)
+    assert key == ScriptCache.get_key("text", "prompt", "model", long_document=False)
+    assert key != ScriptCache.get_key("text", "other prompt", "model")
+    assert key != ScriptCache.get_key("text", "prompt", "model", long_document=True)
@@ -0,0 +1,45 @@
+import pytest
+
+from document_to_podcast.inference.script_parser import (
+    SpeakerTurnParser,
+    parse_speaker_turns,
+)
+
+
+def test_parse_speaker_turns(podcast_script):
+    assert list(parse_speaker_turns([podcast_script])) == [
+        (1, "Welcome to our podcast."),
+        (2, "It's great to be here!"),
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7])
+def test_parse_speaker_turns_any_chunking(podcast_script, chunk_size):
+    chunks = [
+        podcast_script[n : n + chunk_size]
+        for n in range(0, len(podcast_script), chunk_size)
+    ]
+    assert list(parse_speaker_turns(chunks)) == [
+        (1, "Welcome to our podcast."),
+        (2, "It's great to be here!"),
+    ]
+
+
+def test_parse_speaker_turns_escapes():
+    script = r'{"Speaker 1": "She said \"hi\"\nand left \\ é", "Speaker 12": "Ok"}'
+    assert list(parse_speaker_turns(script)) == [
+        (1, 'She said "hi"\nand left \\ é'),
+        (12, "Ok"),
+    ]
+
+
+def test_parse_speaker_turns_ignores_other_keys():
+    script = '{"title": "Speaker 3", "turns": [{"Speaker 1": "Hi, Speaker 2!"}]}'
+    assert list(parse_speaker_turns(script)) == [(1, "Hi, Speaker 2!")]
+
+
+def test_speaker_turn_parser_emits_on_close():
+    parser = SpeakerTurnParser()
+    assert parser.feed('{\n  "Speaker 1": "Welcome') == []
+    assert parser.feed(' to our podcast."') == [(1, "Welcome to our podcast.")]
+    assert parser.feed(', "Speaker 2": "Hi!"}') == [(2, "Hi!")]
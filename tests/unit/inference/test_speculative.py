@@ -0,0 +1,64 @@
+import numpy as np
+
+from document_to_podcast.inference.speculative import (
+    CountingDraftModel,
+    GGUFDraftModel,
+    load_draft_model,
+)
+
+
+def test_counting_draft_model():
+    drafts = iter([np.array([5, 6, 7]), np.array([9, 10]), np.array([], dtype=int)])
+    draft_model = CountingDraftModel(lambda input_ids: next(drafts))
+    assert draft_model.acceptance_rate == 0.0
+
+    draft_model(np.array([1, 2, 3, 4]))
+    # 5 and 6 accepted, then 8 sampled instead of 7.
+    draft_model(np.array([1, 2, 3, 4, 5, 6, 8]))
+    # All accepted, plus the next sampled token.
+    draft_model(np.array([1, 2, 3, 4, 5, 6, 8, 9, 10, 11]))
+
+    assert draft_model.n_drafted == 5
+    assert draft_model.n_accepted == 4
+    assert draft_model.acceptance_rate == 0.8
+
+
+def test_counting_draft_model_finish():
+    drafts = iter([np.array([5, 6, 7]), np.array([9, 10, 11])])
+    draft_model = CountingDraftModel(lambda input_ids: next(drafts))
+
+    # Prompt of 3 tokens, then 4 is sampled.
+    draft_model(np.array([1, 2, 3, 4]))
+    draft_model(np.array([1, 2, 3, 4, 5, 6, 7, 8]))
+    # 9 and 10 generated, then the end of generation instead of 11.
+    draft_model.finish(n_generated=7)
+
+    assert draft_model.n_drafted == 6
+    assert draft_model.n_accepted == 5
+
+
+def test_gguf_draft_model(mocker):
+    model = mocker.MagicMock()
+    model.input_ids = np.zeros(32, dtype=np.intc)
+    model.n_tokens = 0
+    model.n_ctx.return_value = 32
+    model.token_eos.return_value = 0
+
+    def eval(tokens):
+        model.input_ids[model.n_tokens : model.n_tokens + len(tokens)] = tokens
+        model.n_tokens += len(tokens)
+
+    model.eval.side_effect = eval
+    model.sample.side_effect = lambda temp: model.input_ids[model.n_tokens - 1] + 1
+    draft_model = GGUFDraftModel(model, num_pred_tokens=3)
+
+    assert draft_model(np.array([1, 2, 3])).tolist() == [4, 5, 6]
+    # Only the tokens after the common prefix are evaluated.
+    model.eval.reset_mock()
+    assert draft_model(np.array([1, 2, 3, 4, 9])).tolist() == [10, 11, 12]
+    assert model.eval.call_args_list[0].args[0] == [9]
+
+
+def test_load_draft_model_prompt_lookup():
+    draft_model = load_draft_model("prompt_lookup", num_draft_tokens=2)
+    assert draft_model(np.array([1, 2, 3, 1, 2], dtype=np.intc)).tolist() == [3, 1]
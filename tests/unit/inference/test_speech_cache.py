@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+
+from document_to_podcast.inference.model_loaders import TTSModel
+from document_to_podcast.inference.speech_cache import (
+    SpeechCache,
+    cached_text_to_speech,
+)
+
+
+def test_speech_cache_key():
+    key = SpeechCache.get_key("hexgrad/Kokoro-82M", "af_sarah", "a", "Hello  world!")
+    assert key == SpeechCache.get_key(
+        "hexgrad/Kokoro-82M", "af_sarah", "a", " Hello world!\n"
+    )
+    assert key != SpeechCache.get_key(
+        "hexgrad/Kokoro-82M", "am_michael", "a", "Hello world!"
+    )
+    assert key != SpeechCache.get_key(
+        "hexgrad/Kokoro-82M", "af_sarah", "b", "Hello world!"
+    )
+
+
+def test_speech_cache_get_put(tmp_path):
+    cache = SpeechCache(tmp_path)
+    assert cache.get("key") is None
+
+    cache.put("key", np.arange(5, dtype=np.float64))
+    speech = cache.get("key")
+
+    assert isinstance(speech, np.memmap)
+    assert speech.dtype == np.float32
+    np.testing.assert_array_equal(speech, np.arange(5))
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_speech_cache_lru_eviction(tmp_path):
+    speech = np.zeros(1000, dtype=np.float32)
+    file_size = 4000 + 128  # data + .npy header
+    cache = SpeechCache(tmp_path, max_size=2 * file_size)
+
+    cache.put("first", speech)
+    cache.put("second", speech)
+    cache.get("first")  # marks "first" as recently used
+    cache.put("third", speech)
+
+    assert sorted(file.stem for file in tmp_path.glob("*.npy")) == ["first", "third"]
+
+
+def test_speech_cache_lru_eviction_across_runs(tmp_path):
+    speech = np.zeros(1000, dtype=np.float32)
+    file_size = 4000 + 128  # data + .npy header
+    cache = SpeechCache(tmp_path, max_size=2 * file_size)
+    cache.put("first", speech)
+    cache.put("second", speech)
+    os.utime(tmp_path / "first.npy", (1, 1))
+    os.utime(tmp_path / "second.npy", (0, 0))
+
+    cache = SpeechCache(tmp_path, max_size=2 * file_size)
+    cache.put("third", speech)
+
+    assert sorted(file.stem for file in tmp_path.glob("*.npy")) == ["first", "third"]
+
+
+def test_speech_cache_overwrite(mocker, tmp_path):
+    speech = np.zeros(1000, dtype=np.float32)
+    file_size = 4000 + 128  # data + .npy header
+    cache = SpeechCache(tmp_path, max_size=2 * file_size)
+    glob = mocker.spy(type(tmp_path), "glob")
+
+    for _ in range(3):
+        cache.put("first", speech)
+    cache.put("second", speech)
+
+    # The size of the overwritten file is not counted again, so nothing is evicted.
+    assert sorted(file.stem for file in tmp_path.glob("*.npy")) == ["first", "second"]
+    assert cache._size == 2 * file_size
+    assert glob.call_count == 1  # only by the assertion above
+
+
+def test_cached_text_to_speech(mocker, tmp_path):
+    text_to_speech = mocker.patch(
+        "document_to_podcast.inference.speech_cache.text_to_speech",
+        return_value=np.ones(10, dtype=np.float32),
+    )
+    model = TTSModel(
+        model=mocker.MagicMock(lang_code="a"),
+        model_id="hexgrad/Kokoro-82M",
+        sample_rate=24000,
+        custom_args={},
+    )
+    cache = SpeechCache(tmp_path)
+
+    for _ in range(3):
+        speech = cached_text_to_speech("Hello!", model, "af_sarah", cache)
+        np.testing.assert_array_equal(speech, np.ones(10))
+
+    text_to_speech.assert_called_once()
+    assert (cache.hits, cache.misses) == (2, 1)
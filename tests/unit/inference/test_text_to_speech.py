@@ -1,14 +1,21 @@
+import numpy as np
 from kokoro import KPipeline
 
 from document_to_podcast.inference.model_loaders import TTSModel
-from document_to_podcast.inference.text_to_speech import text_to_speech
+from document_to_podcast.inference.text_to_speech import (
+    text_to_speech,
+    text_to_speech_stream,
+)
 
 
 def test_text_to_speech_kokoro(mocker):
     model = mocker.MagicMock(spec_set=KPipeline)
-    generator = mocker.MagicMock()
-    generator.__next__.return_value = (None, None, "mock_audio")
-    model.return_value = generator
+    model.return_value = iter(
+        [
+            (None, None, np.ones(3, dtype=np.float32)),
+            (None, None, np.zeros(2, dtype=np.float32)),
+        ]
+    )
 
     tts_model = TTSModel(
         model=model,
@@ -16,10 +23,42 @@ def test_text_to_speech_kokoro(mocker):
         sample_rate=0,
         custom_args={},
     )
-    text_to_speech(
+    speech = text_to_speech(
         input_text="Hello?",
         model=tts_model,
         voice_profile="af_sarah",
     )
 
-    generator.__next__.assert_called_once()
+    assert model.call_count == 1
+    assert model.call_args.args == ("Hello?",)
+    assert model.call_args.kwargs == {"voice": "af_sarah"}
+    assert speech.dtype == np.float32
+    np.testing.assert_array_equal(speech, [1, 1, 1, 0, 0])
+
+
+def test_text_to_speech_stream_kokoro(mocker):
+    model = mocker.MagicMock(spec_set=KPipeline)
+    model.return_value = iter(
+        [
+            (None, None, np.ones(3)),
+            (None, None, None),
+            (None, None, np.zeros(2)),
+        ]
+    )
+
+    tts_model = TTSModel(
+        model=model,
+        model_id="hexgrad/Kokoro-82M",
+        sample_rate=0,
+        custom_args={},
+    )
+    speech = list(
+        text_to_speech_stream(
+            input_text="Hello?",
+            model=tts_model,
+            voice_profile="af_sarah",
+        )
+    )
+
+    assert [len(chunk) for chunk in speech] == [3, 2]
+    assert all(chunk.dtype == np.float32 for chunk in speech)
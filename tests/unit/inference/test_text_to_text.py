@@ -1,6 +1,14 @@
+from types import SimpleNamespace
+
 import pytest
+from loguru import logger
 
-from document_to_podcast.inference.text_to_text import text_to_text, text_to_text_stream
+from document_to_podcast.inference.text_to_text import (
+    log_generation_speed,
+    text_to_text,
+    text_to_text_stream,
+)
+from document_to_podcast.metrics import PodcastMetrics
 
 
 def test_text_to_text(mocker):
@@ -79,3 +87,64 @@ def test_text_to_text_stream(mocker):
         stop=[],
         stream=True,
     )
+
+
+def test_text_to_text_stream_assistant_prefix(mocker):
+    mocker.patch(
+        "document_to_podcast.inference.text_to_text.format_chat_prompt",
+        return_value="<prompt>",
+    )
+    model = mocker.MagicMock()
+    model.create_completion.return_value = iter(
+        [{"choices": [{"text": ' "Speaker 2"'}]}, {"choices": [{"text": ""}]}]
+    )
+    chunks = list(
+        text_to_text_stream(
+            "Hello?",
+            model=model,
+            system_prompt="You are a helpful assistant.",
+            assistant_prefix='{\n  "Speaker 1": "Hi!",\n',
+        )
+    )
+    assert chunks == [' "Speaker 2"']
+    model.create_completion.assert_called_with(
+        '<prompt>{\n  "Speaker 1": "Hi!",\n', max_tokens=None, stream=True, stop=[]
+    )
+    model.create_chat_completion.assert_not_called()
+
+
+# One token per word
+WORD_TOKENIZER = SimpleNamespace(
+    tokenize=lambda text, add_bos, special: text.decode("utf-8").split()
+)
+
+
+def test_log_generation_speed():
+    messages = []
+    handler_id = logger.add(messages.append, format="{message}")
+    draft_model = SimpleNamespace(
+        n_drafted=10, n_accepted=5, finish=lambda n_generated: None
+    )
+
+    def chunks():
+        yield "Hello"
+        draft_model.n_drafted, draft_model.n_accepted = 30, 20
+        yield " world"
+
+    try:
+        assert list(log_generation_speed(chunks(), WORD_TOKENIZER, draft_model)) == [
+            "Hello",
+            " world",
+        ]
+    finally:
+        logger.remove(handler_id)
+    assert "Generated 2 tokens" in messages[0]
+    assert "Accepted 15/20 (75%) draft tokens" in messages[0]
+
+
+def test_log_generation_speed_counts_tokens_not_chunks():
+    # Speculative decoding can stream several tokens in one chunk.
+    metrics = PodcastMetrics()
+    chunks = ["One", " two three four", " five six"]
+    assert list(log_generation_speed(chunks, WORD_TOKENIZER, metrics=metrics)) == chunks
+    assert metrics.values["text_to_text"]["generated_tokens"] == 6
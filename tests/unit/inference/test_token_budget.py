@@ -0,0 +1,95 @@
+import pytest
+
+from document_to_podcast.inference.token_budget import (
+    DEFAULT_MAX_OUTPUT_TOKENS,
+    get_context_size,
+    get_input_token_budget,
+    get_max_output_tokens,
+    truncate_to_token_budget,
+)
+
+
+@pytest.fixture()
+def model(mocker):
+    # One token per word
+    model = mocker.MagicMock()
+    model.tokenize.side_effect = lambda text, add_bos, special: text.split()
+    model.detokenize.return_value = b""
+    model.n_ctx.return_value = 1000
+    model.metadata = {
+        "tokenizer.chat_template": "{% for m in messages %}<{{ m.role }}> {{ m.content }} {% endfor %}"
+    }
+    return model
+
+
+def test_get_input_token_budget(model):
+    # 4 tokens for the system prompt + 2 role markers, 250 reserved for the output
+    assert get_input_token_budget(model, "A system prompt.") == 1000 - 5 - 250
+    assert (
+        get_input_token_budget(model, "A system prompt.", max_output_tokens=100)
+        == 1000 - 5 - 100
+    )
+    assert get_input_token_budget(model, "A system prompt.", n_ctx=400) == 400 - 5 - 100
+
+
+def test_get_input_token_budget_no_chat_template(model):
+    model.metadata = {}
+    assert get_input_token_budget(model, "A system prompt.") == 1000 - 3 - 32 - 250
+
+
+@pytest.mark.parametrize("chunk_size", [7, 50, 16_384])
+@pytest.mark.parametrize("max_tokens", [0, 1, 10, 99, 100, 200])
+def test_truncate_to_token_budget(model, chunk_size, max_tokens):
+    text = " ".join(f"word{n}" for n in range(100))
+    truncated = truncate_to_token_budget(text, model, max_tokens, chunk_size)
+    assert text.startswith(truncated)
+    assert len(truncated.split()) == min(max_tokens, 100)
+
+
+def test_get_context_size(model):
+    model.metadata.update(
+        {"general.architecture": "llama", "llama.context_length": "10000"}
+    )
+    text = " ".join(f"word{n}" for n in range(100))
+    # 5 prompt tokens + 100 text tokens + 200 reserved, rounded up to 128
+    assert get_context_size(model, "A system prompt.", text, 200, 128) == 384
+    assert get_context_size(model, "A system prompt.", text * 100, 200, 128) == 10000
+    model.metadata = {}
+    assert get_context_size(model, "A system prompt.", text) == 0
+
+
+def test_get_context_size_fits_the_input_token_budget(model):
+    model.metadata.update(
+        {"general.architecture": "llama", "llama.context_length": "100000"}
+    )
+    text = " ".join(f"word{n}" for n in range(20_000))
+    model.n_ctx.return_value = get_context_size(model, "A system prompt.", text)
+    # The same number of tokens is reserved for the output, so the text isn't cut.
+    budget = get_input_token_budget(model, "A system prompt.")
+    assert budget == model.n_ctx() - 5 - DEFAULT_MAX_OUTPUT_TOKENS
+    assert budget >= 20_000
+
+
+def test_get_max_output_tokens():
+    assert get_max_output_tokens(100_000) == DEFAULT_MAX_OUTPUT_TOKENS
+    assert get_max_output_tokens(8192) == 2048
+
+
+@pytest.mark.parametrize("num_words", [100, 5000, 6139, 6140, 9000])
+def test_get_context_size_small_context(model, num_words):
+    # 8192 tokens of training context reserve 2048 for the output
+    model.metadata.update(
+        {"general.architecture": "llama", "llama.context_length": "8192"}
+    )
+    text = " ".join(f"word{n}" for n in range(num_words))
+    n_ctx = get_context_size(model, "A system prompt.", text, multiple=1)
+    max_budget = get_input_token_budget(model, "A system prompt.", n_ctx=8192)
+    assert max_budget == 8192 - 5 - 2048
+    if num_words > max_budget:
+        assert n_ctx == 8192
+    else:
+        assert n_ctx == 5 + num_words + 2048
+        # Filling the sized context keeps the whole text.
+        assert (
+            get_input_token_budget(model, "A system prompt.", n_ctx=n_ctx) >= num_words
+        )
@@ -1,7 +1,15 @@
+import sys
+
+import pytest
+
 from document_to_podcast.preprocessing.data_cleaners import (
+    HTML_PARSERS,
     clean_html,
     clean_with_regex,
     clean_markdown,
+    iter_clean_html,
+    iter_clean_markdown,
+    iter_clean_with_regex,
 )
 
 
@@ -11,6 +19,66 @@ def test_clean_html():
     assert cleaned_text == "Hello, world!"
 
 
+@pytest.mark.parametrize("parser", HTML_PARSERS)
+def test_clean_html_skips_scripts_and_styles(parser):
+    text = (
+        "<html><head><meta charset='utf-8'><title>A &amp; B</title>\n"
+        "<style>p { color: red; }</style><link rel='stylesheet' href='a.css'></head>\n"
+        "<body><!-- Comment --><p>Hello,&nbsp;world&#33;</p>\n"
+        "<script>var a = '<p>Not text</p>';</script><template>Neither</template>\n"
+        "<p>Bye</p></body></html>"
+    )
+    assert clean_html(text, parser=parser) == "A B Hello, world! Bye"
+
+
+@pytest.mark.parametrize("parser", HTML_PARSERS)
+def test_clean_html_matches_beautifulsoup(example_data, parser):
+    from bs4 import BeautifulSoup
+
+    text = (
+        example_data / "introducing-mozilla-ai-investing-in-trustworthy-ai.html"
+    ).read_text()
+    soup = BeautifulSoup(text, "html.parser")
+    for tag in soup(["script", "style", "link", "meta"]):
+        tag.decompose()
+    expected = clean_with_regex(soup.get_text())
+
+    assert clean_html(text, parser=parser) == expected
+    chunks = [text[n : n + 1000] for n in range(0, len(text), 1000)]
+    assert "".join(iter_clean_html(chunks, parser)) == expected
+
+
+@pytest.mark.parametrize("parser", HTML_PARSERS)
+@pytest.mark.parametrize("text", ["", "   ", "<"])
+def test_clean_html_empty(parser, text):
+    assert clean_html(text, parser=parser) == ""
+    assert "".join(iter_clean_html([text], parser)) == ""
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "!<!--</script>&amp;9(.t&amp;",
+        "<p>Unclosed <b>bold <i>italic</p> after</b> end",
+        "<div><script>var a = 1;</div><p>Text</p>",
+        "</p>Stray end tag<p a='1>Broken attribute</p>",
+        "<![CDATA[data]]> &#x41;&#65;&amp &unknown; <3",
+    ],
+)
+def test_clean_html_malformed_matches_beautifulsoup(text):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(text, "html.parser")
+    for tag in soup(["script", "style", "link", "meta"]):
+        tag.decompose()
+    assert clean_html(text) == clean_with_regex(soup.get_text())
+
+
+def test_clean_html_invalid_parser():
+    with pytest.raises(ValueError, match="parser must be one of"):
+        clean_html("<p>Hello</p>", parser="html5lib")
+
+
 def test_clean_with_regex():
     text = "\n\xa0\n\xa0\n\xa0\n\xa0\n\xa0\n\xa0\n\xa0\n\xa0\n\xa0\n\xa0\n\xa0\n\xa0\n\xa0\n\xa0\n\xa0\nThis work is licensed under the Creative Commons Attribution 4.0 (BY) license, which means\n\xa0\nthat the text may be remixed, transformed and built upon, and be copied and redistributed in\n\xa0\nany medium or format even commercially, provided credit is given to the author. For details go\n\xa0\nto http://creativecommons.org/licenses/by/4.0/\n\xa0\n\xa0\n\xa0\n"
     cleaned_text = clean_with_regex(text)
@@ -31,3 +99,57 @@ def test_clean_markdown():
         cleaned_text
         == "This is some text with an image and another one . Item list here."
     )
+
+
+def test_clean_with_regex_separates_words_at_any_whitespace():
+    for space in map(chr, range(sys.maxunicode + 1)):
+        if space.isspace():
+            assert clean_with_regex(f"Hello,{space}world!") == "Hello, world!"
+
+
+@pytest.mark.parametrize(
+    "iter_clean, clean, text",
+    [
+        (
+            iter_clean_with_regex,
+            clean_with_regex,
+            "Read\xa0it at https://example.com/a?b=c, or write to\n"
+            "contact@example.org — “thanks”  ",
+        ),
+        (
+            iter_clean_markdown,
+            clean_markdown,
+            '# Title\n![alt text](image.jpg "Image Title") and\n'
+            "![alt](another_image.png) a link to http://example.com.\n",
+        ),
+    ],
+)
+def test_iter_clean_matches_the_whole_text(iter_clean, clean, text):
+    expected = clean(text)
+    for cut in range(len(text) + 1):
+        assert "".join(iter_clean([text[:cut], text[cut:]])) == expected
+    assert "".join(iter_clean(iter(text))) == expected
+
+
+def test_iter_clean_without_separators(mocker):
+    get_clean_words = mocker.patch(
+        "document_to_podcast.preprocessing.data_cleaners._get_clean_words",
+        side_effect=str.split,
+    )
+    chunks = ["a" * 10] * 1000 + [" b"]
+    assert "".join(iter_clean_with_regex(chunks)) == "a" * 10_000 + " b"
+    # The chunks without a space are cleaned once they are followed by one.
+    assert [call.args[0] for call in get_clean_words.call_args_list] == [
+        "a" * 10_000 + " ",
+        "b",
+    ]
+
+
+@pytest.mark.parametrize("clean", [clean_with_regex, clean_html, clean_markdown])
+def test_clean_max_characters(clean):
+    text = "<p>Some words, and http://example.com more words.</p>\n" * 5000
+    expected = clean(text)
+    result = clean(text, max_characters=1000)
+    # Cleaned until the 64 KB block reaching the budget.
+    assert expected.startswith(result)
+    assert 1000 <= len(result) < len(expected)
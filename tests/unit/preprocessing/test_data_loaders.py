@@ -1,4 +1,15 @@
+from io import BytesIO
+from itertools import islice
+
+import pytest
+
+from document_to_podcast.preprocessing import (
+    DATA_CHUNK_LOADERS,
+    DATA_LOADERS,
+)
 from document_to_podcast.preprocessing.data_loaders import (
+    iter_pdf_pages,
+    iter_txt,
     load_pdf,
     load_txt,
     load_docx,
@@ -67,3 +78,62 @@ def test_load_url():
 def test_load_invalid_url():
     result = load_url("invalid")
     assert result is None
+
+
+@pytest.mark.parametrize("uploaded", [False, True])
+def test_iter_pdf_pages_in_parallel(example_data, uploaded):
+    pdf_file = example_data / "Mozilla-Trustworthy_AI.pdf"
+    expected = list(islice(iter_pdf_pages(pdf_file), 10))
+    if uploaded:  # Like a streamlit UploadedFile
+        pdf_file = BytesIO(pdf_file.read_bytes())
+    pages = iter_pdf_pages(pdf_file, num_workers=2, pages_per_task=3)
+    assert list(islice(pages, 10)) == expected
+    pages.close()
+
+
+def test_load_pdf_max_characters(example_data):
+    pdf_file = example_data / "Mozilla-Trustworthy_AI.pdf"
+    pages = list(islice(iter_pdf_pages(pdf_file), 2))
+    # Stops after the page reaching the budget.
+    result = load_pdf(pdf_file, max_characters=len(pages[0]) + 2, num_workers=2)
+    assert result == "\n".join(pages[:2])
+
+
+@pytest.mark.parametrize(
+    "file_name",
+    [
+        "Mozilla-Trustworthy_AI.docx",
+        "Mozilla-Trustworthy_AI.md",
+        "Mozilla-Trustworthy_AI.pdf",
+        "introducing-mozilla-ai-investing-in-trustworthy-ai.html",
+    ],
+)
+def test_chunk_loaders_match_loaders(example_data, file_name):
+    input_file = example_data / file_name
+    chunks = list(DATA_CHUNK_LOADERS[input_file.suffix](input_file))
+    assert "".join(chunks) == DATA_LOADERS[input_file.suffix](input_file)
+
+
+@pytest.mark.parametrize("uploaded", [False, True])
+def test_load_txt_max_characters(tmp_path, uploaded):
+    txt_file = tmp_path / "large.txt"
+    text = "".join(f"Line {n}, with ünïcode.\n" for n in range(20_000))
+    txt_file.write_text(text, encoding="utf-8")
+    if uploaded:  # Like a streamlit UploadedFile
+        txt_file = BytesIO(txt_file.read_bytes())
+
+    assert "".join(iter_txt(txt_file, chunk_size=1000)) == text
+    result = load_txt(txt_file, max_characters=100_000)
+    # Read until the 64 KB block reaching the budget.
+    assert text.startswith(result)
+    assert 100_000 <= len(result) < 100_000 + 64 * 1024
+
+
+def test_load_docx_max_characters(example_data):
+    docx_file = example_data / "Mozilla-Trustworthy_AI.docx"
+    text = load_docx(docx_file)
+    result = load_docx(docx_file, max_characters=1000)
+    # Stops after the paragraph reaching the budget.
+    assert text.startswith(result)
+    assert len(result) >= 1000
+    assert len(result[: result.rfind("\n")]) < 1000
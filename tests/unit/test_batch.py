@@ -0,0 +1,169 @@
+import json
+from pathlib import Path
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from document_to_podcast.batch import document_to_podcast_batch, find_batch_items
+
+
+def test_find_batch_items(tmp_path):
+    (tmp_path / "a.txt").write_text("a")
+    (tmp_path / "b.md").write_text("b")
+    (tmp_path / "c.mp3").write_text("c")
+    assert [item.input_file for item in find_batch_items(str(tmp_path))] == [
+        str(tmp_path / "a.txt"),
+        str(tmp_path / "b.md"),
+    ]
+    assert [item.input_file for item in find_batch_items(f"{tmp_path}/*.md")] == [
+        str(tmp_path / "b.md"),
+    ]
+
+    manifest = tmp_path / "manifest.jsonl"
+    manifest.write_text(
+        json.dumps({"input_file": "a.txt", "text_to_text_prompt": "{SPEAKERS}"}) + "\n"
+    )
+    (item,) = find_batch_items(str(manifest))
+    assert item.input_file == str(tmp_path / "a.txt")
+    assert item.text_to_text_prompt == "{SPEAKERS}"
+
+
+def test_document_to_podcast_batch(tmp_path, mocker):
+    for name in ["a.txt", "b.txt", "c.txt"]:
+        (tmp_path / name).write_text(name)
+    load_llama_cpp_model = mocker.patch(
+        "document_to_podcast.batch.load_llama_cpp_model"
+    )
+    load_speech_model = mocker.patch("document_to_podcast.batch.load_speech_model")
+
+    def generate_podcast(config, text_model_loader, speech_model, prompt_cache):
+        text_model_loader()
+        if config.input_file.name == "b.txt":
+            raise RuntimeError("Failed")
+
+    mocker.patch(
+        "document_to_podcast.batch.generate_podcast", side_effect=generate_podcast
+    )
+    failures = document_to_podcast_batch(
+        inputs=str(tmp_path), output_folder=str(tmp_path / "output")
+    )
+    assert failures == {str(tmp_path / "b.txt"): "Failed"}
+    load_llama_cpp_model.assert_called_once()
+    load_speech_model.assert_called_once()
+
+
+def test_document_to_podcast_batch_processes(tmp_path):
+    for name in ["a.txt", "b.txt"]:
+        (tmp_path / name).write_text(name)
+    # The invalid model makes every document fail in the workers, before any loading.
+    failures = document_to_podcast_batch(
+        inputs=str(tmp_path),
+        output_folder=str(tmp_path / "output"),
+        text_to_text_model="invalid",
+        num_processes=2,
+        threads_per_process=1,
+    )
+    assert sorted(failures) == [str(tmp_path / "a.txt"), str(tmp_path / "b.txt")]
+    assert "owner/repo/file" in failures[str(tmp_path / "a.txt")]
+
+
+def test_document_to_podcast_batch_worker_crash(tmp_path, mocker):
+    # The largest document is dispatched first and crashes its worker every time.
+    (tmp_path / "crash.txt").write_text("crash" * 10)
+    for name in ["a.txt", "b.txt"]:
+        (tmp_path / name).write_text(name)
+    pools = []
+
+    class CrashingExecutor:
+        def __init__(self, max_workers, mp_context, initializer, initargs):
+            self.started = initargs[-1]
+            self.broken = False
+            pools.append(self)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            return False
+
+        def submit(self, fn, item, output_folder):
+            future = Future()
+            if self.broken:
+                future.set_exception(BrokenProcessPool())
+            elif item.input_file.endswith("crash.txt"):
+                self.started.put(output_folder)
+                self.broken = True
+                future.set_exception(BrokenProcessPool())
+            else:
+                future.set_result(None)
+            return future
+
+    mocker.patch("document_to_podcast.batch.ProcessPoolExecutor", CrashingExecutor)
+    failures = document_to_podcast_batch(
+        inputs=str(tmp_path), output_folder=str(tmp_path / "output"), num_processes=2
+    )
+    assert list(failures) == [str(tmp_path / "crash.txt")]
+    # The crashing document is run again alone, then the other ones.
+    assert len(pools) == 3
+
+
+def test_document_to_podcast_batch_crash_next_to_good_document(tmp_path, mocker):
+    (tmp_path / "bad.txt").write_text("bad" * 10)
+    (tmp_path / "good.txt").write_text("good" * 5)
+    (tmp_path / "other.txt").write_text("other")
+    pools = []
+
+    def run_in_pool(jobs, num_processes, settings, threads, log_queue, on_finished):
+        # The jobs run `num_processes` at a time, and the bad document crashes the
+        # pool, interrupting the ones running with it and the ones not started.
+        pools.append([Path(item.input_file).name for item, _ in jobs])
+        for start in range(0, len(jobs), num_processes):
+            running = jobs[start : start + num_processes]
+            if any(item.input_file.endswith("bad.txt") for item, _ in running):
+                return jobs[start:], {folder for _, folder in running}
+            for item, _ in running:
+                on_finished(item, None)
+        return [], set()
+
+    mocker.patch("document_to_podcast.batch._run_in_pool", side_effect=run_in_pool)
+    failures = document_to_podcast_batch(
+        inputs=str(tmp_path), output_folder=str(tmp_path / "output"), num_processes=2
+    )
+    assert list(failures) == [str(tmp_path / "bad.txt")]
+    assert pools == [
+        ["bad.txt", "good.txt", "other.txt"],
+        ["bad.txt", "good.txt"],
+        ["good.txt"],
+        ["other.txt"],
+    ]
+
+
+def test_document_to_podcast_batch_crash_after_a_finished_document(tmp_path, mocker):
+    (tmp_path / "first.txt").write_text("first" * 10)
+    (tmp_path / "second.txt").write_text("second")
+    (tmp_path / "third.txt").write_text("third")
+
+    def run_in_pool(jobs, num_processes, settings, threads, log_queue, on_finished):
+        # The first document finishes, then an idle worker dies, breaking the pool
+        # before the other ones start.
+        on_finished(jobs[0][0], None)
+        return jobs[1:], set()
+
+    mocker.patch("document_to_podcast.batch._run_in_pool", side_effect=run_in_pool)
+    failures = document_to_podcast_batch(
+        inputs=str(tmp_path), output_folder=str(tmp_path / "output"), num_processes=2
+    )
+    assert failures == {
+        str(tmp_path / "second.txt"): "The worker processes crashed",
+        str(tmp_path / "third.txt"): "The worker processes crashed",
+    }
+
+
+def test_document_to_podcast_batch_unknown_option(tmp_path, mocker):
+    generate_podcast = mocker.patch("document_to_podcast.batch.generate_podcast")
+    with pytest.raises(ValueError, match="'tts_worker' \\(did you mean 'tts_workers'"):
+        document_to_podcast_batch(
+            inputs=str(tmp_path), output_folder=str(tmp_path / "output"), tts_worker=2
+        )
+    generate_podcast.assert_not_called()
@@ -0,0 +1,44 @@
+import numpy as np
+
+from document_to_podcast.checkpoint import Checkpoint
+
+
+def test_checkpoint_resume(tmp_path):
+    checkpoint = Checkpoint(tmp_path / "checkpoint")
+    assert checkpoint.start("key") == []
+    checkpoint.add_turn(1, 'Welcome to "our" podcast.', np.ones(3, dtype=np.float32))
+    checkpoint.add_turn(2, "Hi!", np.zeros(2, dtype=np.float32))
+
+    resumed = Checkpoint(tmp_path / "checkpoint")
+    assert resumed.start("key", resume=True) == [
+        (1, 'Welcome to "our" podcast.'),
+        (2, "Hi!"),
+    ]
+    np.testing.assert_array_equal(resumed.get_speech(0), np.ones(3))
+    assert resumed.get_script_prefix() == (
+        '{\n  "Speaker 1": "Welcome to \\"our\\" podcast.",\n  "Speaker 2": "Hi!",\n'
+    )
+
+
+def test_checkpoint_resume_drops_incomplete_turns(tmp_path):
+    checkpoint = Checkpoint(tmp_path)
+    checkpoint.start("key")
+    checkpoint.add_turn(1, "Welcome.", np.ones(3, dtype=np.float32))
+    with open(checkpoint.journal_path, "a") as journal:
+        journal.write('{"speaker_id": 2, "te')
+
+    resumed = Checkpoint(tmp_path)
+    assert resumed.start("key", resume=True) == [(1, "Welcome.")]
+    resumed.add_turn(2, "Hi!", np.zeros(2, dtype=np.float32))
+    assert Checkpoint(tmp_path).start("key", resume=True) == [
+        (1, "Welcome."),
+        (2, "Hi!"),
+    ]
+
+
+def test_checkpoint_resume_other_key(tmp_path):
+    checkpoint = Checkpoint(tmp_path)
+    checkpoint.start("key")
+    checkpoint.add_turn(1, "Welcome.", np.ones(3, dtype=np.float32))
+    assert Checkpoint(tmp_path).start("other key", resume=True) == []
+    assert not (tmp_path / "turn_00000.npy").exists()
@@ -0,0 +1,58 @@
+from document_to_podcast.cli import get_max_characters, get_script_key, load_document
+from document_to_podcast.config import Config
+from document_to_podcast.metrics import PodcastMetrics
+from document_to_podcast.preprocessing import DATA_CLEANERS, DATA_LOADERS
+
+
+def test_load_document(example_data):
+    input_file = (
+        example_data / "introducing-mozilla-ai-investing-in-trustworthy-ai.html"
+    )
+    metrics = PodcastMetrics()
+
+    clean_text = load_document(input_file, metrics)
+
+    assert clean_text == DATA_CLEANERS[".html"](DATA_LOADERS[".html"](input_file))
+    assert list(metrics.stages) == ["load_document", "clean_document"]
+    assert metrics.values["document"] == {
+        "raw_characters": len(DATA_LOADERS[".html"](input_file)),
+        "clean_characters": len(clean_text),
+    }
+
+
+def test_load_document_max_characters(tmp_path):
+    input_file = tmp_path / "large.md"
+    input_file.write_text("# Title\n![image](image.png) Some text.\n" * 100_000)
+
+    clean_text = load_document(input_file, max_characters=1000)
+
+    # Cut at the last word fitting in the budget.
+    assert clean_text == " ".join(["Title Some text."] * 100_000)[:996]
+
+
+def test_get_max_characters():
+    assert get_max_characters(4096) == 40960
+    assert get_max_characters(0) is None
+
+
+def test_get_script_key(mocker):
+    vocab = mocker.MagicMock(
+        metadata={"general.architecture": "qwen2", "qwen2.context_length": "2000"}
+    )
+    # One token per word
+    vocab.tokenize.side_effect = lambda text, add_bos, special: text.split()
+    config = Config.model_construct(
+        text_to_text_model="org/repo/model.gguf", long_document=False
+    )
+    text = " ".join(f"word{n}" for n in range(5000))
+
+    key = get_script_key(config, vocab, "Write a podcast.", text)
+    # Only the words fitting in the context are sent to the model.
+    assert key == get_script_key(
+        config, vocab, "Write a podcast.", text + " more words"
+    )
+    assert key != get_script_key(config, vocab, "Write a podcast.", text, n_ctx=4000)
+    config.long_document = True
+    assert get_script_key(config, vocab, "Write a podcast.", text) != get_script_key(
+        config, vocab, "Write a podcast.", text + " more words"
+    )
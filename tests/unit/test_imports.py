@@ -0,0 +1,43 @@
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = [
+    "bs4",
+    "docx",
+    "kokoro",
+    "llama_cpp",
+    "lxml",
+    "PyPDF2",
+    "requests",
+    "soundfile",
+    "streamlit",
+    "torch",
+]
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "document_to_podcast.cli",
+        "document_to_podcast.batch",
+        "document_to_podcast.server",
+        "document_to_podcast.metrics",
+        "document_to_podcast.profiling",
+        "document_to_podcast.tune",
+    ],
+)
+def test_import_is_lazy(module):
+    # A fresh interpreter, as other tests have already imported the backends.
+    loaded = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import sys, {module}; print(' '.join(sys.modules))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+    assert [heavy for heavy in HEAVY_MODULES if heavy in loaded] == []
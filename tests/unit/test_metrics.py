@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from document_to_podcast.metrics import PodcastMetrics
+
+
+def test_podcast_metrics(tmp_path):
+    metrics = PodcastMetrics(tmp_path / "events.jsonl")
+    for _ in range(2):
+        with metrics.stage("write_audio"):
+            pass
+    metrics.record("text_to_text", generated_tokens=10, tokens_per_second=5.0)
+    metrics.add_turn(1, 2, n_characters=20, seconds=1.0, audio_seconds=4.0)
+    metrics.add_turn(0, 1, n_characters=10, seconds=3.0, audio_seconds=4.0)
+    metrics.write(tmp_path / "metrics.json")
+
+    result = json.loads((tmp_path / "metrics.json").read_text())
+    assert list(result["stages"]) == ["write_audio"]
+    assert result["text_to_text"] == {"generated_tokens": 10, "tokens_per_second": 5.0}
+    assert [turn["turn"] for turn in result["turns"]] == [0, 1]
+    assert result["turns"][0]["real_time_factor"] == 0.75
+    assert result["text_to_speech"]["max_latency"] == 3.0
+    assert result["text_to_speech"]["real_time_factor"] == 0.5
+
+    events = [
+        json.loads(line)["event"]
+        for line in (tmp_path / "events.jsonl").read_text().splitlines()
+    ]
+    assert events == [
+        "stage_start",
+        "stage_end",
+        "stage_start",
+        "stage_end",
+        "text_to_text",
+        "turn",
+        "turn",
+        "done",
+    ]
+
+
+def test_podcast_metrics_closes_events_on_error(tmp_path):
+    with pytest.raises(RuntimeError):
+        with PodcastMetrics(tmp_path / "events.jsonl") as metrics:
+            with metrics.stage("load_document"):
+                raise RuntimeError("Broken document")
+
+    assert metrics._events is None
+    events = [
+        json.loads(line)
+        for line in (tmp_path / "events.jsonl").read_text().splitlines()
+    ]
+    assert [event["event"] for event in events] == [
+        "stage_start",
+        "stage_end",
+        "failed",
+    ]
+    assert "Broken document" in events[-1]["error"]
@@ -0,0 +1,144 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from document_to_podcast.inference.speech_cache import SpeechCache
+from document_to_podcast.metrics import PodcastMetrics
+from document_to_podcast.pipeline import pipelined_text_to_speech
+
+
+@pytest.mark.parametrize("num_workers", [0, 1, 3])
+def test_pipelined_text_to_speech_keeps_order(mocker, num_workers):
+    def slow_text_to_speech(input_text, model, voice_profile):
+        # Later turns finish first, to check that the output order is preserved
+        time.sleep(0.01 * (5 - int(input_text)))
+        return np.full(2, int(input_text), dtype=np.float32)
+
+    mocker.patch(
+        "document_to_podcast.pipeline.text_to_speech",
+        side_effect=slow_text_to_speech,
+    )
+    turns = [(1 + n % 2, str(n)) for n in range(5)]
+    speeches = list(
+        pipelined_text_to_speech(
+            turns,
+            model=mocker.MagicMock(),
+            voice_profiles={1: "af_sarah", 2: "am_michael"},
+            queue_size=2,
+            num_workers=num_workers,
+        )
+    )
+    assert [int(speech[0]) for speech in speeches] == list(range(5))
+
+
+def test_pipelined_text_to_speech_serializes_model_calls(mocker):
+    running = []
+    overlaps = []
+
+    def slow_text_to_speech(input_text, model, voice_profile):
+        running.append(input_text)
+        overlaps.append(len(running) > 1)
+        time.sleep(0.01)
+        running.remove(input_text)
+        return np.zeros(2, dtype=np.float32)
+
+    mocker.patch(
+        "document_to_podcast.pipeline.text_to_speech",
+        side_effect=slow_text_to_speech,
+    )
+    speeches = pipelined_text_to_speech(
+        [(1, str(n)) for n in range(6)],
+        model=mocker.MagicMock(),
+        voice_profiles={1: "af_sarah"},
+        queue_size=4,
+        num_workers=3,
+    )
+    assert len(list(speeches)) == 6
+    assert not any(overlaps)
+
+
+def test_pipelined_text_to_speech_reads_cache_while_synthesizing(mocker, tmp_path):
+    cache = SpeechCache(tmp_path)
+    model = mocker.MagicMock(model_id="hexgrad/Kokoro-82M")
+    model.model.lang_code = "a"
+    cache.put(
+        cache.get_key(model.model_id, "af_sarah", model.model.lang_code, "cached"),
+        np.ones(2, dtype=np.float32),
+    )
+    synthesizing = threading.Event()
+    release = threading.Event()
+
+    def slow_text_to_speech(input_text, model, voice_profile):
+        synthesizing.set()
+        # Only released once the cached turn has been read.
+        assert release.wait(timeout=5)
+        return np.zeros(2, dtype=np.float32)
+
+    mocker.patch(
+        "document_to_podcast.inference.speech_cache.text_to_speech",
+        side_effect=slow_text_to_speech,
+    )
+    original_get = cache.get
+
+    def get(key):
+        speech = original_get(key)
+        if speech is not None:
+            release.set()
+        return speech
+
+    cache.get = get
+    speeches = pipelined_text_to_speech(
+        [(1, "new"), (1, "cached")],
+        model=model,
+        voice_profiles={1: "af_sarah"},
+        num_workers=2,
+        speech_cache=cache,
+    )
+    assert [speech[0] for speech in speeches] == [0, 1]
+    assert synthesizing.is_set()
+
+
+def test_pipelined_text_to_speech_bounded_queue(mocker):
+    mocker.patch(
+        "document_to_podcast.pipeline.text_to_speech",
+        side_effect=lambda *args: time.sleep(0.01),
+    )
+    produced = []
+
+    def turns():
+        for n in range(10):
+            produced.append(n)
+            yield 1, str(n)
+
+    speeches = pipelined_text_to_speech(
+        turns(),
+        model=mocker.MagicMock(),
+        voice_profiles={1: "af_sarah"},
+        queue_size=2,
+    )
+    next(speeches)
+    assert len(produced) <= 3
+
+
+def test_pipelined_text_to_speech_records_turns(mocker):
+    mocker.patch(
+        "document_to_podcast.pipeline.text_to_speech",
+        side_effect=lambda *args: np.zeros(12, dtype=np.float32),
+    )
+    metrics = PodcastMetrics()
+    list(
+        pipelined_text_to_speech(
+            [(1, "Hello."), (2, "Hi!")],
+            model=mocker.MagicMock(sample_rate=24),
+            voice_profiles={1: "af_sarah", 2: "am_michael"},
+            metrics=metrics,
+        )
+    )
+    turns = sorted(metrics.turns, key=lambda turn: turn["turn"])
+    assert [(turn["speaker_id"], turn["characters"]) for turn in turns] == [
+        (1, 6),
+        (2, 3),
+    ]
+    assert all(turn["audio_seconds"] == 0.5 for turn in turns)
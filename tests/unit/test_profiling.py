@@ -0,0 +1,79 @@
+import re
+import threading
+import tracemalloc
+
+import pytest
+
+from document_to_podcast.metrics import PodcastMetrics
+from document_to_podcast.profiling import CProfileProfiler, StageProfiler
+
+
+def clean_text():
+    return re.sub(r"\s+", " ", "Hello   world " * 1000)
+
+
+def stack_audio():
+    return [0.0] * 100_000
+
+
+@pytest.mark.parametrize("memory", [False, True])
+def test_cprofile_profiler(tmp_path, memory):
+    metrics = PodcastMetrics(profiler=CProfileProfiler(memory=memory))
+    with metrics.stage("clean_document"):
+        clean_text()
+    with metrics.stage("generate_podcast"):
+        with metrics.stage("write_audio"):
+            stack_audio()
+
+        # Profiled in a worker thread, like the text-to-speech.
+        def synthesize():
+            with metrics.profile("text_to_speech"):
+                clean_text()
+
+        worker = threading.Thread(target=synthesize)
+        worker.start()
+        worker.join()
+    metrics.profiler.write(tmp_path)
+
+    files = {path.name for path in tmp_path.iterdir()}
+    assert {
+        "all.prof",
+        "clean_document.prof",
+        "generate_podcast.prof",
+        "write_audio.prof",
+        "text_to_speech.prof",
+        "summary.txt",
+    } <= files
+    parts = re.split(r"={80}\n(.+)\n={80}\n", (tmp_path / "summary.txt").read_text())
+    summary = dict(zip(parts[1::2], parts[2::2]))
+    assert "clean_text" in summary["clean_document"]
+    assert "clean_text" in summary["text_to_speech"]
+    # Nested stages are only attributed to the innermost one.
+    assert "stack_audio" in summary["write_audio"]
+    assert "stack_audio" not in summary["generate_podcast"]
+    assert ("generate_podcast (memory)" in summary) == memory
+    assert ("generate_podcast.tracemalloc" in files) == memory
+    assert not tracemalloc.is_tracing()
+
+
+def test_cprofile_profiler_worker_threads_since_python_3_12(tmp_path, mocker):
+    mocker.patch("document_to_podcast.profiling._CPROFILE_ALL_THREADS", True)
+    metrics = PodcastMetrics(profiler=CProfileProfiler())
+
+    def synthesize():
+        with metrics.profile("text_to_speech"):
+            clean_text()
+
+    with metrics.stage("generate_podcast"):
+        worker = threading.Thread(target=synthesize)
+        worker.start()
+        worker.join()
+    metrics.profiler.write(tmp_path)
+
+    summary = (tmp_path / "summary.txt").read_text()
+    assert "text_to_speech\n" + "=" * 80 + "\nNothing was profiled." in summary
+
+
+def test_stage_profiler_is_abstract():
+    with pytest.raises(TypeError):
+        StageProfiler()
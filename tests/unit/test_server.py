@@ -0,0 +1,108 @@
+import json
+import re
+import threading
+from http import HTTPStatus
+from http.client import HTTPConnection
+from pathlib import Path
+
+import pytest
+
+from document_to_podcast.config import Config, DEFAULT_PROMPT, DEFAULT_SPEAKERS
+from document_to_podcast.server import PodcastServer, send_podcast_request
+
+SETTINGS = {
+    "text_to_text_model": "owner/repo/model.gguf",
+    "text_to_speech_model": "hexgrad/Kokoro-82M",
+}
+
+
+@pytest.fixture
+def server(mocker):
+    worker = mocker.MagicMock()
+    server = PodcastServer(("127.0.0.1", 0), SETTINGS, [worker])
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, worker
+    server.shutdown()
+    server.server_close()
+
+
+def make_config(tmp_path, **kwargs):
+    input_file = tmp_path / "input_file.txt"
+    input_file.write_text("Hello!")
+    return Config(
+        input_file=str(input_file),
+        output_folder=str(tmp_path / "output"),
+        text_to_text_prompt=DEFAULT_PROMPT,
+        speakers=DEFAULT_SPEAKERS,
+        **{**SETTINGS, **kwargs},
+    )
+
+
+def test_send_podcast_request(server, tmp_path):
+    server, worker = server
+    config = make_config(tmp_path)
+    outputs = send_podcast_request(config, f"http://127.0.0.1:{server.server_port}")
+    assert outputs == {
+        "podcast_script": str(tmp_path / "output" / "podcast.txt"),
+        "podcast_audio": str(tmp_path / "output" / "podcast.wav"),
+    }
+    worker.generate.assert_called_once()
+    sent_config = worker.generate.call_args.args[0]
+    assert sent_config.input_file == config.input_file
+    assert sent_config.script_cache_dir == str(
+        Path(config.script_cache_dir).expanduser()
+    )
+
+
+def test_send_podcast_request_relative_paths(server, tmp_path, monkeypatch):
+    server, worker = server
+    monkeypatch.chdir(tmp_path)
+    config = make_config(tmp_path, tts_cache_dir="cache/speech")
+    send_podcast_request(config, f"http://127.0.0.1:{server.server_port}")
+    sent_config = worker.generate.call_args.args[0]
+    assert sent_config.tts_cache_dir == str(tmp_path.resolve() / "cache" / "speech")
+
+
+def test_send_podcast_request_other_model(server, tmp_path):
+    server, worker = server
+    config = make_config(tmp_path, text_to_text_model="owner/repo/other.gguf")
+    with pytest.raises(RuntimeError, match="only runs owner/repo/model.gguf"):
+        send_podcast_request(config, f"http://127.0.0.1:{server.server_port}")
+    worker.generate.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "kwargs, error",
+    [
+        ({"llama_params": {"n_ctx": 4096}}, "only runs with llama_params={}"),
+        ({"llama_profile": None}, "only runs with llama_profile="),
+        ({"draft_model": "prompt_lookup"}, "only runs with draft_model=None"),
+        ({"prompt_cache_dir": "cache"}, "only runs with prompt_cache_dir=None"),
+        (
+            {"prompt_cache_max_size": 1024},
+            "only runs with prompt_cache_max_size=4096",
+        ),
+    ],
+)
+def test_send_podcast_request_other_llama_settings(server, tmp_path, kwargs, error):
+    server, worker = server
+    config = make_config(tmp_path, **kwargs)
+    with pytest.raises(RuntimeError, match=re.escape(error)):
+        send_podcast_request(config, f"http://127.0.0.1:{server.server_port}")
+    worker.generate.assert_not_called()
+
+
+@pytest.mark.parametrize("length", [None, "abc", "-1"])
+def test_podcast_request_bad_content_length(server, length):
+    server, worker = server
+    connection = HTTPConnection("127.0.0.1", server.server_port)
+    connection.putrequest("POST", "/podcast")
+    if length is not None:
+        connection.putheader("Content-Length", length)
+    connection.endheaders()
+    response = connection.getresponse()
+    assert response.status == HTTPStatus.BAD_REQUEST
+    assert "Invalid Content-Length" in json.loads(response.read())["error"]
+    connection.close()
+    worker.generate.assert_not_called()
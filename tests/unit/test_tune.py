@@ -0,0 +1,45 @@
+from unittest.mock import MagicMock
+
+import llama_cpp
+
+from document_to_podcast.config import LlamaParams
+from document_to_podcast.tune import (
+    get_llama_kwargs,
+    load_llama_profile,
+    probe,
+    save_llama_profile,
+)
+
+
+def test_save_and_load_llama_profile(tmp_path):
+    profile = tmp_path / "profile.json"
+    assert load_llama_profile(profile) == {}
+    save_llama_profile(profile, "org/repo/a.gguf", {"n_threads": 4})
+    save_llama_profile(profile, "org/repo/b.gguf", {"n_batch": 256})
+    assert load_llama_profile(profile) == {
+        "org/repo/a.gguf": {"n_threads": 4},
+        "org/repo/b.gguf": {"n_batch": 256},
+    }
+
+
+def test_get_llama_kwargs(tmp_path):
+    profile = tmp_path / "profile.json"
+    save_llama_profile(profile, "org/repo/a.gguf", {"n_threads": 4, "n_batch": 256})
+    params = LlamaParams(n_threads=8, flash_attn=True, type_k="q8_0", type_v="q4_0")
+    assert get_llama_kwargs("org/repo/a.gguf", params, profile) == {
+        "n_threads": 8,
+        "n_batch": 256,
+        "flash_attn": True,
+        "type_k": llama_cpp.GGML_TYPE_Q8_0,
+        "type_v": llama_cpp.GGML_TYPE_Q4_0,
+    }
+    assert get_llama_kwargs("org/repo/b.gguf", LlamaParams(), profile) == {}
+
+
+def test_probe():
+    model = MagicMock()
+    model.tokenize.return_value = list(range(10))
+    prefill, decode = probe(model, n_prompt_tokens=16, n_decode_tokens=4)
+    assert prefill > 0 and decode > 0
+    assert len(model.eval.call_args_list[0].args[0]) == 16
+    assert model.eval.call_count == 5
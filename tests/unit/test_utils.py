@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+import soundfile as sf
+
+from document_to_podcast.utils import AudioSink, stack_audio_segments
+
+
+def test_audio_sink_matches_stack_audio_segments(tmp_path):
+    rng = np.random.default_rng(0)
+    segments = [
+        rng.uniform(-0.5, 0.5, size=n).astype(np.float32) for n in (100, 250, 50)
+    ]
+    with AudioSink(tmp_path / "podcast.wav", sample_rate=1000) as sink:
+        for segment in segments:
+            sink.write(segment)
+
+    audio, sample_rate = sf.read(tmp_path / "podcast.wav")
+    expected = stack_audio_segments(segments, sample_rate=1000)
+    assert sample_rate == 1000
+    assert sink.frames == len(expected) == len(audio)
+    np.testing.assert_allclose(audio, expected, atol=1e-4)
+
+
+def test_stack_audio_segments_seeded_pads():
+    segments = [np.ones(10, dtype=np.float32), np.ones(20, dtype=np.float32)]
+    rng = np.random.default_rng(42)
+    expected_pads = [int(rng.uniform(low=0.0, high=1.0) * 1000) for _ in segments]
+
+    stacked = stack_audio_segments(segments, sample_rate=1000)
+
+    assert len(stacked) == 30 + sum(expected_pads)
+    assert stacked[10 : 10 + expected_pads[0]].sum() == 0
+    assert stacked[10 + expected_pads[0] :][:20].sum() == 20
+
+
+def test_stack_audio_segments_dtype():
+    segments = [np.ones(10, dtype=np.float32), np.ones(20, dtype=np.float32)]
+    assert stack_audio_segments(segments, sample_rate=1000).dtype == np.float32
+    assert (
+        stack_audio_segments(segments, sample_rate=1000, dtype=np.float64).dtype
+        == np.float64
+    )
+
+
+def test_stack_audio_segments_out(tmp_path):
+    segments = [np.ones(10, dtype=np.float32), np.ones(20, dtype=np.float32)]
+    expected = stack_audio_segments(segments, sample_rate=1000)
+
+    out = np.memmap(
+        tmp_path / "podcast.raw", dtype=np.float32, mode="w+", shape=len(expected)
+    )
+    stacked = stack_audio_segments(segments, sample_rate=1000, out=out)
+    assert np.shares_memory(stacked, out)
+    np.testing.assert_array_equal(out, expected)
+
+    buffer = bytearray(4 * len(expected))
+    stack_audio_segments(segments, sample_rate=1000, out=memoryview(buffer).cast("f"))
+    np.testing.assert_array_equal(np.frombuffer(buffer, dtype=np.float32), expected)
+
+    with pytest.raises(ValueError):
+        stack_audio_segments(segments, sample_rate=1000, out=np.empty(10))
+
+
+def test_audio_sink_write_chunks(tmp_path):
+    with AudioSink(tmp_path / "podcast.wav", sample_rate=1000, silence_pad=0.0) as sink:
+        sink.write(iter([np.ones(10, dtype=np.float32), np.ones(5, dtype=np.float32)]))
+        sink.write(np.ones(5, dtype=np.float32))
+
+    audio, _ = sf.read(tmp_path / "podcast.wav")
+    assert sink.frames == len(audio) == 20